@@ -51,10 +51,18 @@ st.markdown("---")
 
 # ── key metrics row ──────────────────────────────────────────────────
 from utils.data_loader import fit_beta_model  # noqa: E402
+from utils.refit import get_model_server  # noqa: E402
 
 art = fit_beta_model()
 tm, tsm = art["train_metrics"], art["test_metrics"]
 
+served = get_model_server().status().set_index("kind").loc["fixed"]
+st.sidebar.caption(
+    f"Model {served['model_version']} · fitted {served['fitted_at'].replace('T', ' ')}"
+    + (" · refit running" if served["refitting"]
+       else "" if served["current"] else " · data changed, refit pending")
+)
+
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Schools Analyzed", f"{tm['N'] + tsm['N']}")
 c2.metric("Model R²", f"{tsm['r2']:.2f}")
@@ -79,7 +87,12 @@ with col1:
         ####  Predictive Tool
         Adjust school-level sliders (ENI, attendance, teaching
         environment, etc.) and instantly predict a school's CCR.
-        See which factors push the prediction up or down.
+        See which factors push the prediction up or down, and how
+        much a feature would need to rise to reach a target CCR.
+
+        ####  District Map
+        Map district and borough averages of actual and predicted
+        CCR, model residuals, and within-school subgroup gaps.
         """
     )
 
@@ -95,6 +108,10 @@ with col2:
         Understand data suppression (n < 15), missingness patterns,
         and the tradeoffs between precision and representation
         in subgroup-level reporting.
+
+        ####  Policy Scenarios
+        Apply city-wide what-ifs (e.g. attendance +3 pts in the
+        Bronx) and see how average predicted CCR would shift.
         """
     )
 
@@ -1,6 +1,6 @@
 """
 Page 1 — Model Overview
-Horizontal coefficient bar chart + model performance metrics.
+Horizontal coefficient bar chart + model performance metrics + drift flag.
 """
 
 import sys
@@ -9,10 +9,15 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import streamlit as st
 import plotly.graph_objects as go
-import pandas as pd
 import numpy as np
 
-from utils.data_loader import fit_beta_model, FEATURE_DISPLAY
+from utils.data_loader import (
+    data_version, load_model, model_version, FEATURE_DISPLAY, MODEL_KINDS,
+    MODEL_TABLES, BOROUGHS,
+)
+from utils.scoring import build_contribution_summary
+from utils.figures import cached_figure, MAX_POINTS
+from utils.drift import MIN_COUNT, PSI_DRIFT, PSI_MODERATE, drift_flag, latest_drift
 
 st.set_page_config(page_title="Model Overview", layout="wide")
 
@@ -36,7 +41,13 @@ st.markdown(
 
 st.title("Model Overview — Feature Importance")
 
-art = fit_beta_model()
+model_kind = st.radio(
+    "Model", list(MODEL_KINDS), format_func=MODEL_KINDS.get,
+    horizontal=True, key="model_kind",
+)
+art = load_model(model_kind)
+model_sig = dict(model=model_kind, fit=model_version(art))
+version = data_version(MODEL_TABLES)
 coef_df = art["coef_df"]
 train_m = art["train_metrics"]
 test_m  = art["test_metrics"]
@@ -60,33 +71,39 @@ plot_df["display"] = plot_df.index.map(
 )
 plot_df = plot_df.sort_values("Coefficient")
 
-colors = ["#4CAF50" if c > 0 else "#EF5350" for c in plot_df["Coefficient"]]
-
-fig = go.Figure()
-fig.add_trace(go.Bar(
-    y=plot_df["display"],
-    x=plot_df["Coefficient"],
-    orientation="h",
-    marker_color=colors,
-    error_x=dict(type="data", array=(1.96 * plot_df["Std Error"]).values, visible=True),
-    text=[f"{c:+.3f} {s}" for c, s in zip(plot_df["Coefficient"], plot_df["sig"])],
-    textposition="outside",
-    hovertemplate=(
-        "<b>%{y}</b><br>"
-        "Coefficient: %{x:.4f}<br>"
-        "<extra></extra>"
-    ),
-))
-fig.add_vline(x=0, line_dash="dash", line_color="black", line_width=1)
-fig.update_layout(
-    title="Standardized Beta Coefficients (logit scale) with 95% CI",
-    xaxis_title="Coefficient",
-    yaxis_title="",
-    height=500,
-    margin=dict(l=20, r=20, t=50, b=40),
-    plot_bgcolor="white",
+def _build_coef():
+    colors = ["#4CAF50" if c > 0 else "#EF5350" for c in plot_df["Coefficient"]]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=plot_df["display"],
+        x=plot_df["Coefficient"],
+        orientation="h",
+        marker_color=colors,
+        error_x=dict(type="data", array=(1.96 * plot_df["Std Error"]).values, visible=True),
+        text=[f"{c:+.3f} {s}" for c, s in zip(plot_df["Coefficient"], plot_df["sig"])],
+        textposition="outside",
+        hovertemplate=(
+            "<b>%{y}</b><br>"
+            "Coefficient: %{x:.4f}<br>"
+            "<extra></extra>"
+        ),
+    ))
+    fig.add_vline(x=0, line_dash="dash", line_color="black", line_width=1)
+    fig.update_layout(
+        title="Standardized Beta Coefficients (logit scale) with 95% CI",
+        xaxis_title="Coefficient",
+        yaxis_title="",
+        height=500,
+        margin=dict(l=20, r=20, t=50, b=40),
+        plot_bgcolor="white",
+    )
+    return fig
+
+st.plotly_chart(
+    cached_figure("coef_bar", model_sig, _build_coef, version),
+    width='stretch',
 )
-st.plotly_chart(fig, use_container_width=True)
 
 # ── interpretation cards ─────────────────────────────────────────────
 st.markdown("### Feature Interpretation")
@@ -114,6 +131,126 @@ with cols[1]:
             f"**{row['display']}**\n"
         )
 
+# ── contributions across schools ─────────────────────────────────────
+st.markdown("---")
+st.markdown("### How Much Each Feature Moves Real Schools")
+st.caption(
+    "Each dot is one school: the feature's contribution to that school's "
+    "logit score (coefficient × standardized value). Colour shows the "
+    "school's standardized feature value — red is high, blue is low."
+)
+
+contrib, values, by_borough, by_district = build_contribution_summary(model_kind)
+order = contrib.abs().mean().sort_values().index.tolist()
+
+def _build_beeswarm():
+    # beeswarm-style strip: all points built in one vectorized pass; above
+    # MAX_POINTS schools a fixed random sample keeps the payload bounded
+    rng = np.random.default_rng(0)
+    if len(contrib) > MAX_POINTS:
+        keep = rng.choice(len(contrib), MAX_POINTS, replace=False)
+        contrib_pts, values_pts = contrib.iloc[keep], values.iloc[keep]
+    else:
+        contrib_pts, values_pts = contrib, values
+    n_schools = len(contrib_pts)
+    feat_pos = np.repeat(np.arange(len(order)), n_schools)
+    fig_bee = go.Figure(go.Scattergl(
+        x=contrib_pts[order].to_numpy().T.ravel(),
+        y=feat_pos + rng.uniform(-0.3, 0.3, feat_pos.size),
+        mode="markers",
+        marker=dict(
+            size=5, opacity=0.6,
+            color=np.clip(values_pts[order].to_numpy().T.ravel(), -2.5, 2.5),
+            colorscale="RdBu_r", cmid=0,
+            colorbar=dict(title="Feature<br>value (SD)"),
+        ),
+        customdata=np.tile(contrib_pts.index.to_numpy(), len(order)),
+        hovertemplate="%{customdata}<br>Contribution: %{x:+.3f}<extra></extra>",
+    ))
+    fig_bee.add_vline(x=0, line_dash="dash", line_color="black", line_width=1)
+    fig_bee.update_layout(
+        title="Distribution of Logit Contributions Across Schools",
+        xaxis_title="Contribution to log-odds",
+        yaxis=dict(
+            tickmode="array", tickvals=list(range(len(order))),
+            ticktext=[FEATURE_DISPLAY.get(f, f) for f in order],
+        ),
+        height=550,
+        margin=dict(l=20, r=20, t=50, b=40),
+        plot_bgcolor="white",
+    )
+    return fig_bee
+
+st.plotly_chart(
+    cached_figure("contrib_beeswarm", model_sig, _build_beeswarm, version),
+    width='stretch',
+)
+
+level = st.radio("Average contribution by", ["Borough", "District"], horizontal=True)
+agg = by_borough if level == "Borough" else by_district
+def _build_heatmap():
+    heat = agg.pivot(index="feature", columns="group", values="mean").loc[order[::-1]]
+    fig_heat = go.Figure(go.Heatmap(
+        z=heat.to_numpy(),
+        x=[str(c) for c in heat.columns],
+        y=[FEATURE_DISPLAY.get(f, f) for f in heat.index],
+        colorscale="RdYlGn", zmid=0,
+        colorbar=dict(title="Mean<br>contribution"),
+        hovertemplate="%{x}<br>%{y}: %{z:+.3f}<extra></extra>",
+    ))
+    fig_heat.update_layout(
+        title=f"Mean Logit Contribution by {level}",
+        xaxis=dict(type="category", title=level),
+        height=450,
+        margin=dict(l=20, r=20, t=50, b=40),
+    )
+    return fig_heat
+
+st.plotly_chart(
+    cached_figure("contrib_heatmap", dict(model_sig, level=level), _build_heatmap,
+                  version),
+    width='stretch',
+)
+
+# ── district random effects ──────────────────────────────────────────
+if model_kind == "mixed":
+    st.markdown("---")
+    st.markdown("### District Effects")
+    effects = art["district_effects"].sort_values("effect")
+    st.caption(
+        "Each district's random intercept on the logit scale with a 95 % "
+        "interval — how far its schools sit above or below what their "
+        "stressors and borough predict (borough stays a fixed effect; only "
+        "districts within a borough get random intercepts). "
+        f"Spread between districts: σ = {art['sigma_district']:.3f}."
+    )
+
+    def _build_effects():
+        fig_re = go.Figure()
+        for b in BOROUGHS:
+            sub = effects[effects["borough"] == b]
+            fig_re.add_trace(go.Scatter(
+                x=sub["effect"], y=sub["group"], mode="markers", name=b,
+                error_x=dict(type="data", array=(1.96 * sub["se"]).to_numpy()),
+                customdata=sub["n_train"],
+                hovertemplate="%{y}: %{x:+.3f} (%{customdata} schools)<extra></extra>",
+            ))
+        fig_re.add_vline(x=0, line_dash="dash", line_color="black", line_width=1)
+        fig_re.update_layout(
+            xaxis_title="District intercept (logit)",
+            yaxis=dict(type="category", categoryorder="array",
+                       categoryarray=effects["group"].tolist()),
+            height=max(400, 18 * len(effects)),
+            margin=dict(l=20, r=20, t=30, b=40),
+            plot_bgcolor="white",
+        )
+        return fig_re
+
+    st.plotly_chart(
+        cached_figure("district_effects", model_sig, _build_effects, version),
+        width='stretch',
+    )
+
 # ── model performance ────────────────────────────────────────────────
 st.markdown("---")
 st.markdown("### Model Performance")
@@ -138,3 +275,38 @@ elif mae_gap < 4:
     st.warning("⚠️ Slight overfitting detected (moderate gap).")
 else:
     st.error("❌ Potential overfitting — large gap between train and test.")
+
+# ── data drift ───────────────────────────────────────────────────────
+st.markdown("---")
+st.markdown("### Data Drift")
+
+fixed_version = model_version(load_model("fixed"))
+drift = latest_drift(fixed_version)
+if drift is None:
+    st.caption(
+        "No drift run for the served beta model yet — run "
+        "`python -m utils.drift` from `deployment/` after loading new data."
+    )
+else:
+    drift_level, drift_msg = drift_flag(drift)
+    {"stable": st.success, "moderate": st.warning, "drift": st.error}[drift_level](
+        drift_msg
+    )
+    st.caption(
+        f"Latest run {drift['run_at'].iloc[0]} on `{Path(drift['source'].iloc[0]).name}` "
+        "against the beta model's training rows. PSI below "
+        f"{PSI_MODERATE} is stable, {PSI_DRIFT} or more is drift; segments "
+        f"with fewer than {MIN_COUNT} schools or rows are not judged."
+    )
+    with st.expander("Shifted features and segments"):
+        shifted = drift[drift["status"].isin(["moderate", "drift"])]
+        if len(shifted) == 0:
+            st.info("Every judged distribution is stable.")
+        else:
+            st.dataframe(
+                shifted.sort_values("psi", ascending=False)[
+                    ["segment_type", "segment", "feature", "n_ref", "n_new",
+                     "psi", "ks", "q10_shift", "q50_shift", "q90_shift", "status"]
+                ].round(3),
+                hide_index=True, width='stretch',
+            )
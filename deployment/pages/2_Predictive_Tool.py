@@ -12,8 +12,10 @@ import plotly.graph_objects as go
 import numpy as np
 
 from utils.data_loader import (
-    fit_beta_model, predict_ccr, FEATURE_DISPLAY, BOROUGHS,
+    load_model, model_frame, predict_ccr, FEATURE_DISPLAY, BOROUGHS, MODEL_KINDS,
 )
+from utils.inverse import CONTROLLABLE, solve_all_schools, solve_for_inputs
+from utils.peers import get_peer_index, peers_for_inputs
 
 st.set_page_config(page_title="Predictive Tool", page_icon="🔮", layout="wide")
 
@@ -42,7 +44,13 @@ st.markdown(
     "contribute most to the outcome."
 )
 
-art = fit_beta_model()
+model_kind = st.sidebar.selectbox(
+    "Model", list(MODEL_KINDS), format_func=MODEL_KINDS.get, key="model_kind",
+    help="The hierarchical model keeps borough as a fixed effect and adds a "
+         "random intercept per district within its borough; a hypothetical "
+         "school is predicted for a typical district.",
+)
+art = load_model(model_kind)
 ranges = art["feature_ranges"]
 
 # ── sidebar sliders ──────────────────────────────────────────────────
@@ -92,8 +100,20 @@ with st.sidebar.expander("Additional Controls", expanded=False):
     )
     borough = st.selectbox("Borough", BOROUGHS, index=0)
 
+show_unc = st.sidebar.toggle(
+    "Show 95 % uncertainty", value=True,
+    help="Monte Carlo draws from the fitted parameter covariance, plus "
+         "Beta-distributed school-to-school noise for the prediction interval.",
+)
+
 # ── prediction ───────────────────────────────────────────────────────
-pred_ccr, contribs = predict_ccr(art, eni, pct_temp, teaching, attendance, support, borough)
+unc = None
+if show_unc:
+    pred_ccr, contribs, unc = predict_ccr(
+        art, eni, pct_temp, teaching, attendance, support, borough, interval=0.95,
+    )
+else:
+    pred_ccr, contribs = predict_ccr(art, eni, pct_temp, teaching, attendance, support, borough)
 
 # clamp display to 0-100
 pred_display = max(0.0, min(100.0, pred_ccr))
@@ -107,8 +127,15 @@ with col_left:
         label="4-Year College & Career Readiness",
         value=f"{pred_display:.1f} %",
     )
+    if unc is not None:
+        st.caption(
+            f"95 % credible interval (average school like this): "
+            f"**{unc['mean_lo']:.1f} – {unc['mean_hi']:.1f} %**  \n"
+            f"95 % prediction interval (a single school): "
+            f"**{unc['pred_lo']:.1f} – {unc['pred_hi']:.1f} %**"
+        )
 
-    overall_mean = art["model_df"]["metric_value_4yr_ccr_all_students"].mean()
+    overall_mean = model_frame(art)["metric_value_4yr_ccr_all_students"].mean()
     delta = pred_display - overall_mean
     if delta > 0:
         st.success(f"▲ {delta:+.1f} pts above the citywide average ({overall_mean:.1f} %)")
@@ -138,7 +165,7 @@ with col_right:
         title={"text": "Predicted CCR (red line = city avg)"},
     ))
     fig_gauge.update_layout(height=320, margin=dict(t=60, b=20, l=30, r=30))
-    st.plotly_chart(fig_gauge, use_container_width=True)
+    st.plotly_chart(fig_gauge, width='stretch')
 
 # ── feature contribution breakdown ───────────────────────────────────
 st.markdown("---")
@@ -174,7 +201,7 @@ fig_cb.update_layout(
     margin=dict(l=20, r=20, t=50, b=30),
     plot_bgcolor="white",
 )
-st.plotly_chart(fig_cb, use_container_width=True)
+st.plotly_chart(fig_cb, width='stretch')
 
 # ── intercept context ────────────────────────────────────────────────
 intercept_ccr = 1 / (1 + np.exp(-contribs["const"])) * 100
@@ -185,6 +212,85 @@ st.info(
     f"to the final **{pred_display:.1f} %**."
 )
 
+# ── reach a target ───────────────────────────────────────────────────
+TARGET_LABELS = {
+    "avg_student_attendance": "Attendance",
+    "teaching_environment_pct_positive": "Teaching Environment",
+    "student_support_pct": "Student Support",
+}
+
+
+@st.fragment
+def target_section(inputs):
+    """Re-runs on its own when the target or features change."""
+    st.markdown("---")
+    st.markdown("### Reach a Target CCR")
+    st.caption(
+        "The smallest change to the selected features (measured in "
+        "school-to-school standard deviations) that lifts this school's "
+        "predicted CCR to the target. Features are only raised, up to 100 %."
+    )
+    tc1, tc2 = st.columns([1, 2])
+    target = tc1.slider("Target CCR (%)", 5, 95, 60)
+    levers = tc2.multiselect("Features to change", CONTROLLABLE, default=CONTROLLABLE[:1],
+                             format_func=TARGET_LABELS.get)
+    if not levers:
+        return
+
+    sol = solve_for_inputs(art, *inputs, target, levers)
+    if sol["status"] == "met":
+        st.success(f"Already predicted at {sol['predicted_ccr']:.1f} % — no change needed.")
+    else:
+        cols = st.columns(len(levers))
+        for col, f in zip(cols, levers):
+            col.metric(TARGET_LABELS[f], f"{sol[f] * 100:.1f} %",
+                       delta=f"{sol[f'change_{f}'] * 100:+.1f} pts")
+        if sol["status"] == "unreachable":
+            st.warning(
+                f"{target} % is out of reach with these features — at their "
+                f"limits the prediction reaches {sol['reached_ccr']:.1f} %."
+            )
+
+    # solved only while open
+    all_schools = st.expander("All schools", key="target_all", on_change="rerun")
+    if not all_schools.open:
+        return
+    with all_schools:
+        batch = solve_all_schools(art, target, levers)
+        counts = batch["status"].value_counts()
+        b1, b2, b3 = st.columns(3)
+        b1.metric("Already at target", int(counts.get("met", 0)))
+        b2.metric("Reachable", int(counts.get("reachable", 0)))
+        b3.metric("Out of reach", int(counts.get("unreachable", 0)))
+        shown = ["DBN", "school_name", "borough", "predicted_ccr", "status"] + [
+            f"change_{f}" for f in levers] + ["reached_ccr", "effort_sd"]
+        st.dataframe(
+            batch.loc[batch["status"] != "met", shown]
+            .sort_values("effort_sd").round(3),
+            width='stretch', hide_index=True,
+        )
+
+
+# ── peer schools ─────────────────────────────────────────────────────
+@st.fragment
+def peer_section(inputs):
+    """Re-runs on its own when the number of peers changes."""
+    st.markdown("---")
+    st.markdown("### Schools Like This One")
+    st.caption(
+        "The real schools closest to these slider settings on ENI, housing "
+        "instability, teaching environment, attendance and student support "
+        "(standardized). Compare their actual CCR with the model's prediction."
+    )
+    n_peers = st.slider("Number of peer schools", 3, 15, 5)
+    peer_df = peers_for_inputs(art, get_peer_index(art), *inputs[:5], k=n_peers)
+    st.dataframe(peer_df, width='stretch', hide_index=True)
+
+
+inputs = (eni, pct_temp, teaching, attendance, support, borough)
+target_section(inputs)
+peer_section(inputs)
+
 # ── interpretation tips ──────────────────────────────────────────────
 with st.expander("💡 How to read this"):
     st.markdown(
@@ -12,9 +12,14 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
-from scipy.stats import pearsonr
 
-from utils.data_loader import build_subgroup_data, SUBGROUP_COLORS, BOROUGHS
+from utils.data_loader import (
+    build_subgroup_data, data_version, SUBGROUP_COLORS, SUBGROUP_TABLES, BOROUGHS,
+)
+from utils.imputation import build_imputed_subgroup_data
+from utils.cube import get_cube, rollup
+from utils.stat_tests import N_PERM, correlation_tests, stars
+from utils.figures import cached_figure, scatter_trace, histogram_trace, box_trace
 
 st.set_page_config(page_title="Equity Analysis", layout="wide")
 
@@ -42,8 +47,23 @@ st.markdown(
     "and how environmental stressors impact each group."
 )
 
+version = data_version(SUBGROUP_TABLES)
 sg_all, reported, multi_sg = build_subgroup_data()
 
+include_est = st.toggle(
+    "Include estimated CCR for suppressed subgroups (n < 15)",
+    value=False,
+    help="Suppressed cells are filled with empirical-Bayes estimates pooled "
+         "toward the school's overall CCR and the subgroup's borough gap. "
+         "See Bias & Limitations for the tradeoff.",
+)
+if include_est:
+    _, reported, multi_sg = build_imputed_subgroup_data(version)
+    st.caption(
+        f"Showing {int((~reported['is_imputed']).sum())} reported + "
+        f"{int(reported['is_imputed'].sum())} estimated subgroup cells."
+    )
+
 # ── filters ──────────────────────────────────────────────────────────
 fcol1, fcol2 = st.columns(2)
 with fcol1:
@@ -70,42 +90,49 @@ if filtered.empty:
     st.warning("No data matches the current filter. Broaden your selection.")
     st.stop()
 
-# ── tabs ─────────────────────────────────────────────────────────────
-tab1, tab2, tab3 = st.tabs([
-    "CCR Distributions",
-    "Stressor Impact",
-    "Within-School Gaps",
-])
+# everything the figures below depend on
+fig_sig = dict(boroughs=sel_boroughs, subgroups=sel_subgroups, estimates=include_est)
+
+# summary tables are rolled up from the pre-aggregated cube
+cube = get_cube(version)
+cube_where = dict(borough=sel_boroughs, Subgroup=sel_subgroups)
+est = "_est" if include_est else ""
+
+STRESSORS = {
+    "economic_need_index": "Economic Need Index",
+    "percent_temp_housing": "% Temporary Housing",
+    "avg_student_attendance": "Avg Student Attendance",
+    "teaching_environment_pct_positive": "Teaching Environment",
+}
 
 # =====================================================================
 # TAB 1 — CCR Distributions
 # =====================================================================
-with tab1:
+def distributions_tab():
     st.markdown("### CCR Distribution by Subgroup")
+    ccr_stats = rollup(cube, "ccr_pct" + est, ["Subgroup"], cube_where)
 
     # summary stats
     summary = (
-        filtered.groupby("Subgroup")["ccr_pct"]
-        .agg(["count", "mean", "median", "std", "min", "max"])
+        ccr_stats[["count", "mean", "median", "std", "min", "max"]]
         .round(1)
         .rename(columns={"count": "N", "mean": "Mean", "median": "Median",
                          "std": "Std", "min": "Min", "max": "Max"})
     )
-    st.dataframe(summary, use_container_width=True)
+    st.dataframe(summary, width='stretch')
 
     c1, c2 = st.columns(2)
 
     # histogram
-    with c1:
+    def _build_hist():
         fig_hist = go.Figure()
         for sg in sel_subgroups:
             data = filtered[filtered["Subgroup"] == sg]["ccr_pct"]
             if len(data) == 0:
                 continue
-            fig_hist.add_trace(go.Histogram(
-                x=data, name=f"{sg} (n={len(data)}, μ={data.mean():.1f})",
-                marker_color=SUBGROUP_COLORS[sg], opacity=0.55,
-                nbinsx=20,
+            fig_hist.add_trace(histogram_trace(
+                data, f"{sg} (n={len(data)}, μ={data.mean():.1f})",
+                SUBGROUP_COLORS[sg],
             ))
         overall_mean = filtered["ccr_pct"].mean()
         fig_hist.add_vline(x=overall_mean, line_dash="dash",
@@ -115,28 +142,32 @@ with tab1:
             xaxis_title="CCR (%)", yaxis_title="Schools",
             height=420, plot_bgcolor="white",
         )
-        st.plotly_chart(fig_hist, use_container_width=True)
+        return fig_hist
+
+    with c1:
+        st.plotly_chart(cached_figure("equity_hist", fig_sig, _build_hist, version),
+                        width='stretch')
 
     # box plot
-    with c2:
+    def _build_box():
         fig_box = go.Figure()
         for sg in sel_subgroups:
             data = filtered[filtered["Subgroup"] == sg]["ccr_pct"]
             if len(data) == 0:
                 continue
-            fig_box.add_trace(go.Box(
-                y=data, name=sg,
-                marker_color=SUBGROUP_COLORS[sg],
-                boxmean=True,
-            ))
+            fig_box.add_trace(box_trace(data, sg, SUBGROUP_COLORS[sg]))
         fig_box.update_layout(
             title="CCR by Subgroup (Box Plot)",
             yaxis_title="CCR (%)", height=420, plot_bgcolor="white",
         )
-        st.plotly_chart(fig_box, use_container_width=True)
+        return fig_box
+
+    with c2:
+        st.plotly_chart(cached_figure("equity_box", fig_sig, _build_box, version),
+                        width='stretch')
 
     # gap callout
-    sg_means = filtered.groupby("Subgroup")["ccr_pct"].mean().sort_values(ascending=False)
+    sg_means = ccr_stats["mean"].sort_values(ascending=False)
     if len(sg_means) >= 2:
         top, bottom = sg_means.index[0], sg_means.index[-1]
         gap = sg_means.iloc[0] - sg_means.iloc[-1]
@@ -148,77 +179,84 @@ with tab1:
 # =====================================================================
 # TAB 2 — Stressor × Subgroup
 # =====================================================================
-with tab2:
+@st.fragment
+def stressor_tab():
+    """Re-runs on its own when the stressor changes."""
     st.markdown("### How Stressors Impact CCR by Subgroup")
     st.markdown(
         "Each scatter plot shows the relationship between a stressor and "
         "subgroup CCR. The **Pearson r** quantifies the linear association."
     )
+    st.caption(
+        f"Significance from {N_PERM:,} label permutations per test, "
+        "Benjamini–Hochberg FDR-adjusted across the stressor × subgroup table "
+        "(* q < 0.05, ** q < 0.01, *** q < 0.001)."
+    )
 
-    stressors = {
-        "economic_need_index": "Economic Need Index",
-        "percent_temp_housing": "% Temporary Housing",
-        "avg_student_attendance": "Avg Student Attendance",
-        "teaching_environment_pct_positive": "Teaching Environment",
-    }
+    sel_stressor = st.selectbox("Select Stressor", list(STRESSORS.keys()),
+                                format_func=lambda k: STRESSORS[k])
+
+    all_subgroups = ["Asian", "Black", "Hispanic", "White"]
+    corr_tests = correlation_tests(
+        filtered[["Subgroup", "ccr_pct", *STRESSORS]],
+        list(STRESSORS), "ccr_pct", "Subgroup", all_subgroups,
+    ).set_index(["group", "variable"])
+
+    def _build_scatter():
+        fig_sc = go.Figure()
+        for sg in sel_subgroups:
+            sg_data = filtered[(filtered["Subgroup"] == sg) & filtered[sel_stressor].notna()]
+            if len(sg_data) < 10:
+                continue
+            r, q = corr_tests.loc[(sg, sel_stressor), ["r", "q"]]
+            sig = stars(q)
 
-    sel_stressor = st.selectbox("Select Stressor", list(stressors.keys()),
-                                format_func=lambda k: stressors[k])
-
-    fig_sc = go.Figure()
-    corr_rows = []
-    for sg in sel_subgroups:
-        sg_data = filtered[(filtered["Subgroup"] == sg) & filtered[sel_stressor].notna()]
-        if len(sg_data) < 10:
-            continue
-        r, p = pearsonr(sg_data[sel_stressor], sg_data["ccr_pct"])
-        sig = "***" if p < 0.001 else "**" if p < 0.01 else "*" if p < 0.05 else "ns"
-        corr_rows.append(dict(Subgroup=sg, r=round(r, 3), p=round(p, 4), sig=sig, N=len(sg_data)))
-
-        fig_sc.add_trace(go.Scatter(
-            x=sg_data[sel_stressor], y=sg_data["ccr_pct"],
-            mode="markers",
-            marker=dict(color=SUBGROUP_COLORS[sg], size=6, opacity=0.5),
-            name=f"{sg} (r={r:.2f}{sig})",
-        ))
-
-        # trend line
-        z = np.polyfit(sg_data[sel_stressor], sg_data["ccr_pct"], 1)
-        x_line = np.linspace(sg_data[sel_stressor].min(), sg_data[sel_stressor].max(), 50)
-        fig_sc.add_trace(go.Scatter(
-            x=x_line, y=np.polyval(z, x_line),
-            mode="lines", line=dict(color=SUBGROUP_COLORS[sg], width=3),
-            showlegend=False,
-        ))
-
-    fig_sc.update_layout(
-        title=f"{stressors[sel_stressor]} vs CCR by Subgroup",
-        xaxis_title=stressors[sel_stressor],
-        yaxis_title="CCR (%)",
-        height=500, plot_bgcolor="white",
+            fig_sc.add_trace(scatter_trace(
+                sg_data[sel_stressor], sg_data["ccr_pct"],
+                f"{sg} (r={r:.2f}{sig})", SUBGROUP_COLORS[sg],
+            ))
+
+            # trend line
+            z = np.polyfit(sg_data[sel_stressor], sg_data["ccr_pct"], 1)
+            x_line = np.linspace(sg_data[sel_stressor].min(), sg_data[sel_stressor].max(), 50)
+            fig_sc.add_trace(go.Scatter(
+                x=x_line, y=np.polyval(z, x_line),
+                mode="lines", line=dict(color=SUBGROUP_COLORS[sg], width=3),
+                showlegend=False,
+            ))
+
+        fig_sc.update_layout(
+            title=f"{STRESSORS[sel_stressor]} vs CCR by Subgroup",
+            xaxis_title=STRESSORS[sel_stressor],
+            yaxis_title="CCR (%)",
+            height=500, plot_bgcolor="white",
+        )
+        return fig_sc
+
+    st.plotly_chart(
+        cached_figure("equity_scatter", dict(fig_sig, stressor=sel_stressor),
+                      _build_scatter, version),
+        width='stretch',
     )
-    st.plotly_chart(fig_sc, use_container_width=True)
 
     # full correlation matrix
     with st.expander("Full Stressor × Subgroup Correlation Table"):
         rows = []
-        for col, label in stressors.items():
+        for col, label in STRESSORS.items():
             row = {"Stressor": label}
-            for sg in ["Asian", "Black", "Hispanic", "White"]:
-                sg_data = filtered[(filtered["Subgroup"] == sg) & filtered[col].notna()]
-                if len(sg_data) >= 10:
-                    r, p = pearsonr(sg_data[col], sg_data["ccr_pct"])
-                    sig = "***" if p < 0.001 else "**" if p < 0.01 else "*" if p < 0.05 else "ns"
-                    row[sg] = f"{r:+.2f} {sig}"
+            for sg in all_subgroups:
+                r, q = corr_tests.loc[(sg, col), ["r", "q"]]
+                if not np.isnan(r):
+                    row[sg] = f"{r:+.2f} {stars(q)}"
                 else:
                     row[sg] = "N/A"
             rows.append(row)
-        st.dataframe(pd.DataFrame(rows).set_index("Stressor"), use_container_width=True)
+        st.dataframe(pd.DataFrame(rows).set_index("Stressor"), width='stretch')
 
 # =====================================================================
 # TAB 3 — Within-School Gaps
 # =====================================================================
-with tab3:
+def gaps_tab():
     st.markdown("### Within-School CCR Gaps")
     st.markdown(
         "When students of different backgrounds attend the **same school**, "
@@ -228,31 +266,32 @@ with tab3:
 
     if filtered_multi.empty:
         st.info("Not enough multi-subgroup schools match the current filter.")
-        st.stop()
+        return
 
     c1, c2 = st.columns(2)
 
-    with c1:
+    def _build_gap_box():
         fig_gap_box = go.Figure()
         for sg in sel_subgroups:
             data = filtered_multi[filtered_multi["Subgroup"] == sg]["intra_school_gap"]
             if len(data) < 3:
                 continue
-            fig_gap_box.add_trace(go.Box(
-                y=data, name=sg,
-                marker_color=SUBGROUP_COLORS[sg],
-                boxmean=True,
-            ))
+            fig_gap_box.add_trace(box_trace(data, sg, SUBGROUP_COLORS[sg]))
         fig_gap_box.add_hline(y=0, line_dash="dash", line_color="black")
         fig_gap_box.update_layout(
             title="Intra-School Gap Distribution",
             yaxis_title="Gap (pts from school mean)",
             height=450, plot_bgcolor="white",
         )
-        st.plotly_chart(fig_gap_box, use_container_width=True)
+        return fig_gap_box
 
-    with c2:
-        # gap vs ENI
+    # gap vs ENI
+    gap_tests = correlation_tests(
+        filtered_multi[["Subgroup", "intra_school_gap", "economic_need_index"]],
+        ["economic_need_index"], "intra_school_gap", "Subgroup", sel_subgroups,
+    ).set_index("group")
+
+    def _build_gap_eni():
         fig_gap_eni = go.Figure()
         for sg in sel_subgroups:
             sg_data = filtered_multi[
@@ -261,14 +300,12 @@ with tab3:
             ]
             if len(sg_data) < 10:
                 continue
-            r, p = pearsonr(sg_data["economic_need_index"], sg_data["intra_school_gap"])
-            sig = "***" if p < 0.001 else "**" if p < 0.01 else "*" if p < 0.05 else ""
-            fig_gap_eni.add_trace(go.Scatter(
-                x=sg_data["economic_need_index"],
-                y=sg_data["intra_school_gap"],
-                mode="markers",
-                marker=dict(color=SUBGROUP_COLORS[sg], size=5, opacity=0.4),
-                name=f"{sg} (r={r:.2f}{sig})",
+            r, q = gap_tests.loc[sg, ["r", "q"]]
+            sig = stars(q, ns="")
+            fig_gap_eni.add_trace(scatter_trace(
+                sg_data["economic_need_index"], sg_data["intra_school_gap"],
+                f"{sg} (r={r:.2f}{sig})", SUBGROUP_COLORS[sg],
+                size=5, opacity=0.4,
             ))
             z = np.polyfit(sg_data["economic_need_index"], sg_data["intra_school_gap"], 1)
             x_line = np.linspace(sg_data["economic_need_index"].min(),
@@ -286,19 +323,26 @@ with tab3:
             yaxis_title="Intra-School Gap (pts)",
             height=450, plot_bgcolor="white",
         )
-        st.plotly_chart(fig_gap_eni, use_container_width=True)
+        return fig_gap_eni
+
+    with c1:
+        st.plotly_chart(cached_figure("equity_gap_box", fig_sig, _build_gap_box, version),
+                        width='stretch')
+    with c2:
+        st.plotly_chart(cached_figure("equity_gap_eni", fig_sig, _build_gap_eni, version),
+                        width='stretch')
 
     # gap summary table
     st.markdown("#### Gap Summary")
+    gap_stats = rollup(cube, "intra_school_gap" + est, ["Subgroup"], cube_where)
     gap_tbl = (
-        filtered_multi.groupby("Subgroup")["intra_school_gap"]
-        .agg(["mean", "median", "std", "count"])
+        gap_stats[["mean", "median", "std", "count"]]
         .round(1)
         .rename(columns={"mean": "Mean Gap", "median": "Median Gap",
                          "std": "Std", "count": "N"})
         .sort_values("Mean Gap", ascending=False)
     )
-    st.dataframe(gap_tbl, use_container_width=True)
+    st.dataframe(gap_tbl, width='stretch')
 
     st.markdown(
         """
@@ -310,3 +354,17 @@ with tab3:
         all groups equally.
         """
     )
+
+
+# ── tabs ─────────────────────────────────────────────────────────────
+# only the selected tab runs; switching tabs reruns the page
+TABS = {
+    "CCR Distributions": distributions_tab,
+    "Stressor Impact": stressor_tab,
+    "Within-School Gaps": gaps_tab,
+}
+for tab, render in zip(st.tabs(list(TABS), key="equity_tab", on_change="rerun"),
+                       TABS.values()):
+    if tab.open:
+        with tab:
+            render()
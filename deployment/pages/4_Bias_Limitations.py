@@ -10,10 +10,16 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
-import numpy as np
-from scipy import stats
 
-from utils.data_loader import build_subgroup_data, SUBGROUP_COLORS
+from utils.data_loader import (
+    build_subgroup_data, data_version, fit_beta_model, model_payload,
+    validate_raw_tables,
+    SUBGROUP_TABLES,
+    SUBGROUP_COLORS,
+)
+from utils.cube import crosstab, get_cube, rollup
+from utils.stat_tests import N_PERM, mean_diff_tests, stars
+from utils.figures import cached_figure
 
 st.set_page_config(page_title="Bias & Limitations", page_icon="⚠️", layout="wide")
 
@@ -43,62 +49,63 @@ st.markdown(
     "means for interpretation."
 )
 
+version = data_version(SUBGROUP_TABLES)
 sg_all, reported, _ = build_subgroup_data()
-
-# ── tabs ─────────────────────────────────────────────────────────────
-tab1, tab2, tab3 = st.tabs([
-    "Data Availability",
-    "Missingness Profiles",
-    "Implications & Tradeoffs",
-])
+cube = get_cube(version)
 
 STATUS_COLORS = {"reported": "#4CAF50", "suppressed": "#FF9800", "no cohort": "#EF5350"}
 
 # =====================================================================
 # TAB 1 — Data Availability
 # =====================================================================
-with tab1:
+def availability_tab():
     st.markdown("### CCR Reporting Status by Subgroup")
 
     # counts & percentages
-    ct = pd.crosstab(sg_all["Subgroup"], sg_all["ccr_status"])
+    ct = crosstab(cube, "Subgroup", "ccr_status")
     ct_pct = ct.div(ct.sum(axis=1), axis=0) * 100
 
-    # stacked bar
-    fig_avail = go.Figure()
-    for status in ["reported", "suppressed", "no cohort"]:
-        if status not in ct_pct.columns:
-            continue
-        fig_avail.add_trace(go.Bar(
-            y=ct_pct.index,
-            x=ct_pct[status],
-            name=status,
-            orientation="h",
-            marker_color=STATUS_COLORS[status],
-            text=[f"{v:.0f}%" for v in ct_pct[status]],
-            textposition="inside",
-        ))
-    fig_avail.update_layout(
-        barmode="stack",
-        title="CCR Data Availability by Subgroup",
-        xaxis_title="% of Schools",
-        yaxis_title="",
-        height=350,
-        plot_bgcolor="white",
-        legend=dict(orientation="h", y=-0.15),
+    def _build_avail():
+        # stacked bar
+        fig_avail = go.Figure()
+        for status in ["reported", "suppressed", "no cohort"]:
+            if status not in ct_pct.columns:
+                continue
+            fig_avail.add_trace(go.Bar(
+                y=ct_pct.index,
+                x=ct_pct[status],
+                name=status,
+                orientation="h",
+                marker_color=STATUS_COLORS[status],
+                text=[f"{v:.0f}%" for v in ct_pct[status]],
+                textposition="inside",
+            ))
+        fig_avail.update_layout(
+            barmode="stack",
+            title="CCR Data Availability by Subgroup",
+            xaxis_title="% of Schools",
+            yaxis_title="",
+            height=350,
+            plot_bgcolor="white",
+            legend=dict(orientation="h", y=-0.15),
+        )
+        return fig_avail
+
+    st.plotly_chart(
+        cached_figure("bias_availability", {}, _build_avail, version),
+        width='stretch',
     )
-    st.plotly_chart(fig_avail, use_container_width=True)
 
     # raw counts table
     with st.expander("Raw counts"):
-        ct["Total"] = ct.sum(axis=1)
-        st.dataframe(ct, width='stretch')
+        st.dataframe(ct.assign(Total=ct.sum(axis=1)), width='stretch')
 
-    # headline metrics
-    total = len(sg_all)
-    n_rep  = (sg_all["ccr_status"] == "reported").sum()
-    n_sup  = (sg_all["ccr_status"] == "suppressed").sum()
-    n_nc   = (sg_all["ccr_status"] == "no cohort").sum()
+    # headline metrics, from the same cube counts as the chart
+    status = ct.sum()
+    total = int(status.sum())
+    n_rep  = int(status.get("reported", 0))
+    n_sup  = int(status.get("suppressed", 0))
+    n_nc   = int(status.get("no cohort", 0))
 
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Total Records", total)
@@ -120,10 +127,83 @@ with tab1:
         """
     )
 
+    # load-time validation
+    with st.expander("Load-time data validation"):
+        validation = validate_raw_tables()
+        report = validation["report"]
+        flagged = report[report["status"] != "ok"]
+        excluded = model_payload(fit_beta_model(), "excluded")
+
+        v1, v2, v3 = st.columns(3)
+        v1.metric("Checks Run", len(report))
+        v2.metric("Quarantined Rows",
+                  len(validation["quarantine"].drop_duplicates(["table", "row"])))
+        v3.metric("Excluded from Model", len(excluded))
+
+        if flagged.empty:
+            st.success("All range, format, key and reference checks passed.")
+        else:
+            st.dataframe(flagged, width='stretch', hide_index=True)
+        if not validation["quarantine"].empty:
+            st.markdown("**Quarantined rows**")
+            st.dataframe(validation["quarantine"], width='stretch', hide_index=True)
+        st.markdown(
+            "**Schools excluded from the model** (still incomplete after "
+            "district-median imputation)"
+        )
+        st.dataframe(excluded, width='stretch', hide_index=True)
+
 # =====================================================================
 # TAB 2 — Missingness Profiles
 # =====================================================================
-with tab2:
+COMPARE_VARS = {
+    "economic_need_index": "Economic Need Index",
+    "avg_student_attendance": "Avg Student Attendance",
+    "percent_temp_housing": "% Temporary Housing",
+    "student_percent": "Subgroup Student %",
+}
+SUBGROUPS = ["Asian", "Black", "Hispanic", "White"]
+
+
+@st.fragment
+def profile_chart():
+    """Re-runs on its own when the variable changes."""
+    sel_var = st.selectbox(
+        "Select variable to compare",
+        list(COMPARE_VARS.keys()),
+        format_func=lambda k: COMPARE_VARS[k],
+    )
+
+    statuses  = ["reported", "suppressed", "no cohort"]
+
+    def _build_comp():
+        fig_comp = go.Figure()
+        var_means = rollup(cube, sel_var, ["Subgroup", "ccr_status"])["mean"]
+
+        for j, status in enumerate(statuses):
+            means = [round(var_means.get((sg, status), 0), 4) for sg in SUBGROUPS]
+            fig_comp.add_trace(go.Bar(
+                x=SUBGROUPS, y=means, name=status,
+                marker_color=STATUS_COLORS[status],
+                text=[f"{m:.3f}" for m in means],
+                textposition="outside",
+            ))
+
+        fig_comp.update_layout(
+            barmode="group",
+            title=f"{COMPARE_VARS[sel_var]}: Reported vs Suppressed vs No Cohort",
+            yaxis_title=COMPARE_VARS[sel_var],
+            height=450, plot_bgcolor="white",
+        )
+        return fig_comp
+
+    st.plotly_chart(
+        cached_figure("bias_profile", dict(var=sel_var), _build_comp, version),
+        width='stretch',
+    )
+
+
+def missingness_tab():
     st.markdown("### Are Suppressed Schools Different?")
     st.markdown(
         "We compare the **school-level profiles** of schools where a "
@@ -131,68 +211,34 @@ with tab2:
         "the missingness is systematically biased."
     )
 
-    compare_vars = {
-        "economic_need_index": "Economic Need Index",
-        "avg_student_attendance": "Avg Student Attendance",
-        "percent_temp_housing": "% Temporary Housing",
-        "student_percent": "Subgroup Student %",
-    }
-
-    sel_var = st.selectbox(
-        "Select variable to compare",
-        list(compare_vars.keys()),
-        format_func=lambda k: compare_vars[k],
-    )
+    profile_chart()
 
-    fig_comp = go.Figure()
-    subgroups = ["Asian", "Black", "Hispanic", "White"]
-    statuses  = ["reported", "suppressed", "no cohort"]
-    bar_width = 0.25
-
-    for j, status in enumerate(statuses):
-        means = []
-        for sg in subgroups:
-            sub = sg_all[(sg_all["Subgroup"] == sg) & (sg_all["ccr_status"] == status)]
-            val = sub[sel_var].mean() if len(sub) > 0 and sub[sel_var].notna().sum() > 0 else 0
-            means.append(round(val, 4))
-        fig_comp.add_trace(go.Bar(
-            x=subgroups, y=means, name=status,
-            marker_color=STATUS_COLORS[status],
-            text=[f"{m:.3f}" for m in means],
-            textposition="outside",
-        ))
-
-    fig_comp.update_layout(
-        barmode="group",
-        title=f"{compare_vars[sel_var]}: Reported vs Suppressed vs No Cohort",
-        yaxis_title=compare_vars[sel_var],
-        height=450, plot_bgcolor="white",
+    # permutation-test table
+    st.markdown("#### Statistical Test: Reported vs Suppressed")
+    test_cols = ["economic_need_index", "avg_student_attendance", "percent_temp_housing"]
+    tests = mean_diff_tests(
+        sg_all[["Subgroup", "ccr_status", *test_cols]], test_cols,
+        "Subgroup", SUBGROUPS, "ccr_status", "reported", "suppressed",
     )
-    st.plotly_chart(fig_comp, use_container_width=True)
 
-    # t-test table
-    st.markdown("#### Statistical Test: Reported vs Suppressed")
-    test_rows = []
-    for sg in subgroups:
-        for col in ["economic_need_index", "avg_student_attendance", "percent_temp_housing"]:
-            rep = sg_all[(sg_all["Subgroup"] == sg) & (sg_all["ccr_status"] == "reported")][col].dropna()
-            sup = sg_all[(sg_all["Subgroup"] == sg) & (sg_all["ccr_status"] == "suppressed")][col].dropna()
-            if len(rep) >= 5 and len(sup) >= 5:
-                t, p = stats.ttest_ind(rep, sup)
-                sig = "***" if p < 0.001 else "**" if p < 0.01 else "*" if p < 0.05 else "ns"
-                test_rows.append(dict(
-                    Subgroup=sg,
-                    Variable=compare_vars.get(col, col),
-                    Reported_Mean=round(rep.mean(), 3),
-                    Suppressed_Mean=round(sup.mean(), 3),
-                    Diff=round(sup.mean() - rep.mean(), 3),
-                    t_stat=round(t, 2),
-                    p_value=round(p, 4),
-                    Sig=sig,
-                ))
-
-    if test_rows:
-        st.dataframe(pd.DataFrame(test_rows), width='stretch', hide_index=True)
+    if not tests.empty:
+        st.dataframe(
+            pd.DataFrame(dict(
+                Subgroup=tests["group"],
+                Variable=tests["variable"].map(COMPARE_VARS),
+                Reported_Mean=tests["mean_a"].round(3),
+                Suppressed_Mean=tests["mean_b"].round(3),
+                Diff=tests["diff"].round(3),
+                p_perm=tests["p"].round(4),
+                q_fdr=tests["q"].round(4),
+                Sig=tests["q"].map(stars),
+            )),
+            width='stretch', hide_index=True,
+        )
+        st.caption(
+            f"p from {N_PERM:,} permutations of the reported/suppressed labels; "
+            "q is Benjamini–Hochberg FDR-adjusted across the whole table."
+        )
     else:
         st.info("Insufficient data for statistical comparison.")
 
@@ -208,7 +254,7 @@ with tab2:
 # =====================================================================
 # TAB 3 — Implications & Tradeoffs
 # =====================================================================
-with tab3:
+def implications_tab():
     st.markdown("### Why Data is Suppressed")
 
     st.markdown(
@@ -236,9 +282,12 @@ with tab3:
         | **Impute suppressed** |Lower — estimated values |All schools included |
         | **Aggregate subgroups** |Loses nuance |More reportable groups |
 
-        This dashboard uses **reported data only** — the most precise
-        approach, but one that systematically excludes the highest-need
-        schools for small subgroups.
+        By default this dashboard uses **reported data only** — the most
+        precise approach, but one that systematically excludes the
+        highest-need schools for small subgroups.  The Equity Analysis
+        page can optionally fill suppressed cells with empirical-Bayes
+        estimates (pooled toward each school's overall CCR and the
+        subgroup's borough gap), trading precision for representation.
         """
     )
 
@@ -271,3 +320,17 @@ with tab3:
         "significant disparities. The data we can't see likely "
         "makes those disparities even starker."
     )
+
+
+# ── tabs ─────────────────────────────────────────────────────────────
+# only the selected tab runs; switching tabs reruns the page
+TABS = {
+    "Data Availability": availability_tab,
+    "Missingness Profiles": missingness_tab,
+    "Implications & Tradeoffs": implications_tab,
+}
+for tab, render in zip(st.tabs(list(TABS), key="bias_tab", on_change="rerun"),
+                       TABS.values()):
+    if tab.open:
+        with tab:
+            render()
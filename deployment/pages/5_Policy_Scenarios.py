@@ -0,0 +1,125 @@
+"""
+Page 5 — Policy Scenarios
+City-wide what-ifs: transform features for every school, re-score, and
+compare predicted CCR against the baseline.
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+import plotly.graph_objects as go
+
+from utils.data_loader import BOROUGHS
+from utils.scenarios import (
+    run_scenarios, PRESET_SCENARIOS, SCENARIO_FEATURES, SCENARIO_OPS,
+)
+
+st.set_page_config(page_title="Policy Scenarios", layout="wide")
+
+st.markdown(
+    """
+    <style>
+    html, body, [class*="css"] {
+        font-size: 17px;
+    }
+    h1 { font-size: 2.2rem !important; }
+    h2 { font-size: 1.7rem !important; }
+    h3 { font-size: 1.35rem !important; }
+    h4 { font-size: 1.15rem !important; }
+    .stMetricValue { font-size: 1.9rem !important; }
+    .stMetricLabel { font-size: 0.95rem !important; }
+    .stTabs [data-baseweb="tab"] { font-size: 1.05rem !important; }
+    </style>
+    """,
+    unsafe_allow_html=True,
+)
+
+st.title("Policy Scenario Simulator")
+st.markdown(
+    "Apply a change to **every school** (or one borough), re-score all "
+    "schools with the beta model, and see how the **average predicted CCR** "
+    "moves. Intervals are 95 % ranges of the mean change over draws of "
+    "the model coefficients."
+)
+
+FEATURE_LABELS = {
+    "economic_need_index": "Economic Need Index",
+    "percent_temp_housing": "% Temporary Housing",
+    "teaching_environment_pct_positive": "Teaching Environment",
+    "avg_student_attendance": "Avg Student Attendance",
+    "student_support_pct": "Student Support",
+}
+OP_LABELS = {
+    "shift": "Add (+/−)",
+    "scale": "Multiply by",
+    "cap": "Cap at most",
+    "floor": "Raise to at least",
+    "set": "Set to",
+}
+
+# ── custom scenario ──────────────────────────────────────────────────
+st.sidebar.header("Custom Scenario")
+feat = st.sidebar.selectbox("Feature", list(SCENARIO_FEATURES),
+                            format_func=lambda k: FEATURE_LABELS[k])
+op = st.sidebar.selectbox("Change", SCENARIO_OPS, format_func=lambda k: OP_LABELS[k])
+default = {"shift": 0.03, "scale": 0.5, "cap": 0.10, "floor": 0.80, "set": 0.90}[op]
+value = st.sidebar.number_input("Value (fractions, e.g. 0.03 = 3 pts)",
+                                value=default, step=0.01, format="%.3f")
+boroughs = st.sidebar.multiselect("Only in boroughs (empty = all)", BOROUGHS)
+
+custom = dict(
+    name=f"Custom: {FEATURE_LABELS[feat]} {OP_LABELS[op].lower()} {value:g}"
+         + (f" ({', '.join(boroughs)})" if boroughs else ""),
+    steps=[dict(feature=feat, op=op, value=value, borough=boroughs)],
+)
+
+scenarios = [custom] + PRESET_SCENARIOS
+summary, results = run_scenarios(scenarios)
+
+# ── results ──────────────────────────────────────────────────────────
+c1, c2, c3 = st.columns(3)
+cs = summary.iloc[0]
+c1.metric("Schools Targeted", int(cs["Schools_Targeted"]))
+c2.metric("Avg Predicted CCR", f"{cs['Scenario_CCR']:.1f} %",
+          delta=f"{cs['Change']:+.2f} pts")
+c3.metric("95 % Interval", f"{cs['CI_Low']:+.2f} to {cs['CI_High']:+.2f}")
+
+fig = go.Figure(go.Bar(
+    y=summary["Scenario"][::-1],
+    x=summary["Change"][::-1],
+    orientation="h",
+    marker_color=["#4CAF50" if v > 0 else "#EF5350" for v in summary["Change"][::-1]],
+    error_x=dict(
+        type="data", symmetric=False,
+        array=(summary["CI_High"] - summary["Change"])[::-1],
+        arrayminus=(summary["Change"] - summary["CI_Low"])[::-1],
+    ),
+    text=[f"{v:+.2f}" for v in summary["Change"][::-1]],
+    textposition="outside",
+))
+fig.add_vline(x=0, line_dash="dash", line_color="black", line_width=1)
+fig.update_layout(
+    title="Change in Average Predicted CCR (% pts)",
+    xaxis_title="Change vs baseline",
+    height=380,
+    margin=dict(l=20, r=20, t=50, b=40),
+    plot_bgcolor="white",
+)
+st.plotly_chart(fig, width='stretch')
+
+st.dataframe(summary.drop(columns="Hash"), width='stretch', hide_index=True)
+
+st.markdown("#### Custom Scenario by Borough")
+st.dataframe(results[0]["by_borough"], width='stretch')
+
+with st.expander("ℹ️  How scenarios are computed"):
+    st.markdown(
+        """
+        Each change is applied to the raw school-level features, values
+        are kept within 0 – 1, and the derived model inputs (log housing,
+        ENI × teaching) are recomputed before re-scoring. Results show
+        association under the fitted model, **not** causal effects.
+        """
+    )
@@ -0,0 +1,112 @@
+"""
+Page 6 — District Map
+Choropleth of district / borough averages (actual and predicted CCR,
+residual, within-school subgroup gaps) over the cached geometry layer.
+"""
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+import plotly.graph_objects as go
+
+from utils.data_loader import (
+    data_version, fit_beta_model, model_version, SUBGROUP_COLORS, GEO_TABLES,
+    SUBGROUP_TABLES,
+)
+from utils.geo import area_summary, get_geometry
+from utils.figures import cached_figure
+
+st.set_page_config(page_title="District Map", layout="wide")
+
+st.markdown(
+    """
+    <style>
+    html, body, [class*="css"] {
+        font-size: 17px;
+    }
+    h1 { font-size: 2.2rem !important; }
+    h2 { font-size: 1.7rem !important; }
+    h3 { font-size: 1.35rem !important; }
+    h4 { font-size: 1.15rem !important; }
+    .stMetricValue { font-size: 1.9rem !important; }
+    .stMetricLabel { font-size: 0.95rem !important; }
+    .stTabs [data-baseweb="tab"] { font-size: 1.05rem !important; }
+    </style>
+    """,
+    unsafe_allow_html=True,
+)
+
+st.title("District Map")
+st.markdown(
+    "School-level results averaged over each **community school district** "
+    "(or borough). Areas are approximate — drawn from the catchment of the "
+    "district's schools — and charter schools (district 84) are counted in "
+    "the district they sit in."
+)
+
+METRICS = {
+    "actual_ccr":    ("Mean actual CCR (%)", "Viridis", None),
+    "predicted_ccr": ("Mean predicted CCR (%)", "Viridis", None),
+    "residual":      ("Mean residual (actual − predicted, pts)", "RdBu", 0),
+}
+for sg in SUBGROUP_COLORS:
+    METRICS[f"gap_{sg}"] = (f"Mean within-school gap — {sg} (pts)", "RdBu", 0)
+
+# ── controls ─────────────────────────────────────────────────────────
+st.sidebar.header("Map")
+level = st.sidebar.radio("Areas", ["district", "borough"], format_func=str.title)
+metric = st.sidebar.selectbox("Measure", list(METRICS),
+                              format_func=lambda k: METRICS[k][0])
+
+version = data_version(SUBGROUP_TABLES)
+geometry = get_geometry(data_version(GEO_TABLES))
+summary = area_summary(version, level)
+
+# ── map ──────────────────────────────────────────────────────────────
+def _build_map():
+    label, scale, mid = METRICS[metric]
+    layer = geometry["layers"][level]
+    values = summary[metric].dropna()
+    text = [
+        f"{'District ' if level == 'district' else ''}{i}"
+        f"<br>{n} schools" for i, n in zip(values.index, summary.loc[values.index, "n_schools"])
+    ]
+    fig = go.Figure(go.Choroplethmap(
+        geojson=layer,
+        locations=values.index,
+        z=values.to_numpy(),
+        text=text,
+        colorscale=scale,
+        zmid=mid,
+        marker=dict(opacity=0.75, line=dict(width=1, color="white")),
+        colorbar=dict(title=label.split(" (")[0].replace("Mean ", "")),
+        hovertemplate="%{text}<br>" + label + ": %{z:.1f}<extra></extra>",
+    ))
+    fig.update_layout(
+        map=dict(style="carto-positron", center=dict(lat=40.70, lon=-73.95), zoom=9.3),
+        height=650,
+        margin=dict(l=0, r=0, t=10, b=0),
+    )
+    return fig
+
+st.plotly_chart(
+    cached_figure(
+        "area_map",
+        dict(level=level, metric=metric, fit=model_version(fit_beta_model())),
+        _build_map, version,
+    ),
+    width='stretch',
+)
+
+# ── table ────────────────────────────────────────────────────────────
+st.markdown("### Area Summary")
+table = summary.rename_axis(level.title()).rename(
+    columns={k: v[0] for k, v in METRICS.items()} | {"n_schools": "Schools"}
+)
+st.dataframe(table.round(1), width='stretch')
+st.caption(
+    "Gaps are subgroup CCR minus school-wide CCR, averaged over schools "
+    "reporting at least two subgroups; blank cells have no such schools."
+)
@@ -0,0 +1,333 @@
+"""
+Embedded analytics engine over the star schema.
+Runs the dashboard's aggregations — the analyst queries of
+``sql/db_queries.sql``, subgroup crosstabs and group summaries, and the
+district-median imputation of the model pipeline — as SQL in DuckDB's
+vectorized, multi-threaded executor, returning Arrow-backed frames.  DuckDB
+is optional (``pip install duckdb``); without it every named query runs
+through the equivalent pandas code, which is also the benchmark baseline.
+
+The engine loads the validated tables in memory, a Parquet snapshot of
+them, or attaches the SQLite file directly (raw tables; needs DuckDB's
+sqlite extension).  Benchmark both paths on replicated tables or write a
+snapshot (from ``deployment/``):
+    python -m utils.analytics --scale 1 10 50
+    python -m utils.analytics --snapshot
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from utils.data_loader import (
+    ARTIFACT_DIR, DB_PATH, RAW_TABLES, data_version, load_clean_tables,
+)
+
+try:
+    import duckdb
+except ImportError:          # optional: named queries fall back to pandas
+    duckdb = None
+
+SNAPSHOT_DIR = ARTIFACT_DIR / "snapshot"
+SCALES = (1, 10, 50)
+
+IMPUTE_COLS = [
+    "economic_need_index", "percent_temp_housing",
+    "teaching_environment_pct_positive", "avg_student_attendance",
+    "metric_value_4yr_ccr_all_students",
+]
+
+
+# ── named queries (SQL + pandas equivalent) ──────────────────────────
+def _schools_per_borough(t):
+    return (
+        t["dim_location"].groupby("borough").size()
+        .rename("count_of_schools").sort_values(ascending=False).reset_index()
+    )
+
+
+def _rating_counts(t):
+    rating = "instruction_performance_rating"
+    df = t["dim_environment"].merge(t["dim_location"], on="DBN").dropna(subset=[rating])
+    return df.groupby(["borough", rating]).size().rename("performance_groups").reset_index()
+
+
+def _ccr_status(fact):
+    return np.where(
+        fact["ccr_rate"].notna(), "reported",
+        np.where(fact["n_count_ccr"].notna(), "suppressed", "no cohort"),
+    )
+
+
+def _subgroup_status(t):
+    df = t["fact_school_outcomes"].merge(
+        t["dim_location"][["DBN", "borough"]], on="DBN", how="left",
+    )
+    df["ccr_status"] = _ccr_status(df)
+    return (
+        df.groupby(["borough", "Subgroup", "ccr_status"], dropna=False).size()
+        .rename("n").reset_index()
+    )
+
+
+def _ccr_by_district(t):
+    df = t["fact_school_outcomes"].merge(
+        t["dim_location"][["DBN", "borough", "district"]], on="DBN",
+    )
+    df["ccr_pct"] = df["ccr_rate"] * 100
+    out = df.groupby(["borough", "district", "Subgroup"])["ccr_pct"].agg(
+        ["count", "mean", "median", "std", "min", "max"]
+    )
+    return out.reset_index()
+
+
+def _district_median_impute(t):
+    df = t["dim_environment"][["DBN"] + IMPUTE_COLS].merge(
+        t["dim_location"][["DBN", "district"]], on="DBN",
+    )
+    for col in IMPUTE_COLS:
+        df[col] = df[col].fillna(df.groupby("district")[col].transform("median"))
+    return df[["DBN", "district"] + IMPUTE_COLS]
+
+
+_IMPUTE_SQL = ",\n        ".join(
+    f"COALESCE(e.{c}, MEDIAN(e.{c}) OVER (PARTITION BY l.district)) AS {c}"
+    for c in IMPUTE_COLS
+)
+
+QUERIES = {
+    "schools_per_borough": dict(
+        sql="""
+        SELECT borough, COUNT(*) AS count_of_schools
+        FROM dim_location
+        GROUP BY borough
+        ORDER BY count_of_schools DESC
+        """,
+        pandas=_schools_per_borough,
+    ),
+    "rating_counts": dict(
+        sql="""
+        WITH cte AS (
+            SELECT * FROM dim_environment e JOIN dim_location l ON e.DBN = l.DBN
+        )
+        SELECT borough, instruction_performance_rating,
+               COUNT(instruction_performance_rating) AS performance_groups
+        FROM cte
+        WHERE instruction_performance_rating IS NOT NULL
+        GROUP BY borough, instruction_performance_rating
+        """,
+        pandas=_rating_counts,
+    ),
+    "subgroup_status": dict(
+        sql="""
+        SELECT l.borough, f.Subgroup,
+               CASE WHEN f.ccr_rate IS NOT NULL THEN 'reported'
+                    WHEN f.n_count_ccr IS NOT NULL THEN 'suppressed'
+                    ELSE 'no cohort' END AS ccr_status,
+               COUNT(*) AS n
+        FROM fact_school_outcomes f
+        LEFT JOIN dim_location l ON f.DBN = l.DBN
+        GROUP BY ALL
+        """,
+        pandas=_subgroup_status,
+    ),
+    "ccr_by_district": dict(
+        sql="""
+        SELECT l.borough, l.district, f.Subgroup,
+               COUNT(f.ccr_rate) AS count,
+               AVG(f.ccr_rate * 100) AS mean,
+               MEDIAN(f.ccr_rate * 100) AS median,
+               STDDEV_SAMP(f.ccr_rate * 100) AS std,
+               MIN(f.ccr_rate * 100) AS min,
+               MAX(f.ccr_rate * 100) AS max
+        FROM fact_school_outcomes f
+        JOIN dim_location l ON f.DBN = l.DBN
+        GROUP BY ALL
+        """,
+        pandas=_ccr_by_district,
+    ),
+    "district_median_impute": dict(
+        sql=f"""
+        SELECT e.DBN, l.district,
+        {_IMPUTE_SQL}
+        FROM dim_environment e
+        JOIN dim_location l ON e.DBN = l.DBN
+        """,
+        pandas=_district_median_impute,
+    ),
+}
+
+
+# ── engine ───────────────────────────────────────────────────────────
+def _arrow_frame(result):
+    table = result.arrow()
+    if isinstance(table, pa.RecordBatchReader):
+        table = table.read_all()
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+class AnalyticsEngine:
+    """Runs ``QUERIES`` (and, with DuckDB, ad-hoc SQL) over the tables."""
+
+    def __init__(self, tables, engine=None, threads=None):
+        self.engine = engine or ("duckdb" if duckdb is not None else "pandas")
+        self.tables = tables
+        self.con = None
+        if self.engine == "duckdb":
+            self.con = self._connect(threads)
+            for name, df in tables.items():
+                arrow = pa.Table.from_pandas(df, preserve_index=False)
+                self.con.execute(f"CREATE TABLE {name} AS SELECT * FROM arrow")
+
+    @staticmethod
+    def _connect(threads):
+        if duckdb is None:
+            raise ImportError("the duckdb engine needs `pip install duckdb`")
+        con = duckdb.connect()
+        if threads:
+            con.execute(f"SET threads = {int(threads)}")
+        return con
+
+    @classmethod
+    def from_parquet(cls, path=SNAPSHOT_DIR, engine=None, threads=None):
+        """Engine over a snapshot written by ``write_snapshot``."""
+        names = json.loads((path / "meta.json").read_text())["tables"]
+        if (engine or ("duckdb" if duckdb is not None else "pandas")) == "pandas":
+            return cls({n: pd.read_parquet(path / f"{n}.parquet") for n in names},
+                       engine="pandas")
+        self = cls({}, engine="duckdb", threads=threads)
+        for n in names:
+            file = str(path / f"{n}.parquet").replace("'", "''")
+            self.con.execute(f"CREATE VIEW {n} AS SELECT * FROM read_parquet('{file}')")
+        return self
+
+    @classmethod
+    def from_sqlite(cls, db_path=DB_PATH, threads=None):
+        """DuckDB engine attached read-only to the SQLite file (raw,
+        unvalidated tables; ``env_csv`` is not in the database)."""
+        self = cls({}, engine="duckdb", threads=threads)
+        self.con.execute("INSTALL sqlite")
+        self.con.execute("LOAD sqlite")
+        self.con.execute(f"ATTACH '{db_path}' AS cid (TYPE sqlite, READ_ONLY)")
+        for n in RAW_TABLES:
+            if n != "env_csv":
+                self.con.execute(f"CREATE VIEW {n} AS SELECT * FROM cid.{n}")
+        return self
+
+    def sql(self, query, params=None):
+        """Run ad-hoc SQL; returns an Arrow-backed frame."""
+        if self.con is None:
+            raise RuntimeError("ad-hoc SQL needs the duckdb engine")
+        # one cursor per call: the connection is shared across sessions
+        with self.con.cursor() as cur:
+            return _arrow_frame(cur.execute(query, params))
+
+    def run(self, name):
+        """Result of the named query in ``QUERIES``."""
+        spec = QUERIES[name]
+        if self.con is None:
+            return spec["pandas"](self.tables)
+        return self.sql(spec["sql"])
+
+
+@st.cache_resource(show_spinner="Starting analytics engine…", max_entries=2)
+def get_engine(version):
+    """Engine over the validated tables at data *version*."""
+    return AnalyticsEngine(dict(zip(RAW_TABLES, load_clean_tables())))
+
+
+def write_snapshot(tables, path=SNAPSHOT_DIR, key=None):
+    """Write *tables* (``{name: frame}``) as a Parquet snapshot."""
+    path.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        df.to_parquet(path / f"{name}.parquet", index=False)
+    (path / "meta.json").write_text(json.dumps(dict(key=key, tables=list(tables))))
+
+
+# ── benchmark ────────────────────────────────────────────────────────
+def scaled_tables(scale):
+    """The validated tables with every school repeated *scale* times
+    under distinct DBNs."""
+    tables = dict(zip(RAW_TABLES, load_clean_tables()))
+    if scale == 1:
+        return tables
+    return {
+        name: pd.concat([df.assign(DBN=df["DBN"] + f"-{i}") for i in range(scale)],
+                        ignore_index=True)
+        for name, df in tables.items()
+    }
+
+
+def _same(a, b):
+    """Order-insensitive equality of two query results (Arrow nulls and
+    NaN compare equal)."""
+    keys = [c for c in a.columns if not pd.api.types.is_float_dtype(a[c])]
+
+    def _plain(df):
+        df = df[list(a.columns)].astype({
+            c: "float64" if c not in keys else object for c in a.columns
+        })
+        return df.sort_values(keys, ignore_index=True)
+
+    try:
+        pd.testing.assert_frame_equal(_plain(a), _plain(b), check_dtype=False,
+                                      check_exact=False, rtol=1e-9)
+        return True
+    except AssertionError:
+        return False
+
+
+def run_benchmark(scales=SCALES, repeats=3):
+    """Best-of-*repeats* seconds per query and engine at each scale, and
+    whether the two engines agree."""
+    if duckdb is None:
+        raise ImportError("the benchmark compares against duckdb: `pip install duckdb`")
+    rows = []
+    for scale in scales:
+        tables = scaled_tables(scale)
+        engines = {}
+        for kind in ("pandas", "duckdb"):
+            start = time.perf_counter()
+            engines[kind] = AnalyticsEngine(tables, engine=kind)
+            rows.append(dict(scale=scale, rows=len(tables["fact_school_outcomes"]),
+                             query="(load)", engine=kind,
+                             seconds=time.perf_counter() - start))
+        for name in QUERIES:
+            results = {}
+            for kind, eng in engines.items():
+                best = np.inf
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    results[kind] = eng.run(name)
+                    best = min(best, time.perf_counter() - start)
+                rows.append(dict(scale=scale, rows=len(tables["fact_school_outcomes"]),
+                                 query=name, engine=kind, seconds=best))
+            rows[-1]["match"] = rows[-2]["match"] = _same(results["pandas"],
+                                                          results["duckdb"])
+    board = pd.DataFrame(rows)
+    return board.pivot_table(index=["scale", "rows", "query"], columns="engine",
+                             values="seconds").assign(
+        speedup=lambda d: d["pandas"] / d["duckdb"],
+        match=board.groupby(["scale", "rows", "query"])["match"].first(),
+    ).reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, nargs="+", default=list(SCALES),
+                        help="row multipliers to benchmark")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="write the Parquet snapshot instead of benchmarking")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        write_snapshot(dict(zip(RAW_TABLES, load_clean_tables())), key=data_version())
+        print(f"Snapshot of {len(RAW_TABLES)} tables → {SNAPSHOT_DIR}")
+    else:
+        pd.set_option("display.width", 120)
+        print(run_benchmark(args.scale).round(4).to_string(index=False))
@@ -0,0 +1,295 @@
+"""
+Pre-aggregated subgroup cube for dashboard summaries.
+One cell per (borough, district, Subgroup, ccr_status[, school_year]) holding
+mergeable moments (count, sum, sum of squares, min, max) of each measure,
+plus a quantized value histogram for medians.  Any filter selection is
+answered by rolling cells up instead of scanning the row-level fact table.
+
+When the data changes, only the cells touched by schools whose rows
+changed are recomputed and the cube is re-persisted.  Refresh after a load
+(from ``deployment/``):
+    python -m utils.cube
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import (
+    ARTIFACT_DIR, SUBGROUP_TABLES, data_version, load_clean_tables, within_school_gaps,
+)
+from utils.imputation import build_imputed_subgroup_data
+
+CUBE_DIR = ARTIFACT_DIR / "subgroup_cube"
+
+# school_year is used when the fact table carries it (single year today)
+CUBE_DIMS = ["borough", "district", "Subgroup", "ccr_status", "school_year"]
+
+# measure → sketch resolution (None: moments only)
+CUBE_MEASURES = {
+    "ccr_pct":                0.1,
+    "ccr_pct_est":            0.01,
+    "intra_school_gap":       0.1,
+    "intra_school_gap_est":   0.01,
+    "economic_need_index":    None,
+    "avg_student_attendance": None,
+    "percent_temp_housing":   None,
+    "student_percent":        None,
+}
+
+
+# ── row-level input ──────────────────────────────────────────────────
+def cube_rows(version):
+    """Row-level subgroup table with every cube dimension and measure.
+
+    ``*_est`` measures follow the Equity page's estimates toggle:
+    reported cells at their published CCR plus suppressed cells at their
+    empirical-Bayes estimate.
+    """
+    _, dim_loc, _, _, _ = load_clean_tables()
+    sg_est, analysis, multi_est = build_imputed_subgroup_data(version)
+
+    # schools without a district in dim_location cannot be placed in a cell
+    rows = sg_est.merge(dim_loc[["DBN", "district"]].dropna(), on="DBN", how="inner")
+    rows["district"] = rows["district"].astype(int)
+    rows["ccr_pct_est"] = np.where(
+        rows["ccr_source"].notna(), rows["ccr_pct"].fillna(rows["ccr_est"]), np.nan,
+    )
+
+    multi = within_school_gaps(analysis[~analysis["is_imputed"]])
+    keys = ["DBN", "Subgroup"]
+    rows = rows.merge(multi[keys + ["intra_school_gap"]], on=keys, how="left")
+    rows = rows.merge(
+        multi_est[keys + ["intra_school_gap"]].rename(
+            columns={"intra_school_gap": "intra_school_gap_est"}),
+        on=keys, how="left",
+    )
+    dims = [d for d in CUBE_DIMS if d in rows.columns]
+    return rows[["DBN"] + dims + list(CUBE_MEASURES)]
+
+
+def _dims(rows):
+    return [d for d in CUBE_DIMS if d in rows.columns]
+
+
+def _fingerprints(rows):
+    """One hash per school over all of its cube rows."""
+    h = pd.util.hash_pandas_object(rows, index=False)
+    return h.groupby(rows["DBN"]).sum()
+
+
+# ── aggregation ──────────────────────────────────────────────────────
+def _aggregate(rows, dims):
+    """Cells and sketches for *rows* (any subset of whole cells)."""
+    parts = {}
+    for m in CUBE_MEASURES:
+        v = rows[m].to_numpy(dtype=float)
+        ok = ~np.isnan(v)
+        parts[f"{m}__n"] = ok.astype(np.int64)
+        parts[f"{m}__sum"] = np.where(ok, v, 0.0)
+        parts[f"{m}__sumsq"] = np.where(ok, v * v, 0.0)
+        parts[f"{m}__min"] = v
+        parts[f"{m}__max"] = v
+    frame = pd.concat(
+        [rows[dims].reset_index(drop=True), pd.DataFrame(parts)], axis=1,
+    )
+    how = {c: c.rsplit("__", 1)[1] for c in parts}
+    how = {c: "sum" if f in ("n", "sumsq") else f for c, f in how.items()}
+    g = frame.groupby(dims, sort=True)
+    cells = g.agg(how)
+    cells.insert(0, "rows", g.size())
+
+    sketch = []
+    for m, res in CUBE_MEASURES.items():
+        if res is None:
+            continue
+        sub = rows.loc[rows[m].notna(), dims].copy()
+        sub["measure"] = m
+        sub["bin"] = np.round(rows.loc[rows[m].notna(), m] / res).astype(np.int64)
+        sketch.append(sub.groupby(dims + ["measure", "bin"]).size().rename("count"))
+    sketch = pd.concat(sketch).reset_index().sort_values(
+        dims + ["measure", "bin"], ignore_index=True,
+    )
+    return cells.reset_index(), sketch
+
+
+def build_cube(rows, key=None):
+    """Build the full cube from row-level *rows*."""
+    dims = _dims(rows)
+    cells, sketch = _aggregate(rows, dims)
+    return dict(
+        key=key,
+        dims=dims,
+        cells=cells,
+        sketch=sketch,
+        members=rows[["DBN"] + dims].drop_duplicates().reset_index(drop=True),
+        fingerprints=_fingerprints(rows),
+    )
+
+
+def refresh_cube(cube, rows, key=None):
+    """Bring *cube* up to date with *rows*, recomputing only the cells
+    that contain a school whose rows were added, removed or changed.
+
+    Returns ``(cube, n_dirty_cells)``.
+    """
+    dims = cube["dims"]
+    if dims != _dims(rows):
+        new = build_cube(rows, key)
+        return new, len(new["cells"])
+
+    fp_old, fp_new = cube["fingerprints"], _fingerprints(rows)
+    both = fp_old.index.intersection(fp_new.index)
+    changed = (
+        fp_old.index.symmetric_difference(fp_new.index)
+        .union(both[fp_old[both].to_numpy() != fp_new[both].to_numpy()])
+    )
+
+    members = rows[["DBN"] + dims].drop_duplicates().reset_index(drop=True)
+    dirty = pd.concat([
+        cube["members"].loc[cube["members"]["DBN"].isin(changed), dims],
+        members.loc[members["DBN"].isin(changed), dims],
+    ]).drop_duplicates()
+
+    if len(dirty):
+        def _clean(frame):
+            hit = frame[dims].merge(dirty, on=dims, how="left", indicator=True)
+            return frame[(hit["_merge"] == "left_only").to_numpy()]
+
+        cells, sketch = _aggregate(rows.merge(dirty, on=dims), dims)
+        cube = dict(
+            cube,
+            cells=pd.concat([_clean(cube["cells"]), cells])
+            .sort_values(dims).reset_index(drop=True),
+            sketch=pd.concat([_clean(cube["sketch"]), sketch])
+            .sort_values(dims + ["measure", "bin"]).reset_index(drop=True),
+        )
+    cube = dict(cube, key=key, members=members, fingerprints=fp_new)
+    return cube, len(dirty)
+
+
+# ── persist ──────────────────────────────────────────────────────────
+def save_cube(cube, path=CUBE_DIR):
+    """Write the cube next to the other model artifacts."""
+    path.mkdir(parents=True, exist_ok=True)
+    cube["cells"].to_parquet(path / "cells.parquet", index=False)
+    cube["sketch"].to_parquet(path / "sketch.parquet", index=False)
+    cube["members"].to_parquet(path / "members.parquet", index=False)
+    cube["fingerprints"].rename("fingerprint").to_frame().to_parquet(
+        path / "fingerprints.parquet"
+    )
+    (path / "meta.json").write_text(json.dumps(dict(key=cube["key"], dims=cube["dims"])))
+
+
+def load_cube(path=CUBE_DIR):
+    """Read a persisted cube, or return None if it does not exist."""
+    if not (path / "meta.json").exists():
+        return None
+    meta = json.loads((path / "meta.json").read_text())
+    return dict(
+        key=meta["key"],
+        dims=meta["dims"],
+        cells=pd.read_parquet(path / "cells.parquet"),
+        sketch=pd.read_parquet(path / "sketch.parquet"),
+        members=pd.read_parquet(path / "members.parquet"),
+        fingerprints=pd.read_parquet(path / "fingerprints.parquet")["fingerprint"],
+    )
+
+
+def update_cube(version):
+    """Load the persisted cube, refresh it for data *version* if needed
+    and re-persist.  Returns ``(cube, n_dirty_cells)``."""
+    cube = load_cube()
+    if cube is not None and cube["key"] == version:
+        return cube, 0
+    rows = cube_rows(version)
+    if cube is None:
+        cube = build_cube(rows, version)
+        dirty = len(cube["cells"])
+    else:
+        cube, dirty = refresh_cube(cube, rows, version)
+    save_cube(cube)
+    return cube, dirty
+
+
+@st.cache_resource(show_spinner="Loading summary cube…", max_entries=2)
+def get_cube(version):
+    """The subgroup cube for data *version*."""
+    cube, _ = update_cube(version)
+    return cube
+
+
+# ── queries ──────────────────────────────────────────────────────────
+def _select(frame, where):
+    mask = np.ones(len(frame), dtype=bool)
+    for dim, values in (where or {}).items():
+        mask &= frame[dim].isin(values).to_numpy()
+    return frame[mask]
+
+
+def _sketch_median(sketch, by):
+    """Exact median (to the sketch resolution) per group of a histogram."""
+    s = sketch.groupby(by + ["bin"], sort=True)["count"].sum().reset_index()
+    c = s.groupby(by)["count"].cumsum()
+    n = s.groupby(by)["count"].transform("sum")
+    lo = c - s["count"]
+
+    def _rank(k):
+        hit = (lo <= k) & (k < c)
+        return s.loc[hit].set_index(by)["bin"]
+
+    return (_rank((n - 1) // 2) + _rank(n // 2)) / 2
+
+
+def rollup(cube, measure, by, where=None):
+    """Summary of *measure* grouped by the dims in *by* over the cells
+    matching *where* (``{dim: allowed values}``).
+
+    Returns count / mean / median / std / min / max per group, like
+    ``groupby(by)[measure].agg([...])`` on the row-level table; groups with
+    no values are dropped.
+    """
+    cells = _select(cube["cells"], where)
+    cols = [f"{measure}__{s}" for s in ("n", "sum", "sumsq", "min", "max")]
+    agg = cells.groupby(by, sort=True).agg(
+        dict(zip(cols, ["sum", "sum", "sum", "min", "max"]))
+    )
+    n, s, ss, mn, mx = (agg[c] for c in cols)
+
+    var = (ss - s * s / n) / (n - 1)
+    out = pd.DataFrame({
+        "count": n,
+        "mean": s / n,
+        "median": np.nan,
+        "std": np.sqrt(var.clip(lower=0)).where(n > 1),
+        "min": mn,
+        "max": mx,
+    })[n > 0]
+
+    res = CUBE_MEASURES[measure]
+    if res is not None:
+        sketch = _select(cube["sketch"], where)
+        sketch = sketch[sketch["measure"] == measure]
+        out["median"] = _sketch_median(sketch, by).reindex(out.index) * res
+    return out
+
+
+def crosstab(cube, index, columns, where=None):
+    """Row counts of *index* × *columns*, like ``pd.crosstab``."""
+    cells = _select(cube["cells"], where)
+    return (
+        cells.groupby([index, columns])["rows"].sum()
+        .unstack(fill_value=0)
+        .rename_axis(index=index, columns=columns)
+    )
+
+
+if __name__ == "__main__":
+    version = data_version(SUBGROUP_TABLES)
+    cube, dirty = update_cube(version)
+    print(
+        f"Cube {CUBE_DIR} — {len(cube['cells'])} cells, {dirty} recomputed "
+        f"(dims: {', '.join(cube['dims'])})"
+    )
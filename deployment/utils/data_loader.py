@@ -10,19 +10,26 @@ warnings.filterwarnings("ignore")
 import pandas as pd
 import numpy as np
 import sqlite3
+import hashlib
 from pathlib import Path
 
-import statsmodels.api as sm
 from statsmodels.othermod.betareg import BetaModel
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
+from scipy.special import expit
 from scipy.stats import pearsonr
 import streamlit as st
 
+from utils.mixed_beta import MixedBetaModel
+from utils.validation import validate_tables
+
 # ── paths ────────────────────────────────────────────────────────────
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 DB_PATH = PROJECT_ROOT / "sql" / "CID_database_clean.db"
 CSV_DIR = PROJECT_ROOT / "data" / "csv"
+ARTIFACT_DIR = PROJECT_ROOT / "deployment" / "artifacts"
+# derived tables (predictions, monitoring) — the source DB stays read-only
+RESULTS_DB_PATH = ARTIFACT_DIR / "results.db"
 
 # ── display constants ────────────────────────────────────────────────
 FEATURE_DISPLAY = {
@@ -49,19 +56,88 @@ SUBGROUP_COLORS = {
 BOROUGHS = ["Bronx", "Brooklyn", "Manhattan", "Queens", "Staten Island"]
 
 
-# ── raw table loader ─────────────────────────────────────────────────
-@st.cache_data(show_spinner="Loading data from database…")
-def load_raw_tables():
-    """Return the four DB tables + student-support from the CSV."""
+# ── data version ─────────────────────────────────────────────────────
+# raw table → source file
+SOURCE_TABLES = {
+    "dim_environment":      DB_PATH,
+    "dim_location":         DB_PATH,
+    "dim_demographic":      DB_PATH,
+    "fact_school_outcomes": DB_PATH,
+    "env_csv":              CSV_DIR / "env_dim.csv",
+}
+RAW_TABLES = tuple(SOURCE_TABLES)
+
+# upstream tables of the derived caches
+MODEL_TABLES = ("dim_environment", "dim_location", "env_csv")
+SUBGROUP_TABLES = (
+    "dim_environment", "dim_location", "dim_demographic", "fact_school_outcomes",
+)
+GEO_TABLES = ("dim_location",)
+
+
+def _file_stamp():
+    """Size and mtime of every source file — the cheap change check."""
+    parts = []
+    for path in dict.fromkeys(SOURCE_TABLES.values()):
+        stat = path.stat()
+        parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _table_versions(stamp):
+    """Content hash of every source table; only recomputed when a file's
+    size or mtime (*stamp*) changes, and unchanged for tables whose rows
+    did not change."""
+    versions = {}
     conn = sqlite3.connect(str(DB_PATH))
-    dim_env  = pd.read_sql_query("SELECT * FROM dim_environment", conn)
-    dim_loc  = pd.read_sql_query("SELECT * FROM dim_location", conn)
-    dim_dem  = pd.read_sql_query("SELECT * FROM dim_demographic", conn)
-    fact     = pd.read_sql_query("SELECT * FROM fact_school_outcomes", conn)
-    conn.close()
-
-    # student-support is only in the raw CSV
-    env_csv = pd.read_csv(CSV_DIR / "env_dim.csv")
+    try:
+        for name, path in SOURCE_TABLES.items():
+            h = hashlib.sha1()
+            if path == DB_PATH:
+                for row in conn.execute(f"SELECT * FROM {name} ORDER BY rowid"):
+                    h.update(repr(row).encode())
+            else:
+                h.update(path.read_bytes())
+            versions[name] = h.hexdigest()[:16]
+    finally:
+        conn.close()
+    return versions
+
+
+def table_versions():
+    """``{table: content version}`` for the raw tables."""
+    return _table_versions(_file_stamp())
+
+
+def data_version(tables=RAW_TABLES):
+    """Version token of *tables* (default: all raw tables), passed to
+    caches that should be rebuilt when — and only when — those tables
+    change."""
+    versions = table_versions()
+    token = "|".join(f"{t}:{versions[t]}" for t in tables)
+    return hashlib.sha1(token.encode()).hexdigest()[:16]
+
+
+# ── raw table loader ─────────────────────────────────────────────────
+@st.cache_data(show_spinner="Loading data from database…", max_entries=2 * len(RAW_TABLES))
+def load_table(name, version):
+    """Raw table *name* at content *version* (see ``table_versions``);
+    ``env_csv`` is the student-support column of the environment CSV."""
+    if name != "env_csv":
+        conn = sqlite3.connect(str(DB_PATH))
+        try:
+            return pd.read_sql_query(f"SELECT * FROM {name}", conn)
+        finally:
+            conn.close()
+
+    return read_support_csv(SOURCE_TABLES[name])
+
+
+def read_support_csv(path):
+    """``DBN`` / ``student_support_pct`` (as a fraction) from an
+    environment CSV — student support is only in the raw CSV."""
+    env_csv = pd.read_csv(path)
     env_csv = env_csv[["DBN", "Student Support - School Percent Positive"]].copy()
     env_csv.rename(
         columns={"Student Support - School Percent Positive": "student_support_pct"},
@@ -74,15 +150,60 @@ def load_raw_tables():
         .apply(pd.to_numeric, errors="coerce")
         / 100.0
     )
-    return dim_env, dim_loc, dim_dem, fact, env_csv
+    return env_csv
 
 
-# ── beta-regression pipeline ────────────────────────────────────────
-@st.cache_resource(show_spinner="Fitting Beta Regression model…")
-def fit_beta_model():
-    """Replicate the notebook pipeline and return all model artifacts."""
-    dim_env, dim_loc, _, _, env_csv = load_raw_tables()
+def load_raw_tables():
+    """Return the four DB tables + student-support from the CSV, each
+    cached under its own version."""
+    versions = table_versions()
+    return tuple(load_table(name, versions[name]) for name in RAW_TABLES)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _validate(versions):
+    """Validation result for the raw tables at *versions*."""
+    return validate_tables(dict(zip(RAW_TABLES, load_raw_tables())))
+
 
+def validate_raw_tables():
+    """Run the load-time checks (cached by the raw table versions).
+
+    Returns ``dict(clean, report, quarantine)`` — see
+    ``utils.validation.validate_tables``.
+    """
+    versions = table_versions()
+    return _validate(tuple(versions[name] for name in RAW_TABLES))
+
+
+def load_clean_tables():
+    """The tables of ``load_raw_tables`` with quarantined rows removed."""
+    clean = validate_raw_tables()["clean"]
+    return tuple(clean[name] for name in RAW_TABLES)
+
+
+# ── beta-regression pipeline ────────────────────────────────────────
+def model_inputs():
+    """Merge, impute, engineer, split and scale — the notebook pipeline
+    up to the fit, shared by both model kinds.  District medians come from
+    the analytics engine (DuckDB when installed)."""
+    from utils.analytics import get_engine
+    dim_env, dim_loc, _, _, env_csv = load_clean_tables()
+    imputed = get_engine(data_version()).run("district_median_impute")
+    return prepare_model_inputs(dim_env, dim_loc, env_csv, imputed=imputed)
+
+
+def prepare_model_inputs(dim_env, dim_loc, env_csv, imputed=None):
+    """``model_inputs`` for the given tables.  *imputed*, a DBN-keyed
+    frame of district-median-imputed columns (the analytics query
+    ``district_median_impute``), replaces the pandas imputation of those
+    columns.
+
+    The fit sees a single preallocated float64 design matrix
+    (``const`` + features) whose rows are laid out train-then-test, so
+    ``X_train_c`` / ``X_test_c`` are views of it and scaling happens in
+    place; no intermediate feature frames are copied.
+    """
     # merge
     model_df = (
         dim_env
@@ -91,7 +212,7 @@ def fit_beta_model():
     )
 
     cols_needed = [
-        "district", "economic_need_index", "percent_temp_housing",
+        "DBN", "school_name", "district", "economic_need_index", "percent_temp_housing",
         "teaching_environment_pct_positive", "avg_student_attendance",
         "student_support_pct", "metric_value_4yr_ccr_all_students", "borough",
     ]
@@ -102,11 +223,24 @@ def fit_beta_model():
     ]
 
     # impute by district median
+    if imputed is not None:
+        imputed = imputed.set_index("DBN")
+        for col in imputed.columns.intersection(numerical_cols):
+            model_df[col] = model_df["DBN"].map(imputed[col].astype(float))
     for col in numerical_cols:
         model_df[col] = model_df[col].fillna(
             model_df.groupby("district")[col].transform("median")
         )
-    model_df = model_df[cols_needed].dropna().copy()
+
+    # schools still incomplete (e.g. district 84 charters have no CCR at
+    # all) are set aside with the reason rather than dropped silently
+    missing = model_df[cols_needed].isna()
+    incomplete = missing.any(axis=1)
+    excluded = model_df.loc[incomplete, ["DBN", "school_name", "district"]]
+    excluded["reason"] = "missing: " + (
+        missing[incomplete].dot(pd.Index(cols_needed) + ", ").str.rstrip(", ")
+    )
+    model_df = model_df.loc[~incomplete, cols_needed]
 
     # feature engineering
     model_df["log_temp_housing"] = np.log(model_df["percent_temp_housing"] + 0.001)
@@ -115,10 +249,11 @@ def fit_beta_model():
         * model_df["teaching_environment_pct_positive"]
     )
 
-    borough_dummies = pd.get_dummies(
-        model_df["borough"], prefix="borough", drop_first=True, dtype=float
-    )
-    model_df = pd.concat([model_df, borough_dummies], axis=1)
+    # borough dummies (Bronx baseline), as get_dummies(drop_first=True)
+    borough_features = []
+    for b in sorted(model_df["borough"].unique())[1:]:
+        model_df[f"borough_{b}"] = (model_df["borough"] == b).astype(float)
+        borough_features.append(f"borough_{b}")
 
     n_total = len(model_df)
     model_df["ccr_prop"] = model_df["metric_value_4yr_ccr_all_students"] / 100
@@ -130,33 +265,68 @@ def fit_beta_model():
         "teaching_environment_pct_positive", "eni_x_teach",
         "avg_student_attendance", "student_support_pct",
     ]
-    borough_features = list(borough_dummies.columns)
     all_features = numerical_features + borough_features
 
-    # split
-    X = model_df[all_features].copy()
-    y = model_df["ccr_prop"].values
-    y_raw = model_df["metric_value_4yr_ccr_all_students"].values
-
-    X_train, X_test, y_train, y_test, y_raw_train, y_raw_test = train_test_split(
-        X, y, y_raw, test_size=0.20, random_state=42
+    # split (same rows as train_test_split on the frame)
+    train_pos, test_pos = train_test_split(
+        np.arange(n_total), test_size=0.20, random_state=42
     )
+    n_train = len(train_pos)
+
+    # design matrix: one buffer holding the train and test blocks, each a
+    # column-major view, filled column by column
+    columns = ["const"] + all_features
+    k = len(columns)
+    buffer = np.empty(n_total * k)
+    X_train = buffer[:n_train * k].reshape((n_train, k), order="F")
+    X_test  = buffer[n_train * k:].reshape((n_total - n_train, k), order="F")
+    X_train[:, 0] = X_test[:, 0] = 1.0
+    for j, col in enumerate(all_features, start=1):
+        values = model_df[col].to_numpy(dtype=float)
+        values.take(train_pos, out=X_train[:, j])
+        values.take(test_pos, out=X_test[:, j])
+
+    # scale numerical columns in place (statistics from the train rows)
+    num = slice(1, 1 + len(numerical_features))
+    scaler = StandardScaler().fit(X_train[:, num])
+    for X in (X_train, X_test):
+        X[:, num] -= scaler.mean_
+        X[:, num] /= scaler.scale_
+
+    X_train_c = pd.DataFrame(X_train, index=model_df.index[train_pos],
+                             columns=columns, copy=False)
+    X_test_c  = pd.DataFrame(X_test, index=model_df.index[test_pos],
+                             columns=columns, copy=False)
+
+    y = model_df["ccr_prop"].to_numpy()
+    y_raw = model_df["metric_value_4yr_ccr_all_students"].to_numpy()
 
-    # scale
-    scaler = StandardScaler()
-    X_train_s = X_train.copy()
-    X_test_s  = X_test.copy()
-    X_train_s[numerical_features] = scaler.fit_transform(X_train[numerical_features])
-    X_test_s[numerical_features]  = scaler.transform(X_test[numerical_features])
+    # feature ranges for sliders
+    ranges = {}
+    for f in ["economic_need_index", "percent_temp_housing",
+              "teaching_environment_pct_positive", "avg_student_attendance",
+              "student_support_pct"]:
+        ranges[f] = dict(
+            min=float(model_df[f].min()), max=float(model_df[f].max()),
+            mean=float(model_df[f].mean()), median=float(model_df[f].median()),
+        )
 
-    X_train_c = sm.add_constant(X_train_s)
-    X_test_c  = sm.add_constant(X_test_s)
+    return dict(
+        model_df=model_df, excluded=excluded, scaler=scaler,
+        numerical_features=numerical_features,
+        borough_features=borough_features,
+        all_features=all_features,
+        train_index=X_train_c.index, test_index=X_test_c.index,
+        X_train_c=X_train_c, X_test_c=X_test_c,
+        y_train=y[train_pos], y_raw_train=y_raw[train_pos], y_raw_test=y_raw[test_pos],
+        feature_ranges=ranges,
+    )
 
-    # fit
-    model = BetaModel(y_train, X_train_c).fit(disp=False)
 
-    y_pred_train = model.predict(X_train_c) * 100
-    y_pred_test  = model.predict(X_test_c) * 100
+def _model_artifacts(kind, model, inputs, y_pred_train, y_pred_test):
+    """Metrics, coefficient table and the artifact dict the pages use:
+    a compact core plus the ``PAYLOADS`` under ``"payloads"``."""
+    y_raw_train, y_raw_test = inputs["y_raw_train"], inputs["y_raw_test"]
 
     # metrics
     def _metrics(y_act, y_pred, label):
@@ -185,34 +355,176 @@ def fit_beta_model():
         lambda p: "***" if p < 0.001 else "**" if p < 0.01 else "*" if p < 0.05 else "ns"
     )
 
-    # feature ranges for sliders
-    ranges = {}
-    for f in ["economic_need_index", "percent_temp_housing",
-              "teaching_environment_pct_positive", "avg_student_attendance",
-              "student_support_pct"]:
-        ranges[f] = dict(
-            min=float(model_df[f].min()), max=float(model_df[f].max()),
-            mean=float(model_df[f].mean()), median=float(model_df[f].median()),
-        )
-
-    return dict(
-        model=model, scaler=scaler, coef_df=coef_df,
+    # everything that grows with the number of schools is a payload,
+    # persisted and loaded separately (see ``model_payload``)
+    predictions = pd.DataFrame({
+        "split": ["train"] * len(y_raw_train) + ["test"] * len(y_raw_test),
+        "actual": np.concatenate([y_raw_train, y_raw_test]),
+        "predicted": np.concatenate([np.asarray(y_pred_train), np.asarray(y_pred_test)]),
+    }, index=inputs["train_index"].append(inputs["test_index"]))
+    predictions["residual"] = predictions["actual"] - predictions["predicted"]
+
+    art = dict(
+        kind=kind, params=model.params.copy(),
+        cov_params=np.asarray(model.cov_params(), dtype=float),
+        scaler=inputs["scaler"], coef_df=coef_df,
         train_metrics=train_m, test_metrics=test_m,
-        model_df=model_df,
-        numerical_features=numerical_features,
-        borough_features=borough_features,
-        all_features=all_features,
-        X_test=X_test, y_raw_train=y_raw_train, y_raw_test=y_raw_test,
-        y_pred_train=y_pred_train, y_pred_test=y_pred_test,
-        param_names=p_names, feature_ranges=ranges,
+        numerical_features=inputs["numerical_features"],
+        borough_features=inputs["borough_features"],
+        all_features=inputs["all_features"],
+        test_index=inputs["test_index"],
+        param_names=p_names, feature_ranges=inputs["feature_ranges"],
         precision=float(model.params["precision"]),
     )
+    art["model_version"] = model_version(art)
+    art["payloads"] = dict(
+        model_df=inputs["model_df"], excluded=inputs["excluded"],
+        predictions=predictions, results=model,
+    )
+    return art
+
+
+def fit_fixed_artifacts():
+    """Replicate the notebook pipeline and return all model artifacts
+    (a fresh fit; the app reads the served copy via ``fit_beta_model``)."""
+    inp = model_inputs()
+    model = BetaModel(inp["y_train"], inp["X_train_c"]).fit(disp=False)
+
+    y_pred_train = model.predict(inp["X_train_c"]) * 100
+    y_pred_test  = model.predict(inp["X_test_c"]) * 100
+    return _model_artifacts("fixed", model, inp, y_pred_train, y_pred_test)
+
+
+# ── hierarchical beta model ─────────────────────────────────────────
+def district_groups(frame):
+    """Random-effect group of each school: district nested in borough
+    (citywide districts such as 75 / 79 split by borough)."""
+    return frame["borough"] + " " + frame["district"].astype(int).astype(str)
+
+
+def fit_mixed_artifacts():
+    """Same pipeline and artifacts as ``fit_fixed_artifacts`` with a district
+    random intercept added; also returns ``district_effects`` and
+    ``sigma_district``.  Predictions for hypothetical schools (no
+    district) are for a typical district (u = 0)."""
+    inp = model_inputs()
+    df = inp["model_df"]
+    g_train = district_groups(df.loc[inp["train_index"]])
+    g_test  = district_groups(df.loc[inp["test_index"]])
+    model = MixedBetaModel(inp["y_train"], inp["X_train_c"], g_train).fit()
+
+    y_pred_train = model.predict(inp["X_train_c"], g_train) * 100
+    y_pred_test  = model.predict(inp["X_test_c"], g_test) * 100
+    art = _model_artifacts("mixed", model, inp, y_pred_train, y_pred_test)
+
+    groups = (
+        df.assign(group=district_groups(df))
+        .groupby("group")[["borough", "district"]].first()
+    )
+    art["district_effects"] = pd.DataFrame({
+        "borough": groups["borough"],
+        "district": groups["district"].astype(int),
+        "effect": model.random_effects,
+        "se": model.random_effects_se,
+        "n_train": model.group_sizes,
+    }).dropna(subset=["effect"]).rename_axis("group").reset_index()
+    art["sigma_district"] = model.sigma
+    return art
+
+
+MODEL_KINDS = {
+    "fixed": "Beta regression",
+    "mixed": "Hierarchical beta (district effects)",
+}
+
+
+MODEL_FITTERS = {"fixed": fit_fixed_artifacts, "mixed": fit_mixed_artifacts}
+
+
+# per-school and per-fit payloads, loaded only by the code that needs them
+PAYLOADS = {
+    "model_df":    "modelled schools: raw and engineered features, CCR",
+    "excluded":    "schools left out of the fit, with the reason",
+    "predictions": "train/test actual and predicted CCR and residuals",
+    "results":     "the fitted statsmodels / MixedBetaResults object",
+}
+
+
+def load_model(kind="fixed"):
+    """Core artifacts for the model *kind* (a key of ``MODEL_KINDS``) as
+    currently served — refits are swapped in by ``utils.refit``.  The
+    core holds coefficients, covariance, scaler, feature lists, ranges and
+    metrics; the rest is read with ``model_payload``."""
+    from utils.refit import get_model_server
+    return get_model_server().get(kind)
+
+
+def model_payload(art, name):
+    """Payload *name* (a key of ``PAYLOADS``) of the model *art* — loaded
+    on first use and shared per model version, so treat it as read-only."""
+    if name not in PAYLOADS:
+        raise KeyError(f"unknown model payload {name!r}")
+    if "payloads" in art:                  # a fit that is not persisted yet
+        return art["payloads"][name]
+    from utils.refit import load_payload
+    return load_payload(art["kind"], art["model_version"], name)
+
+
+def model_frame(art):
+    """The modelled schools of *art* (``model_payload(art, "model_df")``)."""
+    return model_payload(art, "model_df")
+
+
+def fit_beta_model():
+    """Served beta-regression artifacts."""
+    return load_model("fixed")
+
+
+def fit_mixed_beta_model():
+    """Served hierarchical-model artifacts."""
+    return load_model("mixed")
+
+
+# ── model version ────────────────────────────────────────────────────
+def model_version(art):
+    """Short hash of the fitted coefficients + scaler; identifies which
+    fit produced a persisted artifact."""
+    h = hashlib.sha1()
+    h.update(art["params"].to_numpy().tobytes())
+    h.update(art["scaler"].mean_.tobytes())
+    h.update(art["scaler"].scale_.tobytes())
+    return h.hexdigest()[:16]
+
+
+# ── design matrix ────────────────────────────────────────────────────
+def build_design_matrix(art, frame=None):
+    """Return the scaled, constant-prefixed design matrix for *frame*.
+
+    Columns follow ``art["param_names"]`` so the result can be multiplied
+    straight into the coefficient vector.  Defaults to every modelled
+    school (``model_frame``).
+    """
+    frame = model_frame(art) if frame is None else frame
+    nf = art["numerical_features"]
+    bf = art["borough_features"]
+
+    scaled = art["scaler"].transform(frame[nf].to_numpy(dtype=float))
+    boroughs = frame[bf].to_numpy(dtype=float)
+    const = np.ones((len(frame), 1))
+    return np.hstack([const, scaled, boroughs])
 
 
 # ── single-school prediction ────────────────────────────────────────
-def predict_ccr(art, eni, pct_temp, teaching, attendance, support, borough):
-    """Return (predicted_ccr_pct, {feature: logit_contribution})."""
-    model  = art["model"]
+def predict_ccr(art, eni, pct_temp, teaching, attendance, support, borough,
+                interval=None, n_draws=4000, seed=0):
+    """Return (predicted_ccr_pct, {feature: logit_contribution}).
+
+    With ``interval`` (e.g. 0.95) a third item is returned: a dict with the
+    credible interval for the mean CCR (``mean_lo`` / ``mean_hi``) and the
+    prediction interval for a single school's CCR (``pred_lo`` /
+    ``pred_hi``), from Monte Carlo draws of the fitted parameters.
+    """
+    params = art["params"][art["param_names"]].to_numpy()
     scaler = art["scaler"]
     nf     = art["numerical_features"]
     bf     = art["borough_features"]
@@ -226,21 +538,57 @@ def predict_ccr(art, eni, pct_temp, teaching, attendance, support, borough):
     borough_vals = [1.0 if f"borough_{borough}" == b else 0.0 for b in bf]
     features = np.concatenate([[1.0], scaled, borough_vals])
 
-    pred_prop = model.predict(features.reshape(1, -1))[0]
-    pred_ccr  = pred_prop * 100
+    # mean through the logit link (a typical district for the mixed model)
+    pred_ccr = float(expit(features @ params)) * 100
 
     # per-feature logit contributions
-    params = model.params
-    pn = [n for n in params.index if n != "precision"]
-    contribs = {name: float(params[name] * features[i]) for i, name in enumerate(pn)}
+    contribs = dict(zip(art["param_names"], (params * features).tolist()))
+
+    if interval is None:
+        return pred_ccr, contribs
+    return pred_ccr, contribs, _predict_interval(art, features, interval, n_draws, seed)
+
 
-    return pred_ccr, contribs
+def param_draws(art, n_draws, seed):
+    """(n_draws × params) draws from N(params, cov_params), one batch.
+
+    The Cholesky factor is computed once per artifact and reused.
+    """
+    chol = art.get("_param_chol")
+    if chol is None:
+        chol = art["_param_chol"] = np.linalg.cholesky(art["cov_params"])
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n_draws, chol.shape[0]))
+    return art["params"].to_numpy() + z @ chol.T
+
+
+def _predict_interval(art, features, interval, n_draws, seed):
+    draws = param_draws(art, n_draws, seed)
+    k = len(features)
+    mu = 1.0 / (1.0 + np.exp(-(draws[:, :k] @ features)))
+    # precision uses a log link, so the last parameter is log(φ)
+    phi = np.exp(draws[:, -1])
+
+    rng = np.random.default_rng(seed + 1)
+    y = rng.beta(mu * phi, (1.0 - mu) * phi)
+
+    tail = (1.0 - interval) / 2 * 100
+    q = [tail, 100 - tail]
+    mean_lo, mean_hi = np.percentile(mu, q) * 100
+    pred_lo, pred_hi = np.percentile(y, q) * 100
+    return dict(mean_lo=mean_lo, mean_hi=mean_hi, pred_lo=pred_lo, pred_hi=pred_hi)
 
 
 # ── subgroup dataset ─────────────────────────────────────────────────
-@st.cache_data(show_spinner="Building subgroup equity dataset…")
 def build_subgroup_data():
-    dim_env, dim_loc, dim_dem, fact, _ = load_raw_tables()
+    """Subgroup rows joined to school context, the reported subset and
+    within-school gaps (cached per version of ``SUBGROUP_TABLES``)."""
+    return _subgroup_data(data_version(SUBGROUP_TABLES))
+
+
+@st.cache_data(show_spinner="Building subgroup equity dataset…", max_entries=2)
+def _subgroup_data(version):
+    dim_env, dim_loc, dim_dem, fact, _ = load_clean_tables()
 
     sg = fact.copy()
     sg["ccr_pct"] = sg["ccr_rate"] * 100
@@ -263,8 +611,13 @@ def build_subgroup_data():
     )
 
     reported = sg[sg["ccr_pct"].notna()].copy()
+    multi = within_school_gaps(reported)
+
+    return sg, reported, multi
 
-    # within-school gaps (schools with ≥2 subgroups reporting)
+
+def within_school_gaps(reported):
+    """Subgroup CCR minus school-wide CCR, for schools with ≥2 subgroups."""
     multi = reported.groupby("DBN").filter(lambda x: len(x) >= 2).copy()
     school_ccr = (
         multi.groupby("DBN")["metric_value_4yr_ccr_all_students"]
@@ -273,5 +626,4 @@ def build_subgroup_data():
     )
     multi = multi.merge(school_ccr, on="DBN")
     multi["intra_school_gap"] = multi["ccr_pct"] - multi["school_mean_ccr"]
-
-    return sg, reported, multi
+    return multi
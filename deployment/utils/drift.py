@@ -0,0 +1,412 @@
+"""
+Feature and prediction drift between the training data and a data vintage.
+The schools the served model was fitted on, read raw from the source
+tables, are the reference; a vintage is any
+SQLite database with the star schema (by default the app's own) plus its
+environment CSV.  Both sides are reduced to fixed-bin histograms per
+(segment, feature) — citywide, per borough and per subgroup — that are
+filled chunk by chunk and merged by addition, so a vintage never has to
+fit in memory.  PSI, the (binned) KS statistic and the shift of the 10th /
+50th / 90th percentiles are then computed for every segment × feature at
+once from the histogram arrays.
+
+The reference histograms are frozen per model version in ``drift_reference``
+and each run is appended to ``drift_results``, both in the results
+database under ``artifacts/`` (vintages are only read); the Model
+Overview page flags the latest run.  Run after loading a new vintage
+(from ``deployment/``); ``--self-check`` profiles the source tables
+without storing anything and fails unless they come back stable:
+    python -m utils.drift [--db new.db] [--csv new_env.csv] [--self-check]
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import (
+    DB_PATH, RESULTS_DB_PATH, SOURCE_TABLES, fit_beta_model, model_frame, model_version,
+    read_support_csv,
+)
+from utils.scoring import contribution_matrix
+
+REFERENCE_TABLE = "drift_reference"
+RESULTS_TABLE = "drift_results"
+
+N_BINS = 40
+CHUNKSIZE = 50_000
+QUANTILES = (0.10, 0.50, 0.90)
+MIN_COUNT = 30                 # per side, below which a segment is not judged
+PSI_MODERATE, PSI_DRIFT = 0.10, 0.25
+EPS = 1e-4                     # floor on bin shares in the PSI log ratio
+
+# school-level features (histogram range) and subgroup-level features
+SCHOOL_FEATURES = {
+    "economic_need_index":               (0.0, 1.0),
+    "percent_temp_housing":              (0.0, 1.0),
+    "teaching_environment_pct_positive": (0.0, 1.0),
+    "avg_student_attendance":            (0.0, 1.0),
+    "student_support_pct":               (0.0, 1.0),
+    "metric_value_4yr_ccr_all_students": (0.0, 100.0),
+    "predicted_ccr":                     (0.0, 100.0),
+}
+SUBGROUP_FEATURES = {
+    "ccr_pct":         (0.0, 100.0),
+    "student_percent": (0.0, 1.0),
+}
+
+# vintage rows, limited like the training data to schools with a CCR
+SCHOOL_SQL = """
+SELECT e.DBN, l.borough, e.economic_need_index, e.percent_temp_housing,
+       e.teaching_environment_pct_positive, e.avg_student_attendance,
+       e.metric_value_4yr_ccr_all_students
+FROM dim_environment e
+JOIN dim_location l ON e.DBN = l.DBN
+WHERE e.metric_value_4yr_ccr_all_students IS NOT NULL
+"""
+SUBGROUP_SQL = """
+SELECT f.DBN, f.Subgroup, f.ccr_rate * 100 AS ccr_pct, d.student_percent
+FROM fact_school_outcomes f
+JOIN dim_environment e ON f.DBN = e.DBN
+LEFT JOIN dim_demographic d ON f.DBN = d.DBN AND f.Subgroup = d.Subgroup
+WHERE e.metric_value_4yr_ccr_all_students IS NOT NULL
+"""
+
+
+# ── histograms ───────────────────────────────────────────────────────
+class Histograms:
+    """Fixed-bin counts per (segment type, segment) × feature, with an
+    underflow and an overflow bin; ``add`` one chunk at a time and
+    ``merge`` partial results."""
+
+    def __init__(self, features):
+        self.features = dict(features)
+        self.counts = {}           # (segment_type, segment) → (F, N_BINS + 2)
+        self.missing = {}          # (segment_type, segment) → (F,)
+
+    def _bins(self, frame):
+        lo, hi = np.array(list(self.features.values())).T
+        X = frame[list(self.features)].to_numpy(dtype=float)
+        missing = np.isnan(X)
+        with np.errstate(invalid="ignore"):
+            idx = np.floor((X - lo) / (hi - lo) * N_BINS) + 1
+        idx = np.clip(np.nan_to_num(idx), 0, N_BINS + 1).astype(np.int64)
+        # the top edge belongs to the last bin, not the overflow
+        idx[(X == hi) & ~missing] = N_BINS
+        return idx, missing
+
+    def add(self, frame, by=()):
+        """Count *frame*'s rows citywide and per value of each *by* column."""
+        idx, missing = self._bins(frame)
+        F, B = len(self.features), N_BINS + 2
+        for seg_type in ("all", *by):
+            labels = np.zeros(len(frame)) if seg_type == "all" else frame[seg_type]
+            codes, uniques = pd.factorize(labels)
+            keep = codes >= 0
+            cell = codes[keep, None] * F + np.arange(F)
+            counts = np.bincount(
+                (cell * B + idx[keep])[~missing[keep]], minlength=len(uniques) * F * B,
+            ).reshape(len(uniques), F, B)
+            miss = np.bincount(cell[missing[keep]], minlength=len(uniques) * F)
+            for i, u in enumerate(uniques):
+                key = (seg_type, "all" if seg_type == "all" else str(u))
+                self._accumulate(key, counts[i], miss.reshape(-1, F)[i])
+        return self
+
+    def _accumulate(self, key, counts, missing):
+        if key in self.counts:
+            self.counts[key] = self.counts[key] + counts
+            self.missing[key] = self.missing[key] + missing
+        else:
+            self.counts[key], self.missing[key] = counts.copy(), missing.copy()
+
+    def merge(self, other):
+        for key in other.counts:
+            self._accumulate(key, other.counts[key], other.missing[key])
+        return self
+
+    # ── storage ──────────────────────────────────────────────────────
+    def to_frame(self):
+        rows = []
+        for (seg_type, seg), counts in self.counts.items():
+            for j, f in enumerate(self.features):
+                rows.append(dict(segment_type=seg_type, segment=seg, feature=f,
+                                 counts=json.dumps(counts[j].tolist()),
+                                 missing=int(self.missing[(seg_type, seg)][j])))
+        return pd.DataFrame(rows)
+
+    @classmethod
+    def from_frame(cls, frame, features):
+        self = cls(features)
+        pos = {f: j for j, f in enumerate(self.features)}
+        for (seg_type, seg), g in frame.groupby(["segment_type", "segment"]):
+            counts = np.zeros((len(pos), N_BINS + 2), dtype=np.int64)
+            missing = np.zeros(len(pos), dtype=np.int64)
+            for r in g.itertuples():
+                counts[pos[r.feature]] = json.loads(r.counts)
+                missing[pos[r.feature]] = r.missing
+            self._accumulate((seg_type, seg), counts, missing)
+        return self
+
+
+def _quantiles(shares, lo, hi, qs=QUANTILES):
+    """Interpolated quantiles of binned distributions: *shares* is
+    (..., F, N_BINS + 2); returns (..., F, len(qs))."""
+    cdf = np.cumsum(shares, axis=-1)
+    out = []
+    for q in qs:
+        k = np.minimum((cdf < q - 1e-12).sum(axis=-1), N_BINS + 1)
+        before = np.where(k > 0, np.take_along_axis(cdf, np.maximum(k - 1, 0)[..., None], -1)[..., 0], 0.0)
+        share = np.take_along_axis(shares, k[..., None], -1)[..., 0]
+        inner = (k >= 1) & (k <= N_BINS)
+        frac = np.divide(q - before, share, out=np.zeros_like(share), where=share > 0)
+        u = (np.clip(k - 1, 0, N_BINS) + np.where(inner, frac, 0.0)) / N_BINS
+        out.append(lo + (hi - lo) * u)
+    return np.stack(out, axis=-1)
+
+
+def compare(ref, new, min_count=MIN_COUNT):
+    """PSI, KS and quantile shifts for every segment × feature present in
+    both *ref* and *new* (``Histograms`` over the same features)."""
+    keys = [k for k in ref.counts if k in new.counts]
+    if not keys:
+        return pd.DataFrame()
+    P = np.stack([ref.counts[k] for k in keys]).astype(float)
+    Q = np.stack([new.counts[k] for k in keys]).astype(float)
+    n_ref, n_new = P.sum(axis=-1), Q.sum(axis=-1)
+    p = np.divide(P, n_ref[..., None], out=np.zeros_like(P), where=n_ref[..., None] > 0)
+    q = np.divide(Q, n_new[..., None], out=np.zeros_like(Q), where=n_new[..., None] > 0)
+
+    psi = ((q - p) * np.log((q + EPS) / (p + EPS))).sum(axis=-1)
+    ks = np.abs(np.cumsum(q, axis=-1) - np.cumsum(p, axis=-1)).max(axis=-1)
+    lo, hi = np.array(list(ref.features.values())).T
+    q_ref = _quantiles(p, lo, hi)
+    q_new = _quantiles(q, lo, hi)
+    m_ref = np.stack([ref.missing[k] for k in keys])
+    m_new = np.stack([new.missing[k] for k in keys])
+
+    S, F = P.shape[:2]
+    out = pd.DataFrame({
+        "segment_type": np.repeat([k[0] for k in keys], F),
+        "segment": np.repeat([k[1] for k in keys], F),
+        "feature": np.tile(list(ref.features), S),
+        "n_ref": n_ref.ravel().astype(int),
+        "n_new": n_new.ravel().astype(int),
+        "missing_ref": (m_ref / np.maximum(n_ref + m_ref, 1)).ravel(),
+        "missing_new": (m_new / np.maximum(n_new + m_new, 1)).ravel(),
+        "psi": psi.ravel(),
+        "ks": ks.ravel(),
+    })
+    for i, qq in enumerate(QUANTILES):
+        name = f"q{int(qq * 100)}"
+        out[f"{name}_ref"] = q_ref[..., i].ravel()
+        out[f"{name}_shift"] = (q_new[..., i] - q_ref[..., i]).ravel()
+    small = (out["n_ref"] < min_count) | (out["n_new"] < min_count)
+    out["status"] = np.select(
+        [small, out["psi"] >= PSI_DRIFT, out["psi"] >= PSI_MODERATE],
+        ["too few", "drift", "moderate"], "stable",
+    )
+    return out
+
+
+# ── reference and vintage ────────────────────────────────────────────
+def _with_predictions(art, frame):
+    """*frame* plus ``predicted_ccr`` for rows with every model input."""
+    frame = frame.copy()
+    frame["log_temp_housing"] = np.log(frame["percent_temp_housing"] + 0.001)
+    frame["eni_x_teach"] = frame["economic_need_index"] * frame["teaching_environment_pct_positive"]
+    for b in art["borough_features"]:
+        frame[b] = (frame["borough"] == b.removeprefix("borough_")).astype(float)
+    complete = frame[art["numerical_features"]].notna().all(axis=1).to_numpy()
+    frame["predicted_ccr"] = np.nan
+    if complete.any():
+        _, contribs = contribution_matrix(art, frame[complete])
+        frame.loc[complete, "predicted_ccr"] = 100.0 / (1.0 + np.exp(-contribs.sum(axis=1)))
+    return frame
+
+
+def _profile(art, db_path, csv_path, chunksize, dbns=None):
+    """Histograms of the raw rows in *db_path* (optionally only the
+    schools in *dbns*), read from SQLite in chunks of *chunksize*."""
+    support = read_support_csv(csv_path or SOURCE_TABLES["env_csv"])
+    support = support.drop_duplicates("DBN").set_index("DBN")["student_support_pct"]
+    school, subgroup = Histograms(SCHOOL_FEATURES), Histograms(SUBGROUP_FEATURES)
+
+    def _chunks(sql):
+        for chunk in pd.read_sql_query(sql, conn, chunksize=chunksize):
+            yield chunk if dbns is None else chunk[chunk["DBN"].isin(dbns)].copy()
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        for chunk in _chunks(SCHOOL_SQL):
+            chunk["student_support_pct"] = chunk["DBN"].map(support)
+            school.add(_with_predictions(art, chunk), by=["borough"])
+        for chunk in _chunks(SUBGROUP_SQL):
+            subgroup.add(chunk, by=["Subgroup"])
+    finally:
+        conn.close()
+    return school, subgroup
+
+
+def build_reference(art, chunksize=CHUNKSIZE):
+    """Histograms of the schools the model was built from (train and test
+    split), read raw from the source tables exactly as a vintage is — no
+    imputation, so missing values count the same way on both sides and
+    the source tables themselves profile as stable."""
+    return _profile(art, DB_PATH, None, chunksize, dbns=set(model_frame(art)["DBN"]))
+
+
+def profile_vintage(art, db_path=DB_PATH, csv_path=None, chunksize=CHUNKSIZE):
+    """Histograms of a vintage, read from SQLite in chunks of *chunksize*."""
+    return _profile(art, db_path, csv_path, chunksize)
+
+
+# ── storage ──────────────────────────────────────────────────────────
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,),
+    ).fetchone() is not None
+
+
+def load_reference(version, db_path=RESULTS_DB_PATH):
+    """Stored reference ``(school, subgroup)`` for model *version*, or None."""
+    if not db_path.exists():
+        return None
+    conn = sqlite3.connect(str(db_path))
+    try:
+        if not _table_exists(conn, REFERENCE_TABLE):
+            return None
+        ref = pd.read_sql_query(
+            f"SELECT * FROM {REFERENCE_TABLE} WHERE model_version = ?", conn, params=(version,),
+        )
+    finally:
+        conn.close()
+    if ref.empty:
+        return None
+    level = ref["feature"].isin(list(SCHOOL_FEATURES))
+    return (Histograms.from_frame(ref[level], SCHOOL_FEATURES),
+            Histograms.from_frame(ref[~level], SUBGROUP_FEATURES))
+
+
+def save_reference(version, reference, db_path=RESULTS_DB_PATH):
+    frame = pd.concat([h.to_frame() for h in reference]).assign(model_version=version)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            if _table_exists(conn, REFERENCE_TABLE):
+                conn.execute(f"DELETE FROM {REFERENCE_TABLE} WHERE model_version = ?", (version,))
+            frame.to_sql(REFERENCE_TABLE, conn, if_exists="append", index=False)
+    finally:
+        conn.close()
+
+
+def save_results(results, db_path=RESULTS_DB_PATH):
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            results.to_sql(RESULTS_TABLE, conn, if_exists="append", index=False)
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_model "
+                f"ON {RESULTS_TABLE} (model_version, run_at)"
+            )
+    finally:
+        conn.close()
+
+
+def latest_drift(version, db_path=RESULTS_DB_PATH):
+    """Rows of the latest drift run for model *version*, or None."""
+    if not db_path.exists():
+        return None
+    conn = sqlite3.connect(str(db_path))
+    try:
+        if not _table_exists(conn, RESULTS_TABLE):
+            return None
+        res = pd.read_sql_query(
+            f"SELECT * FROM {RESULTS_TABLE} WHERE model_version = ? AND run_at = "
+            f"(SELECT MAX(run_at) FROM {RESULTS_TABLE} WHERE model_version = ?)",
+            conn, params=(version, version),
+        )
+    finally:
+        conn.close()
+    return res if len(res) else None
+
+
+def drift_flag(results):
+    """``(level, message)`` summarising a run: level is ``"drift"`` if a
+    citywide feature drifted, ``"moderate"`` if any segment moved,
+    else ``"stable"``."""
+    judged = results[results["status"] != "too few"]
+    city = judged[judged["segment_type"] == "all"]
+    drifted = sorted(set(city.loc[city["status"] == "drift", "feature"]))
+    if drifted:
+        return "drift", f"Citywide drift (PSI ≥ {PSI_DRIFT}) in: {', '.join(drifted)}."
+    moved = judged[judged["status"] != "stable"]
+    if len(moved):
+        return "moderate", (
+            f"{len(moved)} segment × feature distributions shifted "
+            f"(PSI ≥ {PSI_MODERATE}); none drifted citywide."
+        )
+    return "stable", "No feature or prediction shift against the training data."
+
+
+# ── run ──────────────────────────────────────────────────────────────
+def run_drift(db_path=DB_PATH, csv_path=None, chunksize=CHUNKSIZE, rebuild=False):
+    """Compare a vintage with the served model's training data, store and
+    return the results."""
+    art = fit_beta_model()
+    version = model_version(art)
+    reference = None if rebuild else load_reference(version)
+    if reference is None:
+        reference = build_reference(art)
+        save_reference(version, reference)
+    vintage = profile_vintage(art, db_path, csv_path, chunksize)
+
+    results = pd.concat([compare(r, v) for r, v in zip(reference, vintage)],
+                        ignore_index=True)
+    results.insert(0, "run_at", datetime.now().isoformat(timespec="seconds"))
+    results.insert(1, "model_version", version)
+    results.insert(2, "source", str(db_path))
+    save_results(results)
+    return results
+
+
+def self_check(chunksize=CHUNKSIZE):
+    """Drift of the source tables against a freshly built reference
+    (nothing stored); a correct reference makes every row stable."""
+    art = fit_beta_model()
+    reference = build_reference(art, chunksize)
+    vintage = profile_vintage(art, chunksize=chunksize)
+    return pd.concat([compare(r, v) for r, v in zip(reference, vintage)],
+                     ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", default=str(DB_PATH), help="vintage SQLite database")
+    parser.add_argument("--csv", default=None, help="vintage environment CSV")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--rebuild-reference", action="store_true",
+                        help="recompute the reference for the served model")
+    parser.add_argument("--self-check", action="store_true",
+                        help="profile the source tables against the reference; "
+                             "exit non-zero unless stable")
+    args = parser.parse_args()
+
+    if args.self_check:
+        res = self_check(args.chunksize)
+    else:
+        res = run_drift(args.db, args.csv, args.chunksize, args.rebuild_reference)
+    pd.set_option("display.width", 140)
+    cols = ["segment_type", "segment", "feature", "n_ref", "n_new", "psi", "ks",
+            "q50_shift", "status"]
+    print(res.loc[res["segment_type"] == "all", cols].round(3).to_string(index=False))
+    level, message = drift_flag(res)
+    print(f"\n[{level}] {message}")
+    if args.self_check and level != "stable":
+        sys.exit(1)
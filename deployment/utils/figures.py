@@ -0,0 +1,122 @@
+"""
+Plotly figure cache and payload reduction.
+Figures are cached as serialized JSON keyed by (figure kind, filter
+signature, data version) and shared across sessions, so a rerun with the
+same filters skips rebuilding.  The trace helpers send raw points while a
+trace is small and switch to server-side summaries (binned scatter,
+pre-binned histograms, precomputed box stats) above ``MAX_POINTS``.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from utils.data_loader import data_version
+
+MAX_POINTS = 2000        # per trace, before summarizing
+SCATTER_BINS = 60        # grid per axis for binned scatter
+MAX_CACHED_FIGURES = 256
+
+_lock = threading.Lock()
+
+
+@st.cache_resource
+def _figure_store():
+    return OrderedDict()
+
+
+def cached_figure(kind, signature, build, version=None):
+    """Return the figure for (*kind*, *signature*), building it with
+    ``build()`` only on a cache miss.
+
+    *signature* is any JSON-serializable description of the inputs the
+    figure depends on (filters, selections); the data version is added
+    automatically.
+    """
+    key = (
+        kind,
+        json.dumps(signature, sort_keys=True, default=str),
+        version or data_version(),
+    )
+    store = _figure_store()
+    with _lock:
+        fig_json = store.get(key)
+        if fig_json is not None:
+            store.move_to_end(key)
+    if fig_json is None:
+        fig_json = build().to_json()
+        with _lock:
+            store[key] = fig_json
+            while len(store) > MAX_CACHED_FIGURES:
+                store.popitem(last=False)
+    return pio.from_json(fig_json)
+
+
+# ── trace helpers ────────────────────────────────────────────────────
+def scatter_trace(x, y, name, color, size=6, opacity=0.5, max_points=MAX_POINTS):
+    """Marker scatter; above *max_points* the points are binned on a grid
+    and drawn as one marker per occupied cell, sized by count."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= max_points:
+        return go.Scatter(
+            x=x, y=y, mode="markers", name=name,
+            marker=dict(color=color, size=size, opacity=opacity),
+        )
+
+    counts, xe, ye = np.histogram2d(x, y, bins=SCATTER_BINS)
+    ix, iy = np.nonzero(counts)
+    n = counts[ix, iy]
+    return go.Scatter(
+        x=(xe[ix] + xe[ix + 1]) / 2,
+        y=(ye[iy] + ye[iy + 1]) / 2,
+        mode="markers", name=name,
+        marker=dict(
+            color=color, opacity=opacity,
+            size=size + 10 * np.sqrt(n / n.max()),
+        ),
+        customdata=n,
+        hovertemplate="%{customdata:.0f} schools<extra>" + name + "</extra>",
+    )
+
+
+def histogram_trace(x, name, color, nbins=20, opacity=0.55, max_points=MAX_POINTS):
+    """Histogram; above *max_points* the bins are computed here and only
+    the bar heights are sent."""
+    x = np.asarray(x, dtype=float)
+    x = x[~np.isnan(x)]
+    if len(x) <= max_points:
+        return go.Histogram(x=x, name=name, marker_color=color,
+                            opacity=opacity, nbinsx=nbins)
+
+    counts, edges = np.histogram(x, bins=nbins)
+    return go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2, y=counts,
+        width=np.diff(edges), name=name,
+        marker_color=color, opacity=opacity,
+    )
+
+
+def box_trace(y, name, color, max_points=MAX_POINTS):
+    """Box plot with mean; above *max_points* the quartiles, fences and
+    mean are precomputed so no raw points are sent."""
+    y = np.asarray(y, dtype=float)
+    y = y[~np.isnan(y)]
+    if len(y) <= max_points:
+        return go.Box(y=y, name=name, marker_color=color, boxmean=True)
+
+    q1, med, q3 = np.percentile(y, [25, 50, 75])
+    iqr = q3 - q1
+    lo = y[y >= q1 - 1.5 * iqr].min()
+    hi = y[y <= q3 + 1.5 * iqr].max()
+    return go.Box(
+        name=name, marker_color=color, boxpoints=False,
+        q1=[q1], median=[med], q3=[q3],
+        lowerfence=[lo], upperfence=[hi], mean=[y.mean()],
+        x=[name],
+    )
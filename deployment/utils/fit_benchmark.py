@@ -0,0 +1,76 @@
+"""
+Fit benchmark: wall time and peak traced memory of the model pipeline
+(merge → design matrix → Beta fit) as the number of rows grows.
+
+Rows are scaled by replicating the cleaned school tables with suffixed DBNs,
+which stands in for multi-year / subgroup-level inputs.  Peak memory is
+measured with ``tracemalloc`` (numpy buffers included) per stage.
+
+Run from ``deployment/``:
+    python -m utils.fit_benchmark --scale 1 10 50
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+from statsmodels.othermod.betareg import BetaModel
+
+from utils.data_loader import load_clean_tables, prepare_model_inputs
+
+SCALES = (1, 10, 50)
+
+
+def replicate_tables(scale):
+    """``(dim_env, dim_loc, env_csv)`` with every school repeated *scale*
+    times under distinct DBNs."""
+    dim_env, dim_loc, _, _, env_csv = load_clean_tables()
+
+    def _tile(df):
+        if scale == 1:
+            return df
+        return pd.concat(
+            [df.assign(DBN=df["DBN"] + f"-{i}") for i in range(scale)],
+            ignore_index=True,
+        )
+
+    return _tile(dim_env), _tile(dim_loc), _tile(env_csv)
+
+
+def measure(fn, *args):
+    """Run *fn*; return ``(result, seconds, peak MiB above the start)``."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def run_benchmark(scales=SCALES):
+    """One row per scale with the timing and peak memory of each stage."""
+    rows = []
+    for scale in scales:
+        tables = replicate_tables(scale)
+        inp, t_prep, m_prep = measure(prepare_model_inputs, *tables)
+        _, t_fit, m_fit = measure(
+            lambda: BetaModel(inp["y_train"], inp["X_train_c"]).fit(disp=False)
+        )
+        design_mib = (inp["X_train_c"].to_numpy().nbytes
+                      + inp["X_test_c"].to_numpy().nbytes) / 2 ** 20
+        rows.append(dict(
+            scale=scale, rows=len(inp["model_df"]), design_mib=design_mib,
+            prepare_s=t_prep, prepare_peak_mib=m_prep,
+            fit_s=t_fit, fit_peak_mib=m_fit,
+        ))
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, nargs="+", default=list(SCALES),
+                        help="row multipliers to benchmark")
+    args = parser.parse_args()
+    print(run_benchmark(args.scale).round(3).to_string(index=False))
@@ -0,0 +1,292 @@
+"""
+District and borough geometry for maps.
+No boundary files ship with the repo, so the layer is derived from school
+locations: a Voronoi tessellation of the schools in geographic districts
+(1–32), bounded by "outside" points wherever no school lies within
+``REACH_KM``, is dissolved into one polygon set per community school
+district and per borough.  Every school (district 84 charters included) is
+assigned to the district of its nearest geographic-district school — the
+cell it falls in, when it is within reach — in one KD-tree query.
+
+The polygons (rounded to ``PRECISION`` decimals) and the assignment are
+persisted as GeoJSON / Parquet per data version, so map pages only join
+aggregates onto cached features.  Build after a load (from ``deployment/``):
+    python -m utils.geo
+"""
+
+import json
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.spatial import Voronoi, cKDTree
+
+from utils.data_loader import (
+    ARTIFACT_DIR, GEO_TABLES, data_version, fit_beta_model, load_clean_tables,
+    model_version,
+)
+
+GEO_DIR = ARTIFACT_DIR / "geo"
+GEO_LEVELS = ("district", "borough")
+
+GEOGRAPHIC_DISTRICTS = range(1, 33)
+REACH_KM = 1.5           # cells end this far from the nearest school
+GRID_KM = 0.5            # spacing of the bounding "outside" points
+PRECISION = 5            # decimals kept in GeoJSON coordinates (~1 m)
+
+# equirectangular projection around NYC (km)
+_LAT0 = 40.7
+_KX = 111.32 * np.cos(np.radians(_LAT0))
+_KY = 110.57
+
+
+def _project(lon, lat):
+    return np.column_stack([np.asarray(lon) * _KX, np.asarray(lat) * _KY])
+
+
+def _unproject(xy):
+    return np.round(xy[:, 0] / _KX, PRECISION), np.round(xy[:, 1] / _KY, PRECISION)
+
+
+# ── tessellation ─────────────────────────────────────────────────────
+def _outside_points(xy):
+    """Grid points farther than ``REACH_KM`` from every site, over the
+    sites' bounding box padded so the outermost cells are closed."""
+    pad = 3 * REACH_KM
+    lo, hi = xy.min(axis=0) - pad, xy.max(axis=0) + pad
+    gx, gy = np.meshgrid(np.arange(lo[0], hi[0], GRID_KM),
+                         np.arange(lo[1], hi[1], GRID_KM))
+    grid = np.column_stack([gx.ravel(), gy.ravel()])
+    dist, _ = cKDTree(xy).query(grid)
+    return grid[dist > REACH_KM]
+
+
+def _chain(edges):
+    """Join undirected vertex-index edges into closed rings."""
+    adj = defaultdict(list)
+    for i, (a, b) in enumerate(edges):
+        adj[a].append((b, i))
+        adj[b].append((a, i))
+    used = np.zeros(len(edges), dtype=bool)
+    rings = []
+    for i0, (start, cur) in enumerate(edges):
+        if used[i0]:
+            continue
+        used[i0] = True
+        ring = [start, cur]
+        while cur != start:
+            nxt = next(((v, i) for v, i in adj[cur] if not used[i]), None)
+            if nxt is None:
+                break
+            cur, i = nxt
+            used[i] = True
+            ring.append(cur)
+        rings.append(ring)
+    return rings
+
+
+def _signed_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * np.sum(x[:-1] * y[1:] - x[1:] * y[:-1])
+
+
+def _contains(ring, point):
+    """Ray-casting point-in-ring test."""
+    x0, y0 = ring[:-1, 0], ring[:-1, 1]
+    x1, y1 = ring[1:, 0], ring[1:, 1]
+    crosses = (y0 > point[1]) != (y1 > point[1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = x0 + (point[1] - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(crosses & (point[0] < x_at)) % 2)
+
+
+def _polygons(rings):
+    """Group rings into ``[exterior, *holes]`` polygons (exteriors
+    counter-clockwise, holes clockwise, as in RFC 7946)."""
+    rings = sorted(rings, key=lambda r: -abs(_signed_area(r)))
+    probes = [(r[0] + r[1]) / 2 for r in rings]
+    polygons, owner = [], {}
+    for i, ring in enumerate(rings):
+        outer = [j for j in range(i) if _contains(rings[j], probes[i])]
+        if len(outer) % 2:                    # inside an odd number: a hole
+            j = outer[-1]                     # smallest enclosing ring
+            polygons[owner[j]].append(ring if _signed_area(ring) < 0 else ring[::-1])
+        else:
+            owner[i] = len(polygons)
+            polygons.append([ring if _signed_area(ring) > 0 else ring[::-1]])
+    return polygons
+
+
+def dissolve(xy, labels):
+    """Voronoi cells of sites *xy* (projected km) merged by *labels*.
+
+    Returns ``{label: [polygon, …]}`` with each polygon a list of closed
+    rings in projected coordinates.
+    """
+    labels = np.asarray(labels)
+    codes, uniques = pd.factorize(labels)
+    outside = _outside_points(xy)
+    vor = Voronoi(np.vstack([xy, outside]))
+    site_code = np.concatenate([codes, np.full(len(outside), -1)])
+
+    left, right = site_code[vor.ridge_points].T
+    vertices = np.array(vor.ridge_vertices)
+    boundary = left != right
+    out = {}
+    for code, label in enumerate(uniques):
+        edges = vertices[boundary & ((left == code) | (right == code))]
+        rings = [vor.vertices[r] for r in _chain(edges.tolist()) if len(r) > 3]
+        out[label] = _polygons(rings)
+    return out
+
+
+def _feature_collection(shapes, properties):
+    features = []
+    for label, polygons in shapes.items():
+        coords = [
+            [np.column_stack(_unproject(ring)).tolist() for ring in polygon]
+            for polygon in polygons
+        ]
+        features.append(dict(
+            type="Feature", id=str(label), properties=properties[label],
+            geometry=dict(type="MultiPolygon", coordinates=coords),
+        ))
+    return dict(type="FeatureCollection", features=features)
+
+
+# ── build ────────────────────────────────────────────────────────────
+def build_geometry(dim_loc, key=None):
+    """District / borough GeoJSON and the school → district assignment
+    from the location table."""
+    loc = dim_loc.dropna(subset=["latitude", "longitude"])
+    xy_all = _project(loc["longitude"], loc["latitude"])
+    geo = loc["district"].astype(int).isin(GEOGRAPHIC_DISTRICTS).to_numpy()
+
+    # co-located schools share one site (Voronoi needs distinct points)
+    sites = (
+        loc.loc[geo, ["district", "borough"]]
+        .assign(x=xy_all[geo, 0].round(4), y=xy_all[geo, 1].round(4))
+        .groupby(["x", "y"])
+        .agg(lambda s: s.mode().iat[0])
+        .reset_index()
+    )
+    sites["district"] = sites["district"].astype(int)
+    xy = sites[["x", "y"]].to_numpy()
+
+    _, nearest = cKDTree(xy).query(xy_all)
+    assignment = pd.DataFrame({
+        "DBN": loc["DBN"].to_numpy(),
+        "district": loc["district"].astype(int).to_numpy(),
+        "geo_district": sites["district"].to_numpy()[nearest],
+        "geo_borough": sites["borough"].to_numpy()[nearest],
+    })
+
+    district_borough = sites.groupby("district")["borough"].first()
+    counts = {
+        level: assignment[f"geo_{level}"].value_counts() for level in GEO_LEVELS
+    }
+    layers = dict(
+        district=_feature_collection(
+            dissolve(xy, sites["district"]),
+            {d: dict(district=int(d), borough=district_borough[d],
+                     n_schools=int(counts["district"].get(d, 0)))
+             for d in district_borough.index},
+        ),
+        borough=_feature_collection(
+            dissolve(xy, sites["borough"]),
+            {b: dict(borough=b, n_schools=int(counts["borough"].get(b, 0)))
+             for b in sites["borough"].unique()},
+        ),
+    )
+    return dict(key=key, layers=layers, assignment=assignment)
+
+
+# ── persist ──────────────────────────────────────────────────────────
+def save_geometry(geometry, path=GEO_DIR):
+    path.mkdir(parents=True, exist_ok=True)
+    for level, layer in geometry["layers"].items():
+        (path / f"{level}s.geojson").write_text(json.dumps(layer))
+    geometry["assignment"].to_parquet(path / "school_districts.parquet", index=False)
+    (path / "meta.json").write_text(json.dumps(dict(key=geometry["key"])))
+
+
+def load_geometry(path=GEO_DIR):
+    """Read the persisted layer, or return None if it does not exist."""
+    if not (path / "meta.json").exists():
+        return None
+    return dict(
+        key=json.loads((path / "meta.json").read_text())["key"],
+        layers={level: json.loads((path / f"{level}s.geojson").read_text())
+                for level in GEO_LEVELS},
+        assignment=pd.read_parquet(path / "school_districts.parquet"),
+    )
+
+
+def update_geometry(version):
+    """Load the persisted layer, rebuilding it if it is not for data
+    *version*.  Returns ``(geometry, rebuilt)``."""
+    geometry = load_geometry()
+    if geometry is not None and geometry["key"] == version:
+        return geometry, False
+    _, dim_loc, _, _, _ = load_clean_tables()
+    geometry = build_geometry(dim_loc, version)
+    save_geometry(geometry)
+    return geometry, True
+
+
+@st.cache_resource(show_spinner="Loading district geometry…", max_entries=2)
+def get_geometry(version):
+    """District / borough layers and school assignment for data *version*."""
+    geometry, _ = update_geometry(version)
+    return geometry
+
+
+# ── aggregation ──────────────────────────────────────────────────────
+def area_summary(version, level="district"):
+    """Mean actual / predicted CCR and residual per map area, plus the
+    mean within-school gap of each subgroup (``gap_<Subgroup>``).
+
+    Indexed by the GeoJSON feature id of *level* (``"district"`` or
+    ``"borough"``); schools are placed by their geometric assignment.
+    """
+    return _area_summary(version, level, model_version(fit_beta_model()))
+
+
+@st.cache_data(show_spinner="Aggregating by district…", max_entries=8)
+def _area_summary(version, level, model):
+    """One cache entry per (data version, level, model version)."""
+    from utils.cube import cube_rows
+    from utils.scoring import load_predictions
+
+    area = f"geo_{level}"
+    assign = get_geometry(data_version(GEO_TABLES))["assignment"][["DBN", area]]
+    schools = assign.merge(
+        load_predictions()[["DBN", "actual_ccr", "predicted_ccr", "residual"]],
+        on="DBN",
+    )
+    out = schools.groupby(area).agg(
+        n_schools=("DBN", "size"),
+        actual_ccr=("actual_ccr", "mean"),
+        predicted_ccr=("predicted_ccr", "mean"),
+        residual=("residual", "mean"),
+    )
+
+    gaps = cube_rows(version)[["DBN", "Subgroup", "intra_school_gap"]].merge(assign, on="DBN")
+    out = out.join(
+        gaps.pivot_table(index=area, columns="Subgroup", values="intra_school_gap",
+                         aggfunc="mean")
+        .add_prefix("gap_")
+    )
+    out.index = out.index.astype(str)
+    return out.rename_axis("id")
+
+
+if __name__ == "__main__":
+    geometry, rebuilt = update_geometry(data_version(GEO_TABLES))
+    sizes = {level: len(layer["features"]) for level, layer in geometry["layers"].items()}
+    print(
+        f"Geometry {GEO_DIR} — {sizes['district']} districts, {sizes['borough']} "
+        f"boroughs, {len(geometry['assignment'])} schools assigned"
+        + ("" if rebuilt else " (up to date)")
+    )
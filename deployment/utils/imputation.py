@@ -0,0 +1,177 @@
+"""
+Suppression-aware CCR estimates for subgroup cells.
+Empirical-Bayes beta-binomial shrinkage: every subgroup × school cell gets
+a Beta prior centred on the school's overall CCR shifted by that
+subgroup's typical gap in the borough, with a per-subgroup concentration
+fitted to the reported cells by beta-binomial marginal likelihood.
+Reported cells are shrunk toward the prior using their cohort size;
+suppressed cells (n < 15) get the prior mean as the estimate, with a
+beta-binomial interval for the hidden cohort rate.  All subgroups are
+handled in one vectorized pass.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize_scalar
+from scipy.special import betaln, expit, logit
+from scipy.stats import beta as beta_dist, betabinom
+import streamlit as st
+
+from utils.data_loader import build_subgroup_data, within_school_gaps
+
+# pseudo-count pulling a (subgroup, borough) gap toward the subgroup-wide gap
+BOROUGH_SHRINK = 10.0
+INTERVAL = 0.95
+# search range of the prior concentration κ (prior pseudo-students), the
+# fewest reported cells a fit needs, and the κ used when no fit is possible
+KAPPA_RANGE = (0.1, 1e5)
+MIN_CELLS = 30
+DEFAULT_KAPPA = 20.0
+
+
+def _group_mean(values, keys, weights=None):
+    """Mean of *values* per key, broadcast back to every row."""
+    w = np.ones_like(values) if weights is None else weights
+    df = pd.DataFrame({"k": keys, "vw": values * w, "w": w})
+    g = df.groupby("k")[["vw", "w"]].transform("sum")
+    return (g["vw"] / g["w"]).to_numpy(), g["w"].to_numpy()
+
+
+def _fit_concentration(k, n, m):
+    """Maximum-likelihood κ of the beta-binomial k ~ BB(n, mκ, (1-m)κ)
+    (k may be fractional: published rates are rounded).  Raises
+    ``ValueError`` for fewer than ``MIN_CELLS`` cells or when the optimum
+    sits on a bound of ``KAPPA_RANGE`` — no extra-binomial spread, or no
+    information about it."""
+    if len(k) < MIN_CELLS:
+        raise ValueError(f"{len(k)} reported cells, need {MIN_CELLS} to fit κ")
+
+    def nll(log_kappa):
+        kappa = np.exp(log_kappa)
+        a, b = m * kappa, (1 - m) * kappa
+        return -(betaln(k + a, n - k + b) - betaln(a, b)).sum()
+
+    lo, hi = np.log(KAPPA_RANGE)
+    res = minimize_scalar(nll, bounds=(lo, hi), method="bounded")
+    if not res.success or min(res.x - lo, hi - res.x) < 1e-3:
+        raise ValueError(f"degenerate prior concentration (κ = {np.exp(res.x):.3g}) "
+                         f"from {len(k)} reported cells")
+    return float(np.exp(res.x))
+
+
+def _betabinom_interval(n, a, b, tail):
+    """Equal-tailed beta-binomial interval for k/n, computed from a
+    (max n + 1) × N cdf table instead of per-cell root finding."""
+    n_int = n.astype(int)
+    ks = np.arange(n_int.max() + 1)[:, None]
+    pmf = np.where(ks <= n_int, betabinom.pmf(ks, n_int, a, b), 0.0)
+    cdf = np.cumsum(pmf, axis=0)
+    lo = np.argmax(cdf >= tail, axis=0)
+    hi = np.argmax(cdf >= 1 - tail, axis=0)
+    return lo / n, hi / n
+
+
+def estimate_subgroup_ccr(sg, interval=INTERVAL):
+    """Return *sg* with posterior CCR estimates for every cell with a cohort.
+
+    Adds ``ccr_est``, ``ccr_se``, ``ccr_lo``, ``ccr_hi`` (all in %) and
+    ``ccr_source`` (``"reported"`` / ``"imputed"``; NaN for no-cohort rows,
+    which have no students to estimate).
+    """
+    out = sg.copy()
+    n = out["n_count_ccr"].to_numpy(dtype=float)
+    p_obs = out["ccr_rate"].to_numpy(dtype=float)
+    subgroup = out["Subgroup"].to_numpy()
+    borough = out["borough"].fillna("Unknown").to_numpy()
+    rep = ~np.isnan(p_obs) & (n > 0)
+    has_cohort = n > 0
+
+    # school anchor on the logit scale, borough mean where the school-wide
+    # CCR is missing
+    school = out["metric_value_4yr_ccr_all_students"].to_numpy(dtype=float) / 100
+    school_logit = logit(np.clip(school, 0.005, 0.995))
+    known = ~np.isnan(school_logit)
+    boro_mean, _ = _group_mean(
+        np.where(known, school_logit, 0.0), borough, known.astype(float)
+    )
+    anchor = np.where(known, school_logit, boro_mean)
+    anchor = np.where(np.isnan(anchor), np.nanmean(school_logit), anchor)
+
+    # subgroup gap relative to the anchor, pooled borough → subgroup
+    n_safe = np.where(n > 0, n, 1.0)
+    p_clip = np.clip(p_obs, 0.5 / n_safe, 1 - 0.5 / n_safe)
+    gap = np.where(rep, logit(p_clip) - anchor, 0.0)
+    w_rep = rep.astype(float)
+    sg_gap, _ = _group_mean(gap, subgroup, w_rep)
+    sb_gap, sb_n = _group_mean(gap, subgroup + "|" + borough, w_rep)
+    sg_gap = np.nan_to_num(sg_gap)
+    sb_gap = np.nan_to_num(sb_gap)
+    lam = sb_n / (sb_n + BOROUGH_SHRINK)
+    prior_mean = expit(anchor + lam * sb_gap + (1 - lam) * sg_gap)
+
+    # per-subgroup concentration κ by beta-binomial marginal likelihood of
+    # the reported cells; subgroups with too few cells (or a degenerate
+    # fit) use the κ pooled over all subgroups, and if that cannot be
+    # fitted either, ``DEFAULT_KAPPA``
+    k = np.where(rep, p_obs * n, 0.0)
+    try:
+        pooled = _fit_concentration(k[rep], n[rep], prior_mean[rep])
+    except ValueError:
+        pooled = DEFAULT_KAPPA
+    kappa = np.full(len(out), pooled)
+    for name in np.unique(subgroup):
+        cells = rep & (subgroup == name)
+        try:
+            kappa[subgroup == name] = _fit_concentration(k[cells], n[cells],
+                                                         prior_mean[cells])
+        except ValueError:
+            pass
+    rho = 1.0 / (kappa + 1.0)
+
+    # posterior Beta(a, b); suppressed cells carry no successes
+    n_obs = np.where(rep, n, 0.0)
+    a = prior_mean * kappa + k
+    b = (1 - prior_mean) * kappa + (n_obs - k)
+
+    est = a / (a + b)
+    tail = (1 - interval) / 2
+
+    # reported: uncertainty of the school's true subgroup rate
+    se = np.sqrt(a * b / ((a + b) ** 2 * (a + b + 1)))
+    lo = beta_dist.ppf(tail, a, b)
+    hi = beta_dist.ppf(1 - tail, a, b)
+
+    # suppressed: uncertainty of the hidden rate for a cohort of n students
+    imp = has_cohort & ~rep
+    se[imp] = np.sqrt(est * (1 - est) * (rho + (1 - rho) / n_safe))[imp]
+    if imp.any():
+        lo[imp], hi[imp] = _betabinom_interval(n[imp], a[imp], b[imp], tail)
+
+    mask = np.where(has_cohort, 1.0, np.nan)
+    out["ccr_est"] = est * 100 * mask
+    out["ccr_se"] = se * 100 * mask
+    out["ccr_lo"] = lo * 100 * mask
+    out["ccr_hi"] = hi * 100 * mask
+    out["ccr_source"] = np.where(
+        rep, "reported", np.where(has_cohort, "imputed", None)
+    )
+    return out
+
+
+@st.cache_data(show_spinner="Estimating suppressed subgroup CCR…")
+def build_imputed_subgroup_data(version):
+    """Estimates for the full fact table, cached per data *version*.
+
+    Returns ``(sg_est, analysis, multi)`` where *analysis* holds reported
+    cells at their published CCR plus suppressed cells at their estimate
+    (``is_imputed`` flags which), and *multi* is the within-school gap
+    table rebuilt from it.
+    """
+    sg_all, _, _ = build_subgroup_data()
+    sg_est = estimate_subgroup_ccr(sg_all)
+
+    analysis = sg_est[sg_est["ccr_source"].notna()].copy()
+    analysis["is_imputed"] = analysis["ccr_source"] == "imputed"
+    analysis["ccr_pct"] = analysis["ccr_pct"].fillna(analysis["ccr_est"])
+    multi = within_school_gaps(analysis)
+    return sg_est, analysis, multi
@@ -0,0 +1,155 @@
+"""
+Inverse prediction: the smallest change that reaches a target CCR.
+With economic need held fixed, the beta model's logit is linear in each
+controllable feature (attendance, teaching environment, student support) —
+the ENI × teaching interaction only makes the teaching slope depend on the
+school's ENI.  So for every school the required logit gain is spread over
+the chosen features in closed form: the change minimising
+``Σ (Δx_j / sd_j)²`` (effort in school-to-school standard deviations)
+is proportional to ``slope_j · sd_j²``, and features that would pass their
+upper bound are held there while the rest are solved again (at most one
+pass per feature).  All schools are solved at once as N × features arrays.
+
+Changes only raise features; a feature whose slope is not positive is
+left alone, and a target that cannot be reached within bounds reports
+the best attainable CCR instead.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import load_model, model_frame, model_version
+from utils.scenarios import SCENARIO_FEATURES
+from utils.scoring import contribution_matrix
+
+CONTROLLABLE = [
+    "avg_student_attendance",
+    "teaching_environment_pct_positive",
+    "student_support_pct",
+]
+STATUSES = ("met", "reachable", "unreachable")
+
+
+def _logit(p):
+    return np.log(p / (1.0 - p))
+
+
+def logit_slopes(art, frame, features):
+    """N × features change in the logit per unit of each raw feature,
+    evaluated at each school's ENI."""
+    nf = art["numerical_features"]
+    params = art["params"]
+    scale = dict(zip(nf, art["scaler"].scale_))
+    slopes = np.empty((len(frame), len(features)))
+    for j, f in enumerate(features):
+        slopes[:, j] = params[f] / scale[f]
+        if f == "teaching_environment_pct_positive":
+            eni = frame["economic_need_index"].to_numpy(dtype=float)
+            slopes[:, j] += params["eni_x_teach"] / scale["eni_x_teach"] * eni
+    return slopes
+
+
+def solve_target(art, frame, target, features=CONTROLLABLE):
+    """Minimum-effort change in *features* that lifts each school in
+    *frame* to *target* CCR (%).
+
+    Returns one row per school: actual (if known) and predicted CCR,
+    ``status`` (one of ``STATUSES``), ``change_<feature>`` (raw units,
+    e.g. 0.03 = 3 pts), the resulting feature values, the CCR reached and
+    the effort in standard deviations.
+    """
+    features = list(features)
+    unknown = set(features) - set(CONTROLLABLE)
+    if unknown:
+        raise ValueError(f"not a controllable feature: {sorted(unknown)}")
+    if not 0 < target < 100:
+        raise ValueError("target CCR must be between 0 and 100 %")
+
+    _, contribs = contribution_matrix(art, frame)
+    logit0 = contribs.sum(axis=1)
+    need = _logit(target / 100) - logit0
+
+    x = frame[features].to_numpy(dtype=float)
+    upper = np.array([SCENARIO_FEATURES[f][1] for f in features])
+    room = np.maximum(upper - x, 0.0)
+    g = logit_slopes(art, frame, features)
+    sd = art["scaler"].scale_[[art["numerical_features"].index(f) for f in features]]
+    w = g * sd ** 2
+
+    # water-filling: solve over the free features, clamp those past their
+    # bound, repeat with the remaining need
+    dx = np.zeros_like(x)
+    todo = need > 0
+    free = todo[:, None] & (g > 0) & (room > 0)
+    clamped = np.zeros_like(free)
+    for _ in range(len(features)):
+        rest = need - (g * np.where(clamped, room, 0.0)).sum(axis=1)
+        denom = (g * w * free).sum(axis=1)
+        lam = np.divide(rest, denom, out=np.zeros_like(rest), where=denom > 0)
+        trial = lam[:, None] * w
+        over = free & (trial > room)
+        dx = np.where(clamped, room, np.where(free, trial, 0.0))
+        if not over.any():
+            break
+        clamped |= over
+        free &= ~over
+    dx = np.where(clamped, room, dx)
+
+    reached = logit0 + (g * dx).sum(axis=1)
+    status = np.where(
+        ~todo, "met",
+        np.where(reached >= _logit(target / 100) - 1e-9, "reachable", "unreachable"),
+    )
+
+    ids = [c for c in ("DBN", "school_name", "borough") if c in frame]
+    out = frame[ids].reset_index(drop=True)
+    if "metric_value_4yr_ccr_all_students" in frame:
+        out["actual_ccr"] = frame["metric_value_4yr_ccr_all_students"].to_numpy()
+    out["predicted_ccr"] = 100.0 / (1.0 + np.exp(-logit0))
+    out["target_ccr"] = float(target)
+    out["status"] = status
+    for j, f in enumerate(features):
+        out[f"change_{f}"] = dx[:, j]
+        out[f] = x[:, j] + dx[:, j]
+    out["reached_ccr"] = 100.0 / (1.0 + np.exp(-reached))
+    out["effort_sd"] = np.sqrt(((dx / sd) ** 2).sum(axis=1))
+    return out
+
+
+# ── hypothetical school ──────────────────────────────────────────────
+def input_frame(art, eni, pct_temp, teaching, attendance, support, borough):
+    """One-row model frame for slider inputs (as in ``predict_ccr``)."""
+    row = {
+        "economic_need_index": eni,
+        "percent_temp_housing": pct_temp,
+        "log_temp_housing": np.log(pct_temp + 0.001),
+        "teaching_environment_pct_positive": teaching,
+        "eni_x_teach": eni * teaching,
+        "avg_student_attendance": attendance,
+        "student_support_pct": support,
+        "borough": borough,
+    }
+    for b in art["borough_features"]:
+        row[b] = 1.0 if b == f"borough_{borough}" else 0.0
+    return pd.DataFrame([row])
+
+
+def solve_for_inputs(art, eni, pct_temp, teaching, attendance, support, borough,
+                     target, features=CONTROLLABLE):
+    """``solve_target`` for a hypothetical school; returns its one row."""
+    frame = input_frame(art, eni, pct_temp, teaching, attendance, support, borough)
+    return solve_target(art, frame, target, features).iloc[0]
+
+
+# ── all schools ──────────────────────────────────────────────────────
+def solve_all_schools(art, target, features=CONTROLLABLE):
+    """``solve_target`` for every school under the model *art*."""
+    return _solve_all(art["kind"], model_version(art), float(target), tuple(features))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _solve_all(kind, version, target, features):
+    """One cache entry per (model kind, model version, target, features)."""
+    art = load_model(kind)
+    return solve_target(art, model_frame(art), target, features)
@@ -0,0 +1,274 @@
+"""
+Model search: candidate feature sets × model families under K-fold
+cross-validation on the training split, dispatched to a process pool.
+
+Each candidate's scores are cached on disk under a key built from its spec,
+the CV setup and a hash of the modelling frame, so re-running the job only
+evaluates new or changed candidates.  The job writes a leaderboard, then
+promotes the winner to the model artifact store, gated on its test metrics
+like a refit (``refit.promote``).  A winner the app can serve — the
+notebook features with the beta family, i.e. the ``fixed`` model — is
+refit by its ``MODEL_FITTERS`` entry and persisted as ``fixed``; any other
+winner is refit here and persisted as ``candidate`` for review, since the
+pages depend on the served models' features.
+
+Run as a pipeline stage (from ``deployment/``):
+    python -m utils.model_search --workers 4
+"""
+
+import argparse
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy.special import expit, logit
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+from statsmodels.othermod.betareg import BetaModel
+
+from utils.data_loader import (
+    ARTIFACT_DIR, MODEL_FITTERS, MODEL_TABLES, data_version, load_clean_tables,
+    model_inputs, model_version,
+)
+from utils.refit import artifact_path, promote
+
+SEARCH_DIR = ARTIFACT_DIR / "model_search"
+CACHE_DIR = SEARCH_DIR / "cache"
+LEADERBOARD_PATH = SEARCH_DIR / "leaderboard.csv"
+
+# search spec → served model kind that fits it; other winners are stored
+# under CANDIDATE_KIND
+SERVED_SPECS = {("notebook", "beta"): "fixed"}
+CANDIDATE_KIND = "candidate"
+
+N_FOLDS = 5
+MAX_WORKERS = 4
+SEED = 42
+
+# cohort size used as binomial trials
+N_COUNT_COL = "n_count_4yr_graduation_rate_all_students"
+
+BOROUGH_FEATURES = [
+    "borough_Brooklyn", "borough_Manhattan", "borough_Queens", "borough_Staten Island",
+]
+FEATURE_SETS = {
+    "notebook": [
+        "economic_need_index", "log_temp_housing",
+        "teaching_environment_pct_positive", "eni_x_teach",
+        "avg_student_attendance", "student_support_pct",
+    ] + BOROUGH_FEATURES,
+    "no_interaction": [
+        "economic_need_index", "log_temp_housing",
+        "teaching_environment_pct_positive",
+        "avg_student_attendance", "student_support_pct",
+    ] + BOROUGH_FEATURES,
+    "no_borough": [
+        "economic_need_index", "log_temp_housing",
+        "teaching_environment_pct_positive", "eni_x_teach",
+        "avg_student_attendance", "student_support_pct",
+    ],
+    "linear_housing": [
+        "economic_need_index", "percent_temp_housing",
+        "teaching_environment_pct_positive", "eni_x_teach",
+        "avg_student_attendance", "student_support_pct",
+    ] + BOROUGH_FEATURES,
+    "core_stressors": [
+        "economic_need_index", "log_temp_housing", "avg_student_attendance",
+    ] + BOROUGH_FEATURES,
+}
+FAMILIES = ("beta", "ols_logit", "glm_binomial")
+
+
+# ── data ─────────────────────────────────────────────────────────────
+def search_frame():
+    """Training and test frames (raw features, target, cohort size)."""
+    inp = model_inputs()
+    df = inp["model_df"].merge(
+        load_clean_tables()[0][["DBN", N_COUNT_COL]], on="DBN", how="left",
+    ).set_index(inp["model_df"].index)
+    df["n_count"] = df[N_COUNT_COL].fillna(df[N_COUNT_COL].median())
+    df["y"] = df["ccr_prop"]
+    cols = sorted({f for fs in FEATURE_SETS.values() for f in fs}) + ["y", "n_count"]
+    return df.loc[inp["train_index"], cols], df.loc[inp["test_index"], cols]
+
+
+def frame_digest(frame):
+    return hashlib.sha1(
+        pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes()
+    ).hexdigest()[:16]
+
+
+def candidate_key(spec, digest, n_folds):
+    payload = json.dumps(dict(spec, digest=digest, folds=n_folds, seed=SEED),
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+# ── families ─────────────────────────────────────────────────────────
+def _design(train, other, features):
+    """Scale non-dummy features on *train* only; add an intercept."""
+    num = [f for f in features if not f.startswith("borough_")]
+    scaler = StandardScaler().fit(train[num])
+
+    def _x(frame):
+        X = frame[features].astype(float).copy()
+        X[num] = scaler.transform(frame[num])
+        return sm.add_constant(X, has_constant="add")
+
+    return _x(train), _x(other), scaler
+
+
+def fit_family(family, X, frame):
+    """Fit *family* on design *X*; return a predict(X) → proportion."""
+    y = frame["y"].to_numpy()
+    if family == "beta":
+        res = BetaModel(y, X).fit(disp=False)
+        return res, lambda Xn: np.asarray(res.predict(Xn))
+    if family == "ols_logit":
+        res = sm.OLS(logit(y), X).fit()
+        return res, lambda Xn: expit(np.asarray(res.predict(Xn)))
+    if family == "glm_binomial":
+        res = sm.GLM(y, X, family=sm.families.Binomial(),
+                     var_weights=frame["n_count"].to_numpy()).fit()
+        return res, lambda Xn: np.asarray(res.predict(Xn))
+    raise ValueError(f"unknown model family {family!r}")
+
+
+def _scores(frame, pred_prop):
+    y = frame["y"].to_numpy() * 100
+    res = y - pred_prop * 100
+    return dict(mae=float(np.mean(np.abs(res))), rmse=float(np.sqrt(np.mean(res ** 2))))
+
+
+def evaluate_candidate(spec, train, n_folds=N_FOLDS):
+    """Cross-validated MAE / RMSE (CCR points) of one candidate."""
+    features = FEATURE_SETS[spec["features"]]
+    folds = KFold(n_folds, shuffle=True, random_state=SEED).split(train)
+    maes, rmses = [], []
+    for tr, va in folds:
+        f_tr, f_va = train.iloc[tr], train.iloc[va]
+        X_tr, X_va, _ = _design(f_tr, f_va, features)
+        _, predict = fit_family(spec["family"], X_tr, f_tr)
+        s = _scores(f_va, predict(X_va))
+        maes.append(s["mae"])
+        rmses.append(s["rmse"])
+    return dict(
+        spec, n_features=len(features),
+        cv_mae=float(np.mean(maes)), cv_mae_sd=float(np.std(maes, ddof=1)),
+        cv_rmse=float(np.mean(rmses)),
+    )
+
+
+# ── job ──────────────────────────────────────────────────────────────
+def _cached(key):
+    path = CACHE_DIR / f"{key}.json"
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def run_search(specs=None, workers=MAX_WORKERS, n_folds=N_FOLDS, use_cache=True):
+    """Evaluate every candidate (cached ones are read back) and return the
+    leaderboard sorted by CV MAE, plus the train / test frames."""
+    if specs is None:
+        specs = [dict(features=f, family=m) for f, m in product(FEATURE_SETS, FAMILIES)]
+    train, test = search_frame()
+    digest = frame_digest(train)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    keys = [candidate_key(s, digest, n_folds) for s in specs]
+    results = {k: _cached(k) if use_cache else None for k in keys}
+    todo = [(k, s) for k, s in zip(keys, specs) if results[k] is None]
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                k: pool.submit(evaluate_candidate, s, train, n_folds) for k, s in todo
+            }
+            for k, fut in futures.items():
+                results[k] = fut.result()
+                (CACHE_DIR / f"{k}.json").write_text(json.dumps(results[k]))
+
+    board = pd.DataFrame([dict(results[k], key=k, cached=k not in dict(todo))
+                          for k in keys])
+    board = board.sort_values("cv_mae", ignore_index=True)
+    board.insert(0, "rank", np.arange(1, len(board) + 1))
+    return board, train, test
+
+
+def candidate_artifacts(spec, train, test):
+    """Refit *spec* on the full training split and return an artifact
+    dict in the store's layout: a core with the test metrics ``refit``
+    gates on, and the test predictions and fit as payloads."""
+    features = FEATURE_SETS[spec["features"]]
+    X_tr, X_te, scaler = _design(train, test, features)
+    res, predict = fit_family(spec["family"], X_tr, train)
+
+    actual = test["y"].to_numpy() * 100
+    predicted = predict(X_te) * 100
+    scores = _scores(test, predicted / 100)
+    r = np.corrcoef(actual, predicted)[0, 1]
+    predictions = pd.DataFrame({
+        "split": "test", "actual": actual, "predicted": predicted,
+    }, index=test.index)
+    predictions["residual"] = predictions["actual"] - predictions["predicted"]
+
+    art = dict(
+        kind=CANDIDATE_KIND, spec=spec, features=features,
+        params=res.params.copy(), scaler=scaler,
+        test_metrics=dict(Set="Test", MAE=round(scores["mae"], 2),
+                          RMSE=round(scores["rmse"], 2), r=round(r, 4),
+                          r2=round(r ** 2, 4), N=len(test)),
+        data_digest=frame_digest(train),
+    )
+    art["model_version"] = model_version(art)
+    art["payloads"] = dict(predictions=predictions, results=res)
+    return art
+
+
+def promote_candidate(spec, train, test, force=False):
+    """Persist the winner *spec* to the artifact store (see the module
+    docstring).  Returns ``(kind, entry or None, art, deltas or None)``;
+    the entry is None when the metrics gate rejected it."""
+    kind = SERVED_SPECS.get((spec["features"], spec["family"]), CANDIDATE_KIND)
+    art = (MODEL_FITTERS[kind]() if kind in MODEL_FITTERS
+           else candidate_artifacts(spec, train, test))
+    entry, deltas = promote(kind, data_version(MODEL_TABLES), art, force=force)
+    return kind, entry, art, deltas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-evaluate every candidate")
+    parser.add_argument("--no-promote", action="store_true",
+                        help="only write the leaderboard")
+    parser.add_argument("--force", action="store_true",
+                        help="promote the winner regardless of metric deltas")
+    args = parser.parse_args()
+
+    board, train, test = run_search(workers=args.workers, n_folds=args.folds,
+                                    use_cache=not args.no_cache)
+    board.to_csv(LEADERBOARD_PATH, index=False)
+    print(board.drop(columns="key").round(3).to_string(index=False))
+    print(f"\n{int((~board['cached']).sum())} evaluated, "
+          f"{int(board['cached'].sum())} from cache → {LEADERBOARD_PATH}")
+
+    if not args.no_promote:
+        best = board.iloc[0]
+        spec = dict(features=best["features"], family=best["family"])
+        kind, entry, art, deltas = promote_candidate(spec, train, test, force=args.force)
+        if deltas is not None:
+            print(deltas.round(3).to_string(index=False))
+        m = art["test_metrics"]
+        label = (f"{spec['features']} / {spec['family']} "
+                 f"(test MAE {m['MAE']:.2f}, RMSE {m['RMSE']:.2f})")
+        if entry is not None:
+            print(f"Promoted {label} as {kind} model {entry['model_version']} "
+                  f"→ {artifact_path(kind)}")
+        else:
+            print(f"Rejected {label} — kept the persisted {kind} model")
@@ -0,0 +1,263 @@
+"""
+Page latency harness: scripted interaction sequences replayed by
+headless app sessions (Streamlit's ``AppTest``), many at once.
+Each session loads a page and replays a scenario — slider drags on the
+Predictive Tool, filter toggles on Equity Analysis, tab switches on Bias &
+Limitations — with a random pause between interactions, timing every
+rerun.  Sessions run as threads of one process, like sessions of one
+Streamlit server, sharing its data and model caches; resident memory is
+sampled throughout.
+
+``AppTest`` swaps a process-wide runtime in and out around each run, so
+runs of different sessions cannot overlap: reruns queue on one lock, and
+a rerun's latency is its wait in that queue plus its run time — the
+queueing a busy server process adds (Python-bound reruns serialize on
+the interpreter lock anyway).  ``AppTest`` also reruns the whole script
+for every interaction, so widgets inside fragments are timed as full
+reruns, an upper bound on what the browser waits for.
+
+Run from ``deployment/``; ``--baseline`` compares every step's median run
+time (queue wait excluded, so it does not depend on how sessions
+happened to collide) with an earlier ``summary.csv`` and exits non-zero
+on a regression:
+    python -m utils.page_latency --sessions 8 --rounds 3 [--baseline old/summary.csv]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from utils.data_loader import ARTIFACT_DIR, BOROUGHS
+
+PAGES_DIR = Path(__file__).resolve().parent.parent / "pages"
+LATENCY_DIR = ARTIFACT_DIR / "latency"
+TIMEOUT = 300              # seconds per rerun, generous for cold caches
+SAMPLE_SECONDS = 0.05
+THINK_SECONDS = 0.25       # mean pause between a session's interactions
+TOLERANCE = 0.5            # largest accepted increase of a median run time
+SUBGROUPS = ["Asian", "Black", "Hispanic", "White"]
+
+# scenario → page and steps; a step is (widget kind, label, values), each
+# value is one rerun.  Kind "tab" sets the tab-group key to a tab label.
+SCENARIOS = {
+    "predictive_sliders": dict(
+        page="2_Predictive_Tool.py",
+        steps=[
+            ("slider", "Economic Need Index", [0.62, 0.64, 0.66, 0.68, 0.70]),
+            ("slider", "Avg Student Attendance", [0.72, 0.75, 0.78, 0.80]),
+            ("slider", "% Temporary Housing", [0.10, 0.12, 0.14]),
+            ("slider", "Teaching Environment (% Positive)", [0.80, 0.85]),
+            ("selectbox", "Borough", ["Brooklyn", "Queens"]),
+            ("toggle", "Show 95 % uncertainty", [False, True]),
+            ("slider", "Target CCR (%)", [60, 70]),
+            ("slider", "Number of peer schools", [8, 10]),
+        ],
+    ),
+    "equity_filters": dict(
+        page="3_Equity_Analysis.py",
+        steps=[
+            ("multiselect", "Filter by Borough", [["Bronx", "Brooklyn"], BOROUGHS]),
+            ("multiselect", "Filter by Ethnicity", [["Black", "Hispanic"], SUBGROUPS]),
+            ("toggle", "Include estimated CCR for suppressed subgroups (n < 15)",
+             [True, False]),
+            ("tab", "equity_tab", ["Stressor Impact"]),
+            ("selectbox", "Select Stressor",
+             ["percent_temp_housing", "avg_student_attendance"]),
+            ("tab", "equity_tab", ["Within-School Gaps", "CCR Distributions"]),
+        ],
+    ),
+    "bias_tabs": dict(
+        page="4_Bias_Limitations.py",
+        steps=[
+            ("tab", "bias_tab", ["Missingness Profiles"]),
+            ("selectbox", "Select variable to compare",
+             ["avg_student_attendance", "student_percent"]),
+            ("tab", "bias_tab", ["Implications & Tradeoffs", "Data Availability"]),
+        ],
+    ),
+}
+
+
+# ── memory ───────────────────────────────────────────────────────────
+def rss_mib():
+    """Resident memory of this process (Linux), else the peak so far."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class MemorySampler:
+    """Peak resident memory while the ``with`` block runs."""
+
+    def __enter__(self):
+        self.start = self.peak = rss_mib()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self.peak = max(self.peak, rss_mib())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end = rss_mib()
+        self.peak = max(self.peak, self.end)
+
+
+# ── sessions ─────────────────────────────────────────────────────────
+def _widget(at, kind, label):
+    matches = [w for w in getattr(at, kind) if w.label == label]
+    if not matches:
+        errors = "; ".join(e.value for e in at.exception)
+        raise LookupError(f"no {kind} labelled {label!r} on the page"
+                          + (f" (page raised: {errors})" if errors else ""))
+    return matches[0]
+
+
+# AppTest runs cannot overlap (see the module docstring)
+_RUN_LOCK = threading.Lock()
+
+
+def _timed(run):
+    """``(app, total ms, ms waiting for the run lock)``."""
+    start = time.perf_counter()
+    with _RUN_LOCK:
+        began = time.perf_counter()
+        at = run()
+    end = time.perf_counter()
+    return at, (end - start) * 1000, (began - start) * 1000
+
+
+def run_session(session, scenario, rounds=1, think=THINK_SECONDS):
+    """Load the scenario's page and replay its steps *rounds* times,
+    pausing a random *think* seconds on average between interactions;
+    one record per rerun."""
+    spec = SCENARIOS[scenario]
+    rng = np.random.default_rng(session)
+    records = []
+
+    def _record(rnd, action, value, timed):
+        at, ms, wait_ms = timed
+        records.append(dict(
+            session=session, scenario=scenario, page=spec["page"], round=rnd,
+            action=action, value=str(value), ms=ms, wait_ms=wait_ms,
+            exceptions=len(at.exception), rss_mib=rss_mib(),
+        ))
+        return at
+
+    at = AppTest.from_file(str(PAGES_DIR / spec["page"]), default_timeout=TIMEOUT)
+    at = _record(0, "load", "", _timed(at.run))
+    for rnd in range(1, rounds + 1):
+        for kind, label, values in spec["steps"]:
+            for value in values:
+                time.sleep(rng.exponential(think) if think else 0)
+                if kind == "tab":
+                    # tabs differ in cost: one action per tab
+                    at.session_state[label] = value
+                    at = _record(rnd, f"tab: {value}", value, _timed(at.run))
+                else:
+                    widget = _widget(at, kind, label)
+                    at = _record(rnd, f"{kind}: {label}", value,
+                                 _timed(widget.set_value(value).run))
+    return records
+
+
+def run_harness(scenarios=tuple(SCENARIOS), sessions=4, rounds=2,
+                think=THINK_SECONDS):
+    """*sessions* concurrent sessions, assigned to *scenarios* in turn.
+
+    Returns ``(runs, summary, memory)``: one row per rerun, latency
+    percentiles per scenario × action, and resident memory in MiB."""
+    with MemorySampler() as mem, ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [
+            pool.submit(run_session, i, scenarios[i % len(scenarios)], rounds, think)
+            for i in range(sessions)
+        ]
+        runs = pd.DataFrame([r for f in futures for r in f.result()])
+    memory = dict(start_mib=mem.start, peak_mib=mem.peak, end_mib=mem.end,
+                  per_session_mib=(mem.end - mem.start) / sessions)
+    return runs, summarize(runs), memory
+
+
+def summarize(runs):
+    """Rerun count, errors and latency percentiles (ms) per scenario ×
+    action."""
+    groups = runs.groupby(["scenario", "action"], sort=False)
+    ms = groups["ms"]
+    summary = pd.DataFrame({
+        "reruns": ms.size(),
+        "errors": groups["exceptions"].sum(),
+        "p50_ms": ms.quantile(0.50),
+        "p90_ms": ms.quantile(0.90),
+        "p99_ms": ms.quantile(0.99),
+        "max_ms": ms.max(),
+        "mean_wait_ms": groups["wait_ms"].mean(),
+        "median_run_ms": (runs["ms"] - runs["wait_ms"]).groupby(
+            [runs["scenario"], runs["action"]], sort=False).median(),
+    })
+    return summary.reset_index()
+
+
+def regressions(summary, baseline, tolerance=TOLERANCE):
+    """Steps whose median run time exceeds the *baseline*'s by more than
+    *tolerance*, or that raise more often."""
+    both = summary.merge(baseline, on=["scenario", "action"], suffixes=("", "_base"))
+    both["change"] = both["median_run_ms"] / both["median_run_ms_base"] - 1
+    bad = both[(both["change"] > tolerance) | (both["errors"] > both["errors_base"])]
+    return bad[["scenario", "action", "median_run_ms_base", "median_run_ms", "change",
+                "errors_base", "errors"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS),
+                        default=list(SCENARIOS))
+    parser.add_argument("--sessions", type=int, default=4,
+                        help="concurrent sessions, spread over the scenarios")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="replays of each scenario's steps per session")
+    parser.add_argument("--think", type=float, default=THINK_SECONDS,
+                        help="mean seconds between a session's interactions")
+    parser.add_argument("--out", default=str(LATENCY_DIR))
+    parser.add_argument("--baseline", default=None, help="earlier summary.csv")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    runs, summary, memory = run_harness(tuple(args.scenario), args.sessions, args.rounds,
+                                         args.think)
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    runs.to_csv(out / "runs.csv", index=False)
+    summary.to_csv(out / "summary.csv", index=False)
+
+    pd.set_option("display.width", 160)
+    print(summary.round(1).to_string(index=False))
+    steps = runs[runs["action"] != "load"]["ms"]
+    print(f"\n{len(runs)} reruns by {args.sessions} sessions; interaction "
+          f"p50 {np.percentile(steps, 50):.0f} ms, p90 {np.percentile(steps, 90):.0f} ms")
+    print("Memory (MiB): " + ", ".join(f"{k} {v:.0f}" for k, v in memory.items()))
+    print(f"Wrote {out / 'runs.csv'} and {out / 'summary.csv'}")
+
+    if args.baseline:
+        bad = regressions(summary, pd.read_csv(args.baseline), args.tolerance)
+        if len(bad):
+            print(f"\nRegressions (median run more than {args.tolerance:.0%} slower, "
+                  "or new errors):")
+            print(bad.round(2).to_string(index=False))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
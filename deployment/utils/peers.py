@@ -0,0 +1,150 @@
+"""
+Peer-school similarity search.
+Nearest-neighbour index over the model's standardized feature space so a
+hypothetical school (Predictive Tool sliders) or a real DBN can be matched
+to the most similar real schools, with their actual vs predicted CCR.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+import streamlit as st
+
+from utils.data_loader import (
+    ARTIFACT_DIR, build_design_matrix, load_model, model_frame, model_version,
+)
+from utils.scoring import score_all_schools
+
+# features the similarity is measured on (interaction term left out so
+# ENI and teaching environment are not double-counted)
+PEER_FEATURES = [
+    "economic_need_index", "log_temp_housing",
+    "teaching_environment_pct_positive", "avg_student_attendance",
+    "student_support_pct",
+]
+
+
+def _feature_cols(art):
+    nf = art["numerical_features"]
+    return np.array([nf.index(f) for f in PEER_FEATURES])
+
+
+# ── build / persist ──────────────────────────────────────────────────
+def peer_index_path(kind):
+    return ARTIFACT_DIR / f"peer_index_{kind}.npz"
+
+
+def build_peer_index(art):
+    """Build the peer index for every modelled school (``model_frame``)."""
+    df = model_frame(art)
+    X = build_design_matrix(art, df)
+
+    nf = art["numerical_features"]
+    scaled = X[:, 1:1 + len(nf)][:, _feature_cols(art)]
+
+    pred = score_all_schools(art)
+
+    return dict(
+        key=model_version(art),
+        points=np.ascontiguousarray(scaled),
+        dbn=df["DBN"].to_numpy(dtype=str),
+        school_name=df["school_name"].to_numpy(dtype=str),
+        borough=df["borough"].to_numpy(dtype=str),
+        actual=pred["actual_ccr"].to_numpy(),
+        predicted=pred["predicted_ccr"].to_numpy(),
+        tree=cKDTree(scaled),
+    )
+
+
+def save_peer_index(index, path):
+    """Write the index arrays next to the other model artifacts."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        key=np.array(index["key"]),
+        points=index["points"],
+        dbn=index["dbn"],
+        school_name=index["school_name"],
+        borough=index["borough"],
+        actual=index["actual"],
+        predicted=index["predicted"],
+    )
+
+
+def load_peer_index(path):
+    """Read a persisted index, or return None if it does not exist."""
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as z:
+        index = {k: z[k] for k in z.files}
+    index["key"] = str(index["key"])
+    index["tree"] = cKDTree(index["points"])
+    return index
+
+
+def get_peer_index(art):
+    """Return the peer index for the model *art* (its predictions fill
+    the peer table), rebuilding and re-persisting it if the stored copy
+    belongs to a different fit."""
+    return _peer_index(art["kind"], model_version(art))
+
+
+@st.cache_resource(show_spinner="Building peer-school index…", max_entries=4)
+def _peer_index(kind, version):
+    """One cached index per (model kind, model version)."""
+    path = peer_index_path(kind)
+    index = load_peer_index(path)
+    if index is None or index["key"] != version:
+        index = build_peer_index(load_model(kind))
+        save_peer_index(index, path)
+    return index
+
+
+# ── queries ──────────────────────────────────────────────────────────
+def _peer_frame(index, dist, idx):
+    actual = index["actual"][idx]
+    predicted = index["predicted"][idx]
+    return pd.DataFrame({
+        "DBN": index["dbn"][idx],
+        "School": index["school_name"][idx],
+        "Borough": index["borough"][idx],
+        "Distance": np.round(dist, 3),
+        "Actual CCR": np.round(actual, 1),
+        "Predicted CCR": np.round(predicted, 1),
+        "Residual": np.round(actual - predicted, 1),
+    })
+
+
+def scale_inputs(art, eni, pct_temp, teaching, attendance, support):
+    """Map raw slider values into the index's standardized space."""
+    raw = np.array([[
+        eni, np.log(pct_temp + 0.001), teaching, eni * teaching,
+        attendance, support,
+    ]])
+    return art["scaler"].transform(raw)[0, _feature_cols(art)]
+
+
+def find_peers(index, point, k=5, exclude=None):
+    """Return the *k* schools closest to the standardized *point*."""
+    n = len(index["dbn"])
+    q = min(n, k + (1 if exclude is not None else 0))
+    dist, idx = index["tree"].query(point, k=q)
+    dist, idx = np.atleast_1d(dist), np.atleast_1d(idx)
+    if exclude is not None:
+        keep = index["dbn"][idx] != exclude
+        dist, idx = dist[keep], idx[keep]
+    return _peer_frame(index, dist[:k], idx[:k])
+
+
+def peers_for_dbn(index, dbn, k=5):
+    """Return the *k* schools most similar to an existing school."""
+    hits = np.flatnonzero(index["dbn"] == dbn)
+    if len(hits) == 0:
+        raise KeyError(f"DBN {dbn!r} is not in the model dataset")
+    return find_peers(index, index["points"][hits[0]], k=k, exclude=dbn)
+
+
+def peers_for_inputs(art, index, eni, pct_temp, teaching, attendance, support, k=5):
+    """Return the *k* real schools closest to a hypothetical input."""
+    point = scale_inputs(art, eni, pct_temp, teaching, attendance, support)
+    return find_peers(index, point, k=k)
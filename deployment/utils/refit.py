@@ -0,0 +1,318 @@
+"""
+Background model refit with hot-swap.
+The app reads model artifacts from one ``ModelServer`` per Streamlit
+process.  On start it serves the last persisted artifact (fitting, with a
+spinner, only if none exists).  A worker thread polls the version of
+``MODEL_TABLES``; when those tables change it refits in a separate
+process, compares the new test metrics with the served ones and — if
+none worsens by more than ``MAX_WORSENING`` — persists the artifact and
+swaps it in under a lock.  Sessions keep being served the previous artifact until then, and
+caches derived from a model key on ``model_version`` so they follow the
+swap.  Only the compact core is pickled in ``models/<kind>.pkl``; the
+per-school payloads go to ``models/payloads/`` per model version and are
+read on first use (``data_loader.model_payload``).
+
+Refit and persist from the command line (a running app picks the file up
+on its next poll):
+    python -m utils.refit --kind fixed mixed
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import (
+    ARTIFACT_DIR, MODEL_FITTERS, MODEL_KINDS, MODEL_TABLES, PAYLOADS, data_version,
+)
+
+MODEL_DIR = ARTIFACT_DIR / "models"
+PAYLOAD_DIR = MODEL_DIR / "payloads"
+REFIT_LOG = MODEL_DIR / "refit_log.jsonl"
+POLL_SECONDS = 30
+# payloads of a superseded model are kept this long, so other processes
+# still serving it (until their next poll) can load them
+PAYLOAD_GRACE_SECONDS = 20 * POLL_SECONDS
+MAX_HISTORY = 50
+
+# largest accepted worsening of a test metric between served and new fit
+MAX_WORSENING = {"MAE": 2.0, "RMSE": 2.5, "r2": 0.10}
+HIGHER_IS_BETTER = {"r2"}
+
+
+def _fit_job(kind):
+    """Worker-process entry point: fit *kind* on the current files."""
+    version = data_version(MODEL_TABLES)
+    return version, MODEL_FITTERS[kind]()
+
+
+# ── persist ──────────────────────────────────────────────────────────
+def artifact_path(kind):
+    return MODEL_DIR / f"{kind}.pkl"
+
+
+def payload_path(kind, version, name):
+    return PAYLOAD_DIR / f"{kind}-{version}-{name}.pkl"
+
+
+def _dump(obj, path):
+    """Pickle *obj* to a temporary file renamed over *path*, so readers
+    never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _prune_payloads(kind, now):
+    """Remove payloads of *kind*'s models superseded more than
+    ``PAYLOAD_GRACE_SECONDS`` ago (a model is superseded when the next
+    newer one is written)."""
+    written = {}
+    for path in PAYLOAD_DIR.glob(f"{kind}-*.pkl"):
+        version = path.stem.split("-")[1]
+        written[version] = max(written.get(version, 0.0), path.stat().st_mtime)
+    order = sorted(written, key=written.get, reverse=True)
+    stale = {old for new, old in zip(order, order[1:])
+             if now - written[new] > PAYLOAD_GRACE_SECONDS}
+    for path in PAYLOAD_DIR.glob(f"{kind}-*.pkl"):
+        if path.stem.split("-")[1] in stale:
+            path.unlink(missing_ok=True)
+
+
+def save_artifact(kind, version, art):
+    """Persist *art* for data *version*: each payload to its own file,
+    then the core.  Returns the served entry (core only)."""
+    art = dict(art)
+    payloads = art.pop("payloads")
+    for name, payload in payloads.items():
+        _dump(payload, payload_path(kind, art["model_version"], name))
+
+    entry = dict(
+        kind=kind, data_version=version, model_version=art["model_version"],
+        fitted_at=datetime.now().isoformat(timespec="seconds"), art=art,
+    )
+    _dump(entry, artifact_path(kind))
+    _prune_payloads(kind, time.time())
+    return entry
+
+
+def load_artifact(kind):
+    """The persisted entry for *kind*, or None if there is none (or it
+    predates the core / payload split and has to be refit)."""
+    path = artifact_path(kind)
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        entry = pickle.load(f)
+    return entry if "params" in entry["art"] else None
+
+
+@st.cache_resource(show_spinner=False, max_entries=2 * len(MODEL_KINDS) * len(PAYLOADS))
+def load_payload(kind, version, name):
+    """Payload *name* of model *version*, read once per process."""
+    with open(payload_path(kind, version, name), "rb") as f:
+        return pickle.load(f)
+
+
+# ── validation ───────────────────────────────────────────────────────
+def metric_deltas(old, new):
+    """Test metrics of the *old* and *new* artifacts, the change, and
+    whether it is within ``MAX_WORSENING`` (NaN metrics never are)."""
+    rows = []
+    for metric, limit in MAX_WORSENING.items():
+        a = float(old["test_metrics"][metric])
+        b = float(new["test_metrics"][metric])
+        worse = a - b if metric in HIGHER_IS_BETTER else b - a
+        rows.append(dict(metric=metric, old=a, new=b, delta=b - a,
+                         ok=bool(worse <= limit)))
+    return pd.DataFrame(rows)
+
+
+def promote(kind, version, art, force=False):
+    """Persist *art* as *kind* for data *version* if its test metrics pass
+    against the persisted artifact of that kind (or there is none, or
+    *force*).  Returns ``(entry or None, deltas or None)``."""
+    old = load_artifact(kind)
+    deltas = None if old is None else metric_deltas(old["art"], art)
+    if deltas is None or deltas["ok"].all() or force:
+        return save_artifact(kind, version, art), deltas
+    return None, deltas
+
+
+def _deltas_json(deltas):
+    return None if deltas is None else deltas.round(4).to_dict("records")
+
+
+# ── server ───────────────────────────────────────────────────────────
+class ModelServer:
+    """Current artifacts per model kind, refit in the background."""
+
+    def __init__(self, background=True, poll_seconds=POLL_SECONDS):
+        self.background = background
+        self.poll_seconds = poll_seconds
+        self.history = []
+        self._models = {}          # kind → served entry
+        self._refitting = set()
+        self._rejected = {}        # kind → data version not to retry
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def get(self, kind):
+        """Artifacts currently served for *kind*."""
+        entry = self._models.get(kind)
+        if entry is None:
+            entry = self._first_load(kind)
+        return entry["art"]
+
+    def _first_load(self, kind):
+        with self._lock:
+            if kind in self._models:
+                return self._models[kind]
+            entry = load_artifact(kind)
+            version = data_version(MODEL_TABLES)
+            # without a worker, a stale artifact is refit here and now
+            if entry is None or (not self.background
+                                 and entry["data_version"] != version):
+                with st.spinner(f"Fitting {MODEL_KINDS[kind]} model…"):
+                    art = MODEL_FITTERS[kind]()
+                entry = self._accept(kind, version, art, entry)
+            self._models[kind] = entry
+            return entry
+
+    def _accept(self, kind, version, art, old):
+        """Persist and return the new entry if its metrics pass against
+        *old* (any entry passes when there is no *old*); otherwise
+        remember the version and return *old*."""
+        deltas = None if old is None else metric_deltas(old["art"], art)
+        if deltas is not None and not deltas["ok"].all():
+            self._rejected[kind] = version
+            self._log(kind, "rejected", old, version, deltas)
+            return old
+        entry = save_artifact(kind, version, art)
+        self._log(kind, "refit" if old else "initial fit", entry, version, deltas, old)
+        return entry
+
+    # ── background ───────────────────────────────────────────────────
+    def start(self):
+        threading.Thread(target=self._run, name="model-refit", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.poll()
+            except Exception as exc:        # keep the worker alive
+                self._log("*", f"poll failed: {exc!r}")
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1,
+                                             mp_context=mp.get_context("spawn"))
+        return self._pool
+
+    def poll(self):
+        """One worker step for every served kind whose data is stale:
+        swap in a current artifact another process persisted, or start a
+        refit."""
+        version = data_version(MODEL_TABLES)
+        for kind, entry in list(self._models.items()):
+            if (entry["data_version"] == version or kind in self._refitting
+                    or self._rejected.get(kind) == version):
+                continue
+            disk = load_artifact(kind)
+            if disk is not None and disk["data_version"] == version:
+                self._swap(kind, disk)
+                self._log(kind, "loaded", disk, version, old=entry)
+                continue
+            self._refitting.add(kind)
+            future = self._executor().submit(_fit_job, kind)
+            future.add_done_callback(
+                lambda fut, kind=kind, version=version: self._finish(kind, version, fut)
+            )
+
+    def _finish(self, kind, version, future):
+        try:
+            fitted_version, art = future.result()
+            old = self._models[kind]
+            entry = self._accept(kind, fitted_version, art, old)
+            if entry is not old:
+                self._swap(kind, entry)
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool):
+                self._pool = None              # start a fresh worker next time
+            self._rejected[kind] = version
+            self._log(kind, f"refit failed: {exc!r}", version=version)
+        finally:
+            self._refitting.discard(kind)
+
+    def _swap(self, kind, entry):
+        with self._lock:
+            self._models[kind] = entry
+
+    # ── status ───────────────────────────────────────────────────────
+    def _log(self, kind, action, entry=None, version=None, deltas=None, old=None):
+        event = dict(
+            time=datetime.now().isoformat(timespec="seconds"), kind=kind,
+            action=action, data_version=version,
+            model_version=entry["model_version"] if entry else None,
+            previous=old["model_version"] if old else None,
+            deltas=_deltas_json(deltas),
+        )
+        self.history = (self.history + [event])[-MAX_HISTORY:]
+        REFIT_LOG.parent.mkdir(parents=True, exist_ok=True)
+        with open(REFIT_LOG, "a") as f:
+            f.write(json.dumps(event) + "\n")
+
+    def status(self):
+        """One row per served kind: versions, fit time, refit state."""
+        version = data_version(MODEL_TABLES)
+        return pd.DataFrame([
+            dict(kind=kind, model_version=e["model_version"],
+                 fitted_at=e["fitted_at"], current=e["data_version"] == version,
+                 refitting=kind in self._refitting)
+            for kind, e in self._models.items()
+        ], columns=["kind", "model_version", "fitted_at", "current", "refitting"])
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_server():
+    """The process-wide model server; its refit worker runs only inside
+    a Streamlit server (scripts refit stale models synchronously)."""
+    server = ModelServer(background=st.runtime.exists())
+    if server.background:
+        server.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--kind", nargs="+", choices=list(MODEL_KINDS),
+                        default=list(MODEL_KINDS))
+    parser.add_argument("--force", action="store_true",
+                        help="refit even if current and persist regardless of deltas")
+    args = parser.parse_args()
+
+    version = data_version(MODEL_TABLES)
+    for kind in args.kind:
+        old = load_artifact(kind)
+        if old is not None and old["data_version"] == version and not args.force:
+            print(f"{kind}: up to date (model {old['model_version']})")
+            continue
+        entry, deltas = promote(kind, version, MODEL_FITTERS[kind](), force=args.force)
+        if deltas is not None:
+            print(deltas.round(3).to_string(index=False))
+        if entry is not None:
+            print(f"{kind}: persisted model {entry['model_version']} → {artifact_path(kind)}")
+        else:
+            print(f"{kind}: rejected — kept model {old['model_version']}")
@@ -0,0 +1,341 @@
+"""
+Per-school CCR report cards.
+One static HTML page per DBN — actual vs predicted CCR, the feature
+contributions behind the prediction, subgroup results and within-school
+gaps, and the nearest schools on the map — plus an index page.  Payloads
+are assembled once in the parent process from the served model and the
+cached subgroup data; a process pool renders and writes the pages.  Each
+payload is hashed and recorded in ``manifest.json``, so a rerun only
+rewrites schools whose content changed.
+
+Charts are drawn in HTML/CSS (no JavaScript); ``--png`` also saves the
+contribution chart as PNG via Plotly, which needs ``pip install kaleido``.
+
+Run after a refit or data load (from ``deployment/``):
+    python -m utils.report_cards [--dbn 01M292 ...] [--workers 4] [--png]
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from utils.data_loader import (
+    ARTIFACT_DIR, FEATURE_DISPLAY, SUBGROUP_COLORS, SUBGROUP_TABLES,
+    build_subgroup_data, data_version, fit_beta_model, load_clean_tables,
+    model_payload, model_version,
+)
+from utils.scoring import contrib_column, load_predictions
+
+REPORT_DIR = ARTIFACT_DIR / "report_cards"
+MANIFEST = "manifest.json"
+TEMPLATE_VERSION = 1       # bump when the page layout changes
+N_GEO_PEERS = 5
+
+SCHOOL_FEATURES = {
+    "economic_need_index": "Economic Need Index",
+    "percent_temp_housing": "% Temporary Housing",
+    "teaching_environment_pct_positive": "Teaching Environment",
+    "avg_student_attendance": "Avg Student Attendance",
+    "student_support_pct": "Student Support",
+}
+
+
+# ── payloads ─────────────────────────────────────────────────────────
+def _geo_peers(schools, k):
+    """*k* nearest other schools by straight-line distance (km)."""
+    has = schools[["latitude", "longitude"]].notna().all(axis=1).to_numpy()
+    lat0 = np.radians(schools["latitude"].mean())
+    xy = np.column_stack([schools["longitude"] * np.cos(lat0), schools["latitude"]])
+    xy = np.where(has[:, None], xy, np.nan) * 111.2
+    tree = cKDTree(xy[has])
+    rows = np.flatnonzero(has)
+    dist, idx = tree.query(xy[has], k=k + 1)
+
+    cols = ["DBN", "school_name", "actual_ccr", "predicted_ccr"]
+    peers = {}
+    for r, d, i in zip(rows, dist[:, 1:], idx[:, 1:]):
+        near = schools.iloc[rows[i]][cols].assign(km=d)
+        peers[schools["DBN"].iat[r]] = near.round(1).to_dict("records")
+    return peers
+
+
+def build_payloads(art=None, dbns=None):
+    """JSON-serializable report-card content per DBN, from the served
+    model and the cached subgroup data."""
+    art = fit_beta_model() if art is None else art
+    dim_env, dim_loc, _, _, env_csv = load_clean_tables()
+    sg_all, _, multi = build_subgroup_data()
+    pred = load_predictions().drop(columns=["model_version"])
+
+    schools = (
+        dim_loc[["DBN", "school_name", "borough", "district", "latitude", "longitude"]]
+        .merge(dim_env.merge(env_csv, on="DBN", how="left")[["DBN", *SCHOOL_FEATURES]],
+               on="DBN", how="inner")
+        .merge(pred, on="DBN", how="left")
+        .sort_values("DBN", ignore_index=True)
+    )
+    excluded = model_payload(art, "excluded").set_index("DBN")["reason"]
+    peers = _geo_peers(schools, N_GEO_PEERS)
+    city = dict(
+        actual=round(float(pred["actual_ccr"].mean()), 1),
+        predicted=round(float(pred["predicted_ccr"].mean()), 1),
+    )
+
+    gaps = multi.set_index(["DBN", "Subgroup"])["intra_school_gap"]
+    subgroups = {dbn: g for dbn, g in sg_all.groupby("DBN")}
+    pn = [n for n in art["param_names"] if n != "const"]
+
+    if dbns is not None:
+        schools = schools[schools["DBN"].isin(dbns)]
+    payloads = {}
+    for row in schools.itertuples(index=False):
+        s = row._asdict()
+        modelled = not pd.isna(s["predicted_ccr"])
+        sg = subgroups.get(s["DBN"], sg_all.iloc[:0])
+        payloads[s["DBN"]] = dict(
+            dbn=s["DBN"], name=s["school_name"], borough=s["borough"],
+            district=int(s["district"]),
+            features={k: _num(s[k], 3) for k in SCHOOL_FEATURES},
+            actual=_num(s["actual_ccr"]), predicted=_num(s["predicted_ccr"]),
+            residual=_num(s["residual"]), split=s["split"] if modelled else None,
+            excluded=None if modelled else excluded.get(s["DBN"], "not in model"),
+            contributions=[
+                dict(feature=FEATURE_DISPLAY.get(n, n),
+                     value=_num(getattr(row, contrib_column(n)), 3))
+                for n in pn if getattr(row, contrib_column(n)) != 0
+            ] if modelled else [],
+            subgroups=[
+                dict(subgroup=r.Subgroup, status=r.ccr_status, ccr=_num(r.ccr_pct),
+                     gap=_num(gaps.get((s["DBN"], r.Subgroup))),
+                     share=_num(r.student_percent, 3))
+                for r in sg.sort_values("Subgroup").itertuples()
+            ],
+            peers=peers.get(s["DBN"], []),
+            city=city,
+            model_version=model_version(art),
+        )
+    return payloads
+
+
+def _num(v, digits=1):
+    return None if v is None or pd.isna(v) else round(float(v), digits)
+
+
+def payload_hash(payload):
+    spec = json.dumps([TEMPLATE_VERSION, payload], sort_keys=True, default=str)
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+
+# ── rendering ────────────────────────────────────────────────────────
+CSS = """
+body { font-family: system-ui, sans-serif; max-width: 860px; margin: 24px auto;
+       color: #222; font-size: 14px; }
+h1 { font-size: 1.5rem; margin-bottom: 0; } h2 { font-size: 1.1rem; margin-top: 24px; }
+.sub { color: #666; margin-top: 4px; }
+.kpis { display: flex; gap: 12px; margin-top: 16px; }
+.kpi { flex: 1; border: 1px solid #ddd; border-radius: 6px; padding: 10px; }
+.kpi b { display: block; font-size: 1.6rem; }
+table { border-collapse: collapse; width: 100%; }
+td, th { padding: 3px 6px; border-bottom: 1px solid #eee; text-align: left; }
+td.num, th.num { text-align: right; }
+.bar { position: relative; height: 12px; background: #f4f4f4; }
+.bar span { position: absolute; top: 0; height: 12px; }
+.note { color: #666; font-size: 12px; }
+@media print { body { margin: 0; } }
+"""
+
+
+def _e(v):
+    return html.escape("" if v is None else str(v))
+
+
+def _fmt(v, suffix=""):
+    return "—" if v is None else f"{v:.1f}{suffix}"
+
+
+def _bar(value, scale, color=None):
+    """Centered bar for a signed *value* on ±*scale*."""
+    width = min(abs(value) / scale, 1.0) * 50 if scale else 0.0
+    left = 50 - width if value < 0 else 50
+    color = color or ("#4CAF50" if value > 0 else "#EF5350")
+    return (f'<div class="bar"><span style="left:{left:.1f}%;width:{width:.1f}%;'
+            f'background:{color}"></span></div>')
+
+
+def render_card(p):
+    """HTML for one report-card payload."""
+    out = [
+        f"<!doctype html><html><head><meta charset='utf-8'>"
+        f"<title>{_e(p['dbn'])} — {_e(p['name'])}</title><style>{CSS}</style></head><body>",
+        f"<h1>{_e(p['name'])}</h1>",
+        f"<p class='sub'>{_e(p['dbn'])} · {_e(p['borough'])} · District {p['district']}</p>",
+        "<div class='kpis'>",
+        f"<div class='kpi'>Actual 4-yr CCR<b>{_fmt(p['actual'], ' %')}</b>"
+        f"city avg {_fmt(p['city']['actual'], ' %')}</div>",
+        f"<div class='kpi'>Predicted CCR<b>{_fmt(p['predicted'], ' %')}</b>"
+        f"{'held-out test school' if p['split'] == 'test' else 'beta regression'}</div>",
+        f"<div class='kpi'>Actual − predicted<b>{_fmt(p['residual'], ' pts')}</b>"
+        + ("" if p["residual"] is None else
+           f"{'above' if p['residual'] > 0 else 'below'} what the model expects")
+        + "</div>",
+        "</div>",
+    ]
+    if p["excluded"]:
+        out.append(f"<p class='note'>Not scored by the model ({_e(p['excluded'])}).</p>")
+
+    out.append("<h2>School profile</h2><table>")
+    for key, label in SCHOOL_FEATURES.items():
+        v = p["features"][key]
+        out.append(f"<tr><td>{label}</td><td class='num'>{_fmt(None if v is None else v * 100, ' %')}</td></tr>")
+    out.append("</table>")
+
+    if p["contributions"]:
+        scale = max(abs(c["value"]) for c in p["contributions"]) or 1.0
+        out.append("<h2>What drives the prediction</h2><table>")
+        for c in sorted(p["contributions"], key=lambda c: -abs(c["value"])):
+            out.append(f"<tr><td>{_e(c['feature'])}</td><td style='width:45%'>"
+                       f"{_bar(c['value'], scale)}</td>"
+                       f"<td class='num'>{c['value']:+.3f}</td></tr>")
+        out.append("</table><p class='note'>Contributions to the log-odds of CCR "
+                   "relative to an average school; positive values raise the prediction.</p>")
+
+    out.append("<h2>Subgroups</h2>")
+    if p["subgroups"]:
+        gaps = [abs(s["gap"]) for s in p["subgroups"] if s["gap"] is not None]
+        scale = max(gaps, default=1.0) or 1.0
+        out.append("<table><tr><th>Subgroup</th><th class='num'>Share</th><th>Status</th>"
+                   "<th class='num'>CCR</th><th class='num'>Gap vs school</th><th></th></tr>")
+        for s in p["subgroups"]:
+            share = None if s["share"] is None else s["share"] * 100
+            bar = "" if s["gap"] is None else _bar(s["gap"], scale, SUBGROUP_COLORS.get(s["subgroup"]))
+            out.append(f"<tr><td>{_e(s['subgroup'])}</td><td class='num'>{_fmt(share, ' %')}</td>"
+                       f"<td>{_e(s['status'])}</td><td class='num'>{_fmt(s['ccr'], ' %')}</td>"
+                       f"<td class='num'>{_fmt(s['gap'], ' pts')}</td><td style='width:30%'>{bar}</td></tr>")
+        out.append("</table><p class='note'>CCR is suppressed for subgroups under 15 "
+                   "students; gaps need at least two reported subgroups.</p>")
+    else:
+        out.append("<p class='note'>No subgroup outcomes reported.</p>")
+
+    out.append("<h2>Nearby schools</h2><table><tr><th>School</th><th class='num'>km</th>"
+               "<th class='num'>Actual CCR</th><th class='num'>Predicted CCR</th></tr>")
+    for n in p["peers"]:
+        out.append(f"<tr><td><a href='{_e(n['DBN'])}.html'>{_e(n['school_name'])}</a></td>"
+                   f"<td class='num'>{n['km']:.1f}</td><td class='num'>{_fmt(_num(n['actual_ccr']), ' %')}</td>"
+                   f"<td class='num'>{_fmt(_num(n['predicted_ccr']), ' %')}</td></tr>")
+    out.append("</table>")
+
+    out.append(f"<p class='note'>Model {_e(p['model_version'])} · generated "
+               f"{date.today().isoformat()} · <a href='index.html'>all schools</a></p>"
+               "</body></html>")
+    return "\n".join(out)
+
+
+def render_index(payloads):
+    rows = sorted(payloads.values(), key=lambda p: (p["borough"], p["district"], p["dbn"]))
+    out = [f"<!doctype html><html><head><meta charset='utf-8'><title>CCR report cards</title>"
+           f"<style>{CSS}</style></head><body><h1>CCR report cards</h1>"
+           "<table><tr><th>DBN</th><th>School</th><th>Borough</th><th class='num'>District</th>"
+           "<th class='num'>Actual</th><th class='num'>Predicted</th></tr>"]
+    for p in rows:
+        out.append(f"<tr><td><a href='{_e(p['dbn'])}.html'>{_e(p['dbn'])}</a></td>"
+                   f"<td>{_e(p['name'])}</td><td>{_e(p['borough'])}</td>"
+                   f"<td class='num'>{p['district']}</td><td class='num'>{_fmt(p['actual'], ' %')}</td>"
+                   f"<td class='num'>{_fmt(p['predicted'], ' %')}</td></tr>")
+    out.append("</table></body></html>")
+    return "\n".join(out)
+
+
+def contribution_png(p, path):
+    """Save the contribution chart as PNG (needs kaleido)."""
+    import plotly.graph_objects as go
+
+    items = sorted(p["contributions"], key=lambda c: c["value"])
+    fig = go.Figure(go.Bar(
+        y=[c["feature"] for c in items], x=[c["value"] for c in items],
+        orientation="h",
+        marker_color=["#4CAF50" if c["value"] > 0 else "#EF5350" for c in items],
+    ))
+    fig.update_layout(title=f"{p['name']} — contributions (logit)", height=420,
+                      width=760, margin=dict(l=20, r=20, t=50, b=30),
+                      plot_bgcolor="white")
+    fig.write_image(path)
+
+
+def _write_card(job):
+    """Worker: render one card (and its PNG) to *out*; returns the DBN."""
+    p, out, png = job
+    tmp = out / f".{p['dbn']}.html.tmp"
+    tmp.write_text(render_card(p), encoding="utf-8")
+    os.replace(tmp, out / f"{p['dbn']}.html")
+    if png and p["contributions"]:
+        contribution_png(p, out / f"{p['dbn']}.png")
+    return p["dbn"]
+
+
+# ── batch ────────────────────────────────────────────────────────────
+def generate(out=REPORT_DIR, dbns=None, workers=None, png=False, force=False):
+    """Write report cards for *dbns* (default: every school) to *out*,
+    skipping schools whose payload hash is unchanged.  Returns
+    ``(written, skipped)`` DBN lists."""
+    if png:
+        try:
+            import kaleido  # noqa: F401  (fail before any work is done)
+        except ImportError:
+            raise ImportError("--png needs `pip install kaleido`") from None
+
+    out.mkdir(parents=True, exist_ok=True)
+    manifest_path = out / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+    payloads = build_payloads(dbns=dbns)
+    hashes = {dbn: payload_hash(p) for dbn, p in payloads.items()}
+    todo = [
+        dbn for dbn, h in hashes.items()
+        if force or manifest.get(dbn) != h or not (out / f"{dbn}.html").exists()
+        or (png and payloads[dbn]["contributions"] and not (out / f"{dbn}.png").exists())
+    ]
+
+    jobs = [(payloads[dbn], out, png) for dbn in todo]
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk = max(1, len(jobs) // (4 * (pool._max_workers or 1)))
+            written = list(pool.map(_write_card, jobs, chunksize=chunk))
+    else:
+        written = []
+
+    manifest.update({dbn: hashes[dbn] for dbn in written})
+    manifest_path.write_text(json.dumps(manifest, indent=0, sort_keys=True))
+    if dbns is None:
+        (out / "index.html").write_text(render_index(payloads), encoding="utf-8")
+    skipped = sorted(set(payloads) - set(written))
+    return written, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dbn", nargs="+", help="only these schools")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="render processes (default: CPU count)")
+    parser.add_argument("--png", action="store_true",
+                        help="also save contribution charts as PNG (needs kaleido)")
+    parser.add_argument("--force", action="store_true",
+                        help="rewrite every card even if unchanged")
+    parser.add_argument("--out", type=str, default=str(REPORT_DIR))
+    args = parser.parse_args()
+
+    from pathlib import Path
+    start = time.perf_counter()
+    written, skipped = generate(Path(args.out), args.dbn, args.workers, args.png, args.force)
+    print(
+        f"Report cards → {args.out}: {len(written)} written, {len(skipped)} unchanged "
+        f"({time.perf_counter() - start:.1f} s, data {data_version(SUBGROUP_TABLES)})"
+    )
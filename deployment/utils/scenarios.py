@@ -0,0 +1,175 @@
+"""
+City-wide policy what-ifs.
+A scenario is a declarative list of steps applied to the raw features of
+every school in ``model_df`` (shift / scale / cap / floor / set, optionally
+limited to some boroughs or districts).  Each scenario re-scores all
+schools in one vectorized pass with the fitted beta model and reports the
+change in predicted CCR with an interval from draws of the fitted
+coefficients.  The scenarios on the page are evaluated one after another
+in a single cached call, keyed by the model version and their specs.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import (
+    build_design_matrix, fit_beta_model, model_frame, model_version, param_draws,
+)
+from utils.scoring import contribution_matrix
+
+# raw features a scenario may change, with their valid range
+SCENARIO_FEATURES = {
+    "economic_need_index":               (0.0, 1.0),
+    "percent_temp_housing":              (0.0, 1.0),
+    "teaching_environment_pct_positive": (0.0, 1.0),
+    "avg_student_attendance":            (0.0, 1.0),
+    "student_support_pct":               (0.0, 1.0),
+}
+SCENARIO_OPS = ("shift", "scale", "cap", "floor", "set")
+
+N_DRAWS = 2000
+
+PRESET_SCENARIOS = [
+    dict(name="Bronx attendance +3 pts", steps=[
+        dict(feature="avg_student_attendance", op="shift", value=0.03, borough=["Bronx"]),
+    ]),
+    dict(name="Temp housing halved", steps=[
+        dict(feature="percent_temp_housing", op="scale", value=0.5),
+    ]),
+    dict(name="Teaching environment ≥ 80 %", steps=[
+        dict(feature="teaching_environment_pct_positive", op="floor", value=0.80),
+    ]),
+]
+
+
+def scenario_hash(scenario):
+    """Stable hash of a scenario's steps (its name is ignored)."""
+    spec = json.dumps(scenario["steps"], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+
+# ── transformations ──────────────────────────────────────────────────
+def _step_mask(frame, step):
+    mask = np.ones(len(frame), dtype=bool)
+    if step.get("borough"):
+        mask &= frame["borough"].isin(step["borough"]).to_numpy()
+    if step.get("district"):
+        mask &= frame["district"].astype(int).isin(step["district"]).to_numpy()
+    return mask
+
+
+def apply_scenario(frame, steps):
+    """Return a copy of *frame* with *steps* applied to the raw features
+    and the derived model features recomputed."""
+    out = frame.copy()
+    for step in steps:
+        feat, op, val = step["feature"], step["op"], float(step["value"])
+        if feat not in SCENARIO_FEATURES:
+            raise ValueError(f"unknown scenario feature {feat!r}")
+        if op not in SCENARIO_OPS:
+            raise ValueError(f"unknown scenario op {op!r}")
+
+        x = out[feat].to_numpy(dtype=float)
+        new = {
+            "shift": lambda: x + val,
+            "scale": lambda: x * val,
+            "cap":   lambda: np.minimum(x, val),
+            "floor": lambda: np.maximum(x, val),
+            "set":   lambda: np.full_like(x, val),
+        }[op]()
+        lo, hi = SCENARIO_FEATURES[feat]
+        out[feat] = np.where(_step_mask(out, step), np.clip(new, lo, hi), x)
+
+    out["log_temp_housing"] = np.log(out["percent_temp_housing"] + 0.001)
+    out["eni_x_teach"] = (
+        out["economic_need_index"] * out["teaching_environment_pct_positive"]
+    )
+    return out
+
+
+def _predict(art, frame):
+    _, contribs = contribution_matrix(art, frame)
+    return 100.0 / (1.0 + np.exp(-contribs.sum(axis=1)))
+
+
+# ── evaluation ───────────────────────────────────────────────────────
+def _mean_change_draws(art, frame, new_frame, n_draws, seed):
+    """Mean change in predicted CCR (%) under each of *n_draws* coefficient
+    draws from N(params, cov_params): one N × draws matrix op per frame."""
+    draws = param_draws(art, n_draws, seed)
+    cols = [art["params"].index.get_loc(n) for n in art["param_names"]]
+    betas = draws[:, cols].T
+    base = 1.0 / (1.0 + np.exp(-build_design_matrix(art, frame) @ betas))
+    new = 1.0 / (1.0 + np.exp(-build_design_matrix(art, new_frame) @ betas))
+    return (new - base).mean(axis=0) * 100
+
+
+def evaluate_scenario(art, scenario, n_draws=N_DRAWS, seed=0):
+    """Re-score every school under *scenario*; return summary + per-school
+    and per-borough changes in predicted CCR.  The interval of the mean
+    change reflects coefficient uncertainty."""
+    df = model_frame(art)
+    base = _predict(art, df)
+    new_df = apply_scenario(df, scenario["steps"])
+    new = _predict(art, new_df)
+    delta = new - base
+
+    lo, hi = np.percentile(
+        _mean_change_draws(art, df, new_df, n_draws, seed), [2.5, 97.5]
+    )
+
+    changed = np.zeros(len(df), dtype=bool)
+    for step in scenario["steps"]:
+        changed |= _step_mask(df, step)
+
+    per_school = pd.DataFrame({
+        "DBN": df["DBN"].to_numpy(),
+        "borough": df["borough"].to_numpy(),
+        "baseline_ccr": base,
+        "scenario_ccr": new,
+        "delta": delta,
+    })
+    by_borough = (
+        per_school.groupby("borough")
+        .agg(schools=("delta", "size"), baseline=("baseline_ccr", "mean"),
+             scenario=("scenario_ccr", "mean"), delta=("delta", "mean"))
+        .round(2)
+    )
+    key = scenario_hash(scenario)
+    summary = dict(
+        Scenario=scenario.get("name", key),
+        Hash=key,
+        Schools_Targeted=int(changed.sum()),
+        Baseline_CCR=round(float(base.mean()), 2),
+        Scenario_CCR=round(float(new.mean()), 2),
+        Change=round(float(delta.mean()), 2),
+        CI_Low=round(float(lo), 2),
+        CI_High=round(float(hi), 2),
+    )
+    return dict(summary=summary, by_borough=by_borough, per_school=per_school)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _evaluate_all(version, steps_jsons, n_draws):
+    """One cache entry per (model version, tuple of scenario steps)."""
+    art = fit_beta_model()
+    return [evaluate_scenario(art, dict(steps=json.loads(steps)), n_draws=n_draws)
+            for steps in steps_jsons]
+
+
+def run_scenarios(scenarios, n_draws=N_DRAWS):
+    """Evaluate several scenarios; a set evaluated before returns at once.
+
+    Returns ``(summary_df, results)`` with results in input order.
+    """
+    version = model_version(fit_beta_model())
+    jobs = tuple(json.dumps(s["steps"], sort_keys=True) for s in scenarios)
+    results = _evaluate_all(version, jobs, n_draws)
+    for scenario, res in zip(scenarios, results):
+        res["summary"]["Scenario"] = scenario.get("name", res["summary"]["Hash"])
+    summary = pd.DataFrame([r["summary"] for r in results])
+    return summary, results
@@ -0,0 +1,190 @@
+"""
+Per-school prediction table and contribution decomposition.
+Scores every school in ``model_df`` with the fitted beta model and writes a
+``fact_predictions`` table (DBN, actual / predicted CCR, residual, logit
+contributions, model version) to the results database under
+``artifacts/`` and to Parquet, so pages and SQL queries can read
+predictions instead of recomputing them.  The source database is never
+written.  The same N × features contribution matrix is rolled up by
+borough and district for the Model Overview page.
+
+Run as a pipeline stage (from ``deployment/``):
+    python -m utils.scoring
+"""
+
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import (
+    ARTIFACT_DIR, RESULTS_DB_PATH, build_design_matrix, fit_beta_model, load_model,
+    model_frame, model_version,
+)
+
+PREDICTIONS_TABLE = "fact_predictions"
+PREDICTIONS_PARQUET = ARTIFACT_DIR / "fact_predictions.parquet"
+
+
+def contrib_column(name):
+    """Column name for a parameter's logit contribution (SQL-safe)."""
+    return "contrib_" + re.sub(r"\W+", "_", name).lower()
+
+
+def contribution_matrix(art, frame=None):
+    """Per-feature logit contributions for every school in one matrix op.
+
+    Returns ``(X, contribs)`` — the N × parameters design matrix and the
+    matching ``params * X`` matrix (columns follow ``art["param_names"]``).
+    """
+    X = build_design_matrix(art, frame)
+    params = art["params"][art["param_names"]].to_numpy()
+    return X, X * params
+
+
+def score_all_schools(art):
+    """Return one row per school with predictions, residuals and the
+    per-feature logit contributions (``params * x``)."""
+    df = model_frame(art)
+    pn = art["param_names"]
+    _, contribs = contribution_matrix(art, df)
+
+    logit = contribs.sum(axis=1)
+    predicted = 100.0 / (1.0 + np.exp(-logit))
+    actual = df["metric_value_4yr_ccr_all_students"].to_numpy(dtype=float)
+
+    out = pd.DataFrame({
+        "DBN": df["DBN"].to_numpy(),
+        "model_version": model_version(art),
+        "split": np.where(df.index.isin(art["test_index"]), "test", "train"),
+        "actual_ccr": actual,
+        "predicted_ccr": predicted,
+        "residual": actual - predicted,
+        "logit": logit,
+    })
+    for j, name in enumerate(pn):
+        out[contrib_column(name)] = contribs[:, j]
+    return out
+
+
+# ── contribution decomposition ───────────────────────────────────────
+def aggregate_contributions(contrib, groups):
+    """Mean, median, spread and mean |contribution| of each feature per
+    group (*groups* aligned with the rows of *contrib*)."""
+    long = contrib.assign(_group=np.asarray(groups)).melt(
+        id_vars="_group", var_name="feature", value_name="contribution",
+    )
+    long["abs"] = long["contribution"].abs()
+    g = long.groupby(["_group", "feature"], sort=True)
+    out = g["contribution"].agg(["mean", "median", "std", "count"])
+    out["mean_abs"] = g["abs"].mean()
+    return out.rename_axis(["group", "feature"]).reset_index()
+
+
+def build_contribution_summary(kind="fixed"):
+    """Contribution matrix for all schools plus borough / district rollups
+    under model *kind* (fixed effects only for the hierarchical model).
+
+    Returns ``(contrib, values, by_borough, by_district)``: *contrib* and
+    *values* are N × features frames (indexed by DBN, intercept dropped)
+    holding the logit contributions and the scaled feature values behind
+    them.
+    """
+    return _contribution_summary(kind, model_version(load_model(kind)))
+
+
+@st.cache_data(show_spinner="Decomposing predictions for every school…")
+def _contribution_summary(kind, version):
+    """One cache entry per (model kind, model version)."""
+    art = load_model(kind)
+    df = model_frame(art)
+    X, contribs = contribution_matrix(art, df)
+
+    pn = art["param_names"]
+    keep = [j for j, n in enumerate(pn) if n != "const"]
+    cols = [pn[j] for j in keep]
+    dbn = pd.Index(df["DBN"].to_numpy(), name="DBN")
+    contrib = pd.DataFrame(contribs[:, keep], index=dbn, columns=cols)
+    values = pd.DataFrame(X[:, keep], index=dbn, columns=cols)
+
+    by_borough = aggregate_contributions(contrib, df["borough"].to_numpy())
+    by_district = aggregate_contributions(contrib, df["district"].astype(int).to_numpy())
+    return contrib, values, by_borough, by_district
+
+
+def write_predictions(pred, db_path=RESULTS_DB_PATH, parquet_path=PREDICTIONS_PARQUET):
+    """Replace this model version's rows of ``fact_predictions`` in SQLite
+    (other versions are kept) and write the Parquet copy."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            # create the table with no rows, then add any columns a newer
+            # model's parameters need
+            pred.head(0).to_sql(PREDICTIONS_TABLE, conn, if_exists="append", index=False)
+            have = {row[1] for row in conn.execute(f"PRAGMA table_info({PREDICTIONS_TABLE})")}
+            for col in pred.columns.difference(list(have)):
+                conn.execute(f'ALTER TABLE {PREDICTIONS_TABLE} ADD COLUMN "{col}"')
+            conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{PREDICTIONS_TABLE}_dbn "
+                f"ON {PREDICTIONS_TABLE} (DBN, model_version)"
+            )
+            conn.executemany(
+                f"DELETE FROM {PREDICTIONS_TABLE} WHERE model_version = ?",
+                [(v,) for v in pred["model_version"].unique()],
+            )
+            pred.to_sql(PREDICTIONS_TABLE, conn, if_exists="append", index=False)
+    finally:
+        conn.close()
+
+    if parquet_path is not None:
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        pred.to_parquet(parquet_path, index=False)
+
+
+def read_predictions(version, db_path=RESULTS_DB_PATH):
+    """Stored predictions for model *version*, or None if absent/stale."""
+    if not db_path.exists():
+        return None
+    conn = sqlite3.connect(str(db_path))
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (PREDICTIONS_TABLE,),
+        ).fetchone()
+        if not exists:
+            return None
+        pred = pd.read_sql_query(
+            f"SELECT * FROM {PREDICTIONS_TABLE} WHERE model_version = ?",
+            conn, params=(version,),
+        )
+    finally:
+        conn.close()
+    return pred if len(pred) else None
+
+
+def load_predictions():
+    """Per-school predictions for the current model — read from
+    ``fact_predictions`` when the stored table matches this fit, scored
+    in memory otherwise (run ``python -m utils.scoring`` to persist)."""
+    return _load_predictions(model_version(fit_beta_model()))
+
+
+@st.cache_data(show_spinner="Loading school predictions…")
+def _load_predictions(version):
+    """One cache entry per model version."""
+    art = fit_beta_model()
+    pred = read_predictions(version)
+    return score_all_schools(art) if pred is None else pred
+
+
+if __name__ == "__main__":
+    art = fit_beta_model()
+    pred = score_all_schools(art)
+    write_predictions(pred)
+    print(
+        f"Wrote {len(pred)} rows to {PREDICTIONS_TABLE} ({RESULTS_DB_PATH.name}) "
+        f"and {PREDICTIONS_PARQUET} — model {pred['model_version'].iat[0]}"
+    )
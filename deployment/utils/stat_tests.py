@@ -0,0 +1,153 @@
+"""
+Permutation tests with false-discovery-rate control.
+Each test draws ``N_PERM`` label shuffles as one index matrix (in chunks of
+``CHUNK`` rows to bound memory) and evaluates the statistic for all of them
+in a single array op.  A table of tests runs in parallel threads, and its
+p-values are Benjamini–Hochberg adjusted as one family.  Results are
+cached per input frame, so each filter selection is computed once.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from statsmodels.stats.multitest import multipletests
+
+N_PERM = 5000
+CHUNK = 1000          # permutations per index matrix
+MAX_WORKERS = 4
+ALPHA = 0.05
+
+
+def stars(p, ns="ns"):
+    """Significance label used across the app."""
+    if np.isnan(p):
+        return ""
+    return "***" if p < 0.001 else "**" if p < 0.01 else "*" if p < ALPHA else ns
+
+
+def fdr_bh(pvals):
+    """Benjamini–Hochberg q-values; NaN p-values are left out of the
+    family and stay NaN."""
+    p = np.asarray(pvals, dtype=float)
+    q = np.full_like(p, np.nan)
+    ok = ~np.isnan(p)
+    if ok.any():
+        q[ok] = multipletests(p[ok], method="fdr_bh")[1]
+    return q
+
+
+def _shuffles(rng, n, n_perm, chunk):
+    """Yield (≤ chunk) × n matrices of row permutations."""
+    for start in range(0, n_perm, chunk):
+        size = min(chunk, n_perm - start)
+        yield rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis=1)
+
+
+def _perm_pvalue(observed, null):
+    """Two-sided permutation p-value with the +1 correction."""
+    hits = np.count_nonzero(np.abs(null) >= abs(observed) - 1e-12)
+    return (hits + 1) / (len(null) + 1)
+
+
+# ── single tests ─────────────────────────────────────────────────────
+def perm_corr_test(x, y, n_perm=N_PERM, seed=0, chunk=CHUNK):
+    """Pearson r of *x* and *y* with a permutation p-value (shuffling *y*)."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xz = (x - x.mean()) / x.std()
+    yz = (y - y.mean()) / y.std()
+    n = len(x)
+    r = xz @ yz / n
+
+    rng = np.random.default_rng(seed)
+    null = np.concatenate([
+        yz[idx] @ xz / n for idx in _shuffles(rng, n, n_perm, chunk)
+    ])
+    return r, _perm_pvalue(r, null)
+
+
+def perm_mean_diff_test(a, b, n_perm=N_PERM, seed=0, chunk=CHUNK):
+    """Difference in means (b − a) with a permutation p-value (shuffling
+    group labels)."""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    pooled = np.concatenate([a, b])
+    n, na, total = len(pooled), len(a), pooled.sum()
+    diff = b.mean() - a.mean()
+
+    rng = np.random.default_rng(seed)
+    null = []
+    for idx in _shuffles(rng, n, n_perm, chunk):
+        s_a = pooled[idx[:, :na]].sum(axis=1)
+        null.append((total - s_a) / (n - na) - s_a / na)
+    return diff, _perm_pvalue(diff, np.concatenate(null))
+
+
+def _run(jobs):
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        return list(pool.map(lambda job: job[0](*job[1:]), jobs))
+
+
+# ── test tables ──────────────────────────────────────────────────────
+@st.cache_data(show_spinner="Running permutation tests…", max_entries=64)
+def correlation_tests(frame, x_cols, y_col, group_col, groups, min_n=10,
+                      n_perm=N_PERM):
+    """Permutation-tested correlation of each *x_cols* with *y_col*
+    within each group.
+
+    Returns one row per (group, variable) with ``n``, ``r``, ``p`` and the
+    FDR-adjusted ``q`` (family: every test in the table).  Pairs with
+    fewer than *min_n* rows have NaN statistics.
+    """
+    keys, jobs = [], []
+    for g in groups:
+        sub = frame[frame[group_col] == g]
+        for col in x_cols:
+            d = sub[[col, y_col]].dropna()
+            keys.append((g, col, len(d)))
+            if len(d) >= min_n:
+                jobs.append((perm_corr_test, d[col].to_numpy(), d[y_col].to_numpy(), n_perm))
+
+    results = iter(_run(jobs))
+    rows = [
+        dict(group=g, variable=col, n=n,
+             **dict(zip(("r", "p"), next(results) if n >= min_n else (np.nan, np.nan))))
+        for g, col, n in keys
+    ]
+    out = pd.DataFrame(rows, columns=["group", "variable", "n", "r", "p"])
+    out["q"] = fdr_bh(out["p"])
+    return out
+
+
+@st.cache_data(show_spinner="Running permutation tests…", max_entries=64)
+def mean_diff_tests(frame, value_cols, group_col, groups, label_col, a, b,
+                    min_n=5, n_perm=N_PERM):
+    """Permutation-tested difference in means of each *value_cols* between
+    rows labelled *a* and *b* in *label_col*, within each group.
+
+    Returns one row per (group, variable) with ``n_a``, ``n_b``,
+    ``mean_a``, ``mean_b``, ``diff`` (b − a), ``p`` and the FDR-adjusted
+    ``q``; pairs where either side has fewer than *min_n* rows are
+    dropped.
+    """
+    rows, jobs = [], []
+    for g in groups:
+        sub = frame[frame[group_col] == g]
+        for col in value_cols:
+            va = sub.loc[sub[label_col] == a, col].dropna().to_numpy()
+            vb = sub.loc[sub[label_col] == b, col].dropna().to_numpy()
+            if len(va) >= min_n and len(vb) >= min_n:
+                rows.append(dict(group=g, variable=col, n_a=len(va), n_b=len(vb),
+                                 mean_a=va.mean(), mean_b=vb.mean()))
+                jobs.append((perm_mean_diff_test, va, vb, n_perm))
+
+    out = pd.DataFrame(
+        rows, columns=["group", "variable", "n_a", "n_b", "mean_a", "mean_b"],
+    )
+    res = _run(jobs)
+    out["diff"] = [d for d, _ in res]
+    out["p"] = [p for _, p in res]
+    out["q"] = fdr_bh(out["p"])
+    return out
@@ -0,0 +1,394 @@
+"""
+Synthetic CID data at any scale, for load testing.
+``fit_synthesizer`` learns from the validated tables each column's
+empirical marginal and the correlation of the columns' normal scores (a
+Gaussian copula): school-level columns from ``dim_environment`` and the
+support CSV, and — per subgroup — the columns of ``dim_demographic`` and
+``fact_school_outcomes``.  Every synthetic school starts from a real
+template school, taking its borough, district, location (jittered) and
+missingness pattern, and draws its scores as a smoothed bootstrap,
+``√(1 − h²) · z_template + h · ε`` with ε from the fitted correlation, so
+the marginals and correlations carry over while the values are new.
+Across years ε follows an AR(1) process: schools drift between vintages
+while every vintage keeps the fitted marginals.  Subgroup rates are
+suppressed (NULL) below ``SUPPRESS_BELOW`` students as in the source, and
+``readiness_gap`` is derived from them.
+
+Schools are generated and written chunk by chunk — per year one SQLite
+file with the source schema plus an environment CSV, and/or a Parquet
+snapshot readable by ``utils.analytics`` — so memory stays flat however
+many schools and years are asked for.  From ``deployment/``:
+    python -m utils.synthetic --schools 100000 --years 3 --format sqlite parquet
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.special import ndtr, ndtri
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:        # Parquet output is optional
+    pa = pq = None
+
+from utils.data_loader import (
+    ARTIFACT_DIR, DB_PATH, RAW_TABLES, data_version, load_clean_tables,
+)
+from utils.validation import VALIDATION_RULES, validate_tables
+
+SYNTH_DIR = ARTIFACT_DIR / "synthetic"
+FORMATS = ("sqlite", "parquet")
+
+SUPPRESS_BELOW = 15        # students; smaller cohorts have no published rate
+BANDWIDTH = 0.5            # h: share of a school's scores drawn fresh
+PERSISTENCE = 0.9          # year-to-year correlation of the fresh part
+JITTER_KM = 0.5
+CHUNK_SCHOOLS = 20_000
+DBN_LETTERS = "KMQRX"
+MAX_SCHOOLS = 100 * len(DBN_LETTERS) * 1000     # distinct DBNs of the form 00K000
+
+RATINGS = ["Needs Improvement", "Fair", "Good", "Excellent"]
+SUBGROUPS = VALIDATION_RULES["fact_school_outcomes"]["allowed"]["Subgroup"]
+SUPPORT_HEADER = "Student Support - School Percent Positive"
+
+# subgroup rate → the cohort count it is suppressed on
+RATE_COUNTS = {
+    "ccr_rate":              "n_count_ccr",
+    "graduation_rate":       "n_count_graduation_rate",
+    "hs_persistence_rate":   "n_count_hs_persistence_rate",
+    "attendance_90pct_rate": "n_count_90pct_attendance",
+    "enrollment_rate":       "n_count_enrollment",
+}
+
+
+# ── fit ──────────────────────────────────────────────────────────────
+def _copula(frame):
+    """Marginals, normal scores, missingness and correlation (as its
+    Cholesky factor) of the numeric columns of *frame*."""
+    n = frame.notna().sum()
+    scores = ndtri((frame.rank(method="average") - 0.5) / n)
+    corr = scores.corr().fillna(0.0).to_numpy(copy=True)
+    np.fill_diagonal(corr, 1.0)
+    # pairwise correlations need not be positive definite: clip the spectrum
+    w, v = np.linalg.eigh(corr)
+    corr = (v * np.clip(w, 1e-4, None)) @ v.T
+    d = np.sqrt(np.diag(corr))
+    corr /= np.outer(d, d)
+    values = [np.sort(frame[c].dropna().to_numpy(dtype=float)) for c in frame]
+    return dict(
+        columns=list(frame.columns),
+        values=values,
+        integer=[bool(len(v)) and bool(np.all(v == np.round(v))) for v in values],
+        scores=scores.fillna(0.0).to_numpy(),
+        missing=frame.isna().to_numpy(),
+        chol=np.linalg.cholesky(corr),
+    )
+
+
+def fit_synthesizer():
+    """Generator spec learned from the validated tables (cached per
+    version of the raw tables)."""
+    return _fit(data_version(RAW_TABLES))
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def _fit(version):
+    dim_env, dim_loc, dim_dem, fact, env_csv = load_clean_tables()
+
+    schools = (
+        dim_env
+        .merge(dim_loc[["DBN", "borough", "district", "latitude", "longitude"]], on="DBN")
+        .merge(env_csv.drop_duplicates("DBN"), on="DBN", how="left")
+        .reset_index(drop=True)
+    )
+    schools["instruction_performance_rating"] = schools["instruction_performance_rating"].map(
+        {r: float(i) for i, r in enumerate(RATINGS)}
+    )
+    env_cols = [c for c in dim_env.columns if c not in ("DBN", "school_name")]
+    school = _copula(schools[env_cols + ["student_support_pct"]])
+
+    rows = dim_dem.merge(fact.drop(columns=["fact_id", "readiness_gap"]),
+                         on=["DBN", "Subgroup"], how="outer")
+    sub_cols = [c for c in rows.columns if c not in ("DBN", "Subgroup")]
+    subgroup, present = {}, {}
+    for g in SUBGROUPS:
+        # one row per template school, in template order
+        aligned = schools[["DBN"]].merge(rows[rows["Subgroup"] == g], on="DBN", how="left")
+        spec = _copula(aligned[sub_cols])
+        # missing rates the suppression rule does not explain are kept as a pattern
+        for rate, count in RATE_COUNTS.items():
+            n = aligned[count].to_numpy(dtype=float)
+            explained = np.isnan(n) | (n < SUPPRESS_BELOW)
+            spec["missing"][:, spec["columns"].index(rate)] &= ~explained
+        subgroup[g] = spec
+        present[g] = aligned["Subgroup"].notna().to_numpy()
+
+    return dict(
+        templates=schools[["borough", "district", "latitude", "longitude"]],
+        school=school,
+        subgroup=subgroup,
+        present=present,
+        share_total=(schools[["DBN"]]
+                     .merge(dim_dem.groupby("DBN")["student_percent"].sum(), on="DBN", how="left")
+                     ["student_percent"].fillna(1.0).to_numpy()),
+        columns={name: list(df.columns) for name, df in
+                 zip(RAW_TABLES, (dim_env, dim_loc, dim_dem, fact, env_csv))},
+        int_columns={name: [c for c in df.columns if pd.api.types.is_integer_dtype(df[c])]
+                     for name, df in zip(RAW_TABLES, (dim_env, dim_loc, dim_dem, fact, env_csv))},
+    )
+
+
+# ── draw ─────────────────────────────────────────────────────────────
+def _innovation(rng, spec, m):
+    return rng.standard_normal((m, len(spec["columns"]))) @ spec["chol"].T
+
+
+def _draw(spec, tmpl, eps, bandwidth):
+    """Columns of *spec* for templates *tmpl* with fresh scores *eps*."""
+    z = np.sqrt(1.0 - bandwidth ** 2) * spec["scores"][tmpl] + bandwidth * eps
+    u = ndtr(z)
+    out = {}
+    for j, (col, v) in enumerate(zip(spec["columns"], spec["values"])):
+        if not len(v):             # never reported for this subgroup
+            out[col] = np.full(len(tmpl), np.nan)
+            continue
+        x = np.interp(u[:, j], (np.arange(len(v)) + 0.5) / len(v), v)
+        if spec["integer"][j]:
+            x = np.round(x)
+        x[spec["missing"][tmpl, j]] = np.nan
+        out[col] = x
+    return pd.DataFrame(out)
+
+
+def synthetic_dbns(ids):
+    """Distinct DBN-shaped keys for school numbers *ids* (< ``MAX_SCHOOLS``)."""
+    slot, num = np.divmod(np.asarray(ids), 1000)
+    return [f"{s % 100:02d}{DBN_LETTERS[s // 100]}{k:03d}" for s, k in zip(slot, num)]
+
+
+def _locations(spec, tmpl, ids, rng):
+    """``dim_location`` rows: template borough and district, jittered
+    coordinates (kept inside the validated bounding box)."""
+    t = spec["templates"].iloc[tmpl].reset_index(drop=True)
+    (lat_lo, lat_hi), (lon_lo, lon_hi) = (
+        VALIDATION_RULES["dim_location"]["ranges"][c] for c in ("latitude", "longitude")
+    )
+    lat = np.clip(t["latitude"] + rng.normal(0, JITTER_KM / 111.0, len(t)), lat_lo, lat_hi)
+    lon = np.clip(t["longitude"] + rng.normal(0, JITTER_KM / (111.0 * np.cos(np.radians(lat)))),
+                  lon_lo, lon_hi)
+    x = lon * 20037508.34 / 180.0
+    y = np.log(np.tan(np.radians(90.0 + lat) / 2.0)) * 6378137.0
+    return pd.DataFrame({
+        "DBN": synthetic_dbns(ids),
+        "school_name": [f"Synthetic School {i + 1}" for i in ids],
+        "borough": t["borough"],
+        "district": t["district"],
+        "school_identifier": np.asarray(ids) % 1000,
+        "latitude": lat.round(6),
+        "longitude": lon.round(6),
+        "geometry": [f"POINT ({a} {b})" for a, b in zip(x, y)],
+    })
+
+
+def _tables(spec, tmpl, loc, ids, eps, bandwidth):
+    """One year of the raw tables for the schools of a chunk."""
+    env = _draw(spec["school"], tmpl, eps["school"], bandwidth)
+    rating = env["instruction_performance_rating"]
+    env["instruction_performance_rating"] = rating.map(
+        lambda r: np.nan if np.isnan(r) else RATINGS[int(r)]
+    )
+    env.insert(0, "DBN", loc["DBN"])
+    env.insert(1, "school_name", loc["school_name"])
+    env_csv = env[["DBN", "student_support_pct"]]
+
+    parts = []
+    for g_idx, g in enumerate(SUBGROUPS):
+        keep = spec["present"][g][tmpl]
+        part = _draw(spec["subgroup"][g], tmpl, eps[g], bandwidth)[keep]
+        part.insert(0, "DBN", loc["DBN"][keep].to_numpy())
+        part.insert(1, "Subgroup", g)
+        part.insert(0, "fact_id", ids[keep] * len(SUBGROUPS) + g_idx + 1)
+        part["_school"] = np.flatnonzero(keep)
+        parts.append(part)
+    sub = pd.concat(parts, ignore_index=True)
+
+    for rate, count in RATE_COUNTS.items():
+        n = sub[count]
+        sub.loc[n.isna() | (n < SUPPRESS_BELOW), rate] = np.nan
+    sub["readiness_gap"] = sub["graduation_rate"] - sub["ccr_rate"]
+    # a school's subgroup shares add up to its template's total (≤ 1)
+    total = np.bincount(sub["_school"], weights=sub["student_percent"].fillna(0.0),
+                        minlength=len(tmpl))
+    scale = spec["share_total"][tmpl] / np.where(total > 0, total, 1.0)
+    sub["student_percent"] = (sub["student_percent"] * scale[sub["_school"]]).clip(upper=1.0)
+
+    tables = dict(
+        dim_environment=env, dim_location=loc,
+        dim_demographic=sub, fact_school_outcomes=sub, env_csv=env_csv,
+    )
+    out = {}
+    for name, df in tables.items():
+        df = df[spec["columns"][name]].copy()
+        for c in spec["int_columns"][name]:
+            if df[c].notna().all():
+                df[c] = df[c].astype(np.int64)
+        out[name] = df
+    return out
+
+
+def generate_chunks(n_schools, years=1, chunk=CHUNK_SCHOOLS, seed=0,
+                    bandwidth=BANDWIDTH, persistence=PERSISTENCE, spec=None):
+    """Yield ``(year index, {table: frame})`` for *n_schools* synthetic
+    schools over *years*, *chunk* schools at a time.  A school keeps its
+    DBN, template and location across years; chunks are seeded by their
+    position, so output does not depend on the chunk order."""
+    if not 0 < n_schools <= MAX_SCHOOLS:
+        raise ValueError(f"n_schools must be between 1 and {MAX_SCHOOLS:,}")
+    if not 0 <= bandwidth <= 1 or not 0 <= persistence <= 1:
+        raise ValueError("bandwidth and persistence must be between 0 and 1")
+    spec = spec or fit_synthesizer()
+    parts = {"school": spec["school"], **spec["subgroup"]}
+    for start in range(0, n_schools, chunk):
+        ids = np.arange(start, min(start + chunk, n_schools))
+        rng = np.random.default_rng([seed, start])
+        tmpl = rng.integers(len(spec["templates"]), size=len(ids))
+        loc = _locations(spec, tmpl, ids, rng)
+        eps = {k: _innovation(rng, p, len(ids)) for k, p in parts.items()}
+        for year in range(years):
+            if year:
+                eps = {k: persistence * e + np.sqrt(1.0 - persistence ** 2)
+                       * _innovation(rng, parts[k], len(ids)) for k, e in eps.items()}
+            yield year, _tables(spec, tmpl, loc, ids, eps, bandwidth)
+
+
+# ── sinks ────────────────────────────────────────────────────────────
+class SQLiteSink:
+    """A SQLite file with the source schema plus the environment CSV."""
+
+    def __init__(self, path):
+        path.mkdir(parents=True, exist_ok=True)
+        self.db_path = path / "CID_synthetic.db"
+        self.csv_path = path / "env_dim.csv"
+        self.db_path.unlink(missing_ok=True)
+        self.csv_path.unlink(missing_ok=True)
+
+        src = sqlite3.connect(str(DB_PATH))
+        try:
+            ddl = [sql for name, sql in src.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'table'"
+            ) if name in RAW_TABLES]
+        finally:
+            src.close()
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        for sql in ddl:
+            self.conn.execute(sql)
+
+    def write(self, tables):
+        with self.conn:
+            for name, df in tables.items():
+                if name != "env_csv":
+                    df.to_sql(name, self.conn, if_exists="append", index=False)
+        support = (tables["env_csv"]["student_support_pct"] * 100).round()
+        pd.DataFrame({
+            "DBN": tables["env_csv"]["DBN"],
+            SUPPORT_HEADER: support.map(lambda v: "" if np.isnan(v) else f"{v:.0f}%"),
+        }).to_csv(self.csv_path, mode="a", header=not self.csv_path.exists(), index=False)
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetSink:
+    """A Parquet snapshot (one file per table, appended by row group) in
+    the layout of ``utils.analytics.write_snapshot``."""
+
+    def __init__(self, path):
+        if pq is None:
+            raise ImportError("Parquet output needs pyarrow: `pip install pyarrow`")
+        self.path = path / "parquet"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.writers = {}
+
+    def write(self, tables):
+        for name, df in tables.items():
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if name not in self.writers:
+                self.writers[name] = pq.ParquetWriter(self.path / f"{name}.parquet",
+                                                      table.schema)
+            else:
+                table = table.cast(self.writers[name].schema)
+            self.writers[name].write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        (self.path / "meta.json").write_text(
+            json.dumps(dict(key="synthetic", tables=list(self.writers)))
+        )
+
+
+SINKS = {"sqlite": SQLiteSink, "parquet": ParquetSink}
+
+
+def write_synthetic(n_schools, years=1, first_year=None, formats=("sqlite",),
+                    out=SYNTH_DIR, validate=False, **kwargs):
+    """Generate and write *years* vintages to ``out/<year>/``.
+
+    Returns one row per year: rows written per table and, with
+    *validate*, rows the load-time checks would quarantine."""
+    first_year = first_year or date.today().year
+    sinks = {y: [SINKS[f](out / str(first_year + y)) for f in formats]
+             for y in range(years)}
+    counts = {y: dict.fromkeys(RAW_TABLES, 0) | dict(quarantined=0) for y in range(years)}
+    try:
+        for year, tables in generate_chunks(n_schools, years, **kwargs):
+            for sink in sinks[year]:
+                sink.write(tables)
+            for name, df in tables.items():
+                counts[year][name] += len(df)
+            if validate:
+                counts[year]["quarantined"] += len(validate_tables(tables)["quarantine"])
+    finally:
+        for year_sinks in sinks.values():
+            for sink in year_sinks:
+                sink.close()
+    return pd.DataFrame([dict(year=first_year + y, **c) for y, c in counts.items()])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--schools", type=int, default=10_000)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--first-year", type=int, default=None)
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["sqlite"])
+    parser.add_argument("--out", default=str(SYNTH_DIR))
+    parser.add_argument("--chunk", type=int, default=CHUNK_SCHOOLS, help="schools per chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bandwidth", type=float, default=BANDWIDTH)
+    parser.add_argument("--persistence", type=float, default=PERSISTENCE)
+    parser.add_argument("--validate", action="store_true",
+                        help="run the load-time checks on every chunk")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    summary = write_synthetic(
+        args.schools, args.years, args.first_year, args.format, Path(args.out),
+        args.validate, chunk=args.chunk, seed=args.seed, bandwidth=args.bandwidth,
+        persistence=args.persistence,
+    )
+    elapsed = time.perf_counter() - t0
+    if not args.validate:
+        summary = summary.drop(columns="quarantined")
+    print(summary.to_string(index=False))
+    rows = int(summary[list(RAW_TABLES)].to_numpy().sum())
+    print(f"\n{rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s) → {args.out}")
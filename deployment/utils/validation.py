@@ -0,0 +1,204 @@
+"""
+Load-time data validation.
+Declarative per-table rules (value ranges, allowed values, required
+columns, DBN format, key uniqueness, referential integrity, null rates)
+evaluated as vectorized column masks.  Rows failing a row-level rule are
+moved to a quarantine table with the reason instead of being dropped
+silently; null-rate rules only raise warnings.
+
+Percent-style columns are stored as fractions (0–1) even where the CHECK
+constraints in ``sql/data_processing.sql`` say 0–100, so the ranges here
+follow the stored data.
+"""
+
+import numpy as np
+import pandas as pd
+
+DBN_PATTERN = r"\d{2}[KMQRX]\d{3}"
+FRACTION = (0.0, 1.0)
+COUNT = (0, None)
+
+# tables are validated in this order so references see clean parents
+VALIDATION_RULES = {
+    "dim_environment": dict(
+        key=["DBN"],
+        required=["DBN", "school_name"],
+        ranges={
+            "enrollment":                                     COUNT,
+            "teaching_environment_pct_positive":              FRACTION,
+            "family_involvement_pct_positive":                FRACTION,
+            "advising_planning_pct_positive":                 FRACTION,
+            "economic_need_index":                            FRACTION,
+            "percent_temp_housing":                           FRACTION,
+            "percent_hra_eligible":                           FRACTION,
+            "avg_student_attendance":                         FRACTION,
+            "metric_value_4yr_ccr_all_students":              (0.0, 100.0),
+            "readiness_gap_hs":                               (-100.0, 100.0),
+            "metric_value_4yr_graduation_rate_all_students":  FRACTION,
+            "metric_value_4yr_hs_persistence":                FRACTION,
+            "metric_value_postsecondary_enrollment_6_months": FRACTION,
+            "n_count_4yr_graduation_rate_all_students":       COUNT,
+            "n_count_4yr_hs_persistence":                     COUNT,
+            "n_count_postsecondary_enrollment_6_months":      COUNT,
+        },
+        max_null={
+            "percent_temp_housing":              0.05,
+            "avg_student_attendance":            0.10,
+            "economic_need_index":               0.25,
+            "teaching_environment_pct_positive": 0.25,
+            "metric_value_4yr_ccr_all_students": 0.30,
+        },
+    ),
+    "dim_location": dict(
+        key=["DBN"],
+        required=["DBN", "school_name", "borough", "district"],
+        ranges={
+            "district":  (1, 84),
+            "latitude":  (40.45, 40.95),    # NYC bounding box
+            "longitude": (-74.30, -73.65),
+        },
+        allowed={
+            "borough": ["Bronx", "Brooklyn", "Manhattan", "Queens", "Staten Island"],
+        },
+        references=[("dim_environment", ["DBN"])],
+    ),
+    "dim_demographic": dict(
+        key=["DBN", "Subgroup"],
+        required=["DBN", "Subgroup"],
+        ranges={
+            "nearby_student_percent":        FRACTION,
+            "pct_students_advanced_courses": FRACTION,
+            "student_percent":               FRACTION,
+            "teacher_percent":               FRACTION,
+        },
+        allowed={"Subgroup": ["Asian", "Black", "Hispanic", "White"]},
+        references=[("dim_environment", ["DBN"])],
+    ),
+    "fact_school_outcomes": dict(
+        key=["DBN", "Subgroup"],
+        required=["DBN", "Subgroup"],
+        ranges={
+            "ccr_rate":                    FRACTION,
+            "graduation_rate":             FRACTION,
+            "hs_persistence_rate":         FRACTION,
+            "attendance_90pct_rate":       FRACTION,
+            "enrollment_rate":             FRACTION,
+            "readiness_gap":               (-1.0, 1.0),
+            "n_count_ccr":                 COUNT,
+            "n_count_graduation_rate":     COUNT,
+            "n_count_hs_persistence_rate": COUNT,
+            "n_count_90pct_attendance":    COUNT,
+            "n_count_enrollment":          COUNT,
+        },
+        allowed={"Subgroup": ["Asian", "Black", "Hispanic", "White"]},
+        references=[
+            ("dim_environment", ["DBN"]),
+            ("dim_demographic", ["DBN", "Subgroup"]),
+        ],
+    ),
+    "env_csv": dict(
+        key=["DBN"],
+        required=["DBN"],
+        ranges={"student_support_pct": FRACTION},
+        max_null={"student_support_pct": 0.25},
+        references=[("dim_environment", ["DBN"])],
+    ),
+}
+
+
+def _fmt(value):
+    return "∅" if pd.isna(value) else str(value)
+
+
+# ── row-level checks ─────────────────────────────────────────────────
+def _row_failures(df, rules, clean):
+    """Yield ``(check, column, failing-row mask)`` for every row rule."""
+    for col in rules.get("required", []):
+        yield "required", col, df[col].isna().to_numpy()
+
+    if "DBN" in df.columns:
+        dbn = df["DBN"].astype("string")
+        bad = ~dbn.str.fullmatch(DBN_PATTERN).fillna(False).astype(bool)
+        yield "dbn_format", "DBN", bad.to_numpy() & df["DBN"].notna().to_numpy()
+
+    key = rules.get("key")
+    if key:
+        yield "duplicate_key", "+".join(key), df.duplicated(key, keep="first").to_numpy()
+
+    for col, (lo, hi) in rules.get("ranges", {}).items():
+        v = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        bad = np.zeros(len(df), dtype=bool)
+        if lo is not None:
+            bad |= v < lo
+        if hi is not None:
+            bad |= v > hi
+        # non-numeric text coerced to NaN also counts as out of range
+        bad |= np.isnan(v) & df[col].notna().to_numpy()
+        yield "range", col, bad
+
+    for col, values in rules.get("allowed", {}).items():
+        yield "allowed", col, (~df[col].isin(values) & df[col].notna()).to_numpy()
+
+    for parent, cols in rules.get("references", []):
+        keys = pd.MultiIndex.from_frame(clean[parent][cols])
+        own = pd.MultiIndex.from_frame(df[cols])
+        yield "reference", f"{'+'.join(cols)} → {parent}", ~own.isin(keys)
+
+
+def _check_table(name, df, rules, clean):
+    """Return (clean frame, report rows, quarantine frames) for one table."""
+    report, quarantined = [], []
+    failed_any = np.zeros(len(df), dtype=bool)
+
+    for check, col, bad in _row_failures(df, rules, clean):
+        n_bad = int(bad.sum())
+        report.append(dict(table=name, check=check, column=col, failed=n_bad,
+                           rate=n_bad / max(len(df), 1),
+                           status="quarantined" if n_bad else "ok"))
+        if n_bad:
+            failed_any |= bad
+            rows = df.loc[bad]
+            value_col = col if col in df.columns else None
+            quarantined.append(pd.DataFrame({
+                "table": name,
+                "row": rows.index,
+                "DBN": rows["DBN"].to_numpy() if "DBN" in df else None,
+                "Subgroup": rows["Subgroup"].to_numpy() if "Subgroup" in df else None,
+                "check": check,
+                "column": col,
+                "value": rows[value_col].map(_fmt).to_numpy() if value_col else "",
+            }))
+
+    # null rates: table-level warnings, rows are kept
+    null_rate = df.isna().mean()
+    for col, limit in rules.get("max_null", {}).items():
+        rate = float(null_rate[col])
+        report.append(dict(table=name, check="null_rate", column=col,
+                           failed=int(df[col].isna().sum()), rate=rate,
+                           status="warn" if rate > limit else "ok"))
+
+    return df.loc[~failed_any], report, quarantined
+
+
+def validate_tables(tables):
+    """Validate the raw tables (``{name: frame}``) against
+    ``VALIDATION_RULES``.
+
+    Returns a dict with ``clean`` (``{name: frame}`` without quarantined
+    rows), ``report`` (one row per check) and ``quarantine`` (one row per
+    failed row × check, with the offending value).
+    """
+    clean, report, quarantined = {}, [], []
+    for name, rules in VALIDATION_RULES.items():
+        df = tables[name]
+        clean[name], rep, quar = _check_table(name, df, rules, clean)
+        report += rep
+        quarantined += quar
+
+    columns = ["table", "row", "DBN", "Subgroup", "check", "column", "value"]
+    return dict(
+        clean=clean,
+        report=pd.DataFrame(report),
+        quarantine=(pd.concat(quarantined, ignore_index=True) if quarantined
+                    else pd.DataFrame(columns=columns)),
+    )
@@ -0,0 +1,384 @@
+"""
+Streaming Excel → SQLite ingestion for School Quality Report workbooks.
+
+Reads the SQR results workbook (``data/excel/202425-hs-sqr-results.xlsx``)
+or the hand-built ``Relational_Tables.xlsx`` one row at a time with
+openpyxl's read-only mode, maps each sheet's headers onto the star-schema
+columns in ``sql/data_processing.sql``, cleans ``%`` strings and
+suppression markers (``N<15``, ``N<5``, ``N/A``, ``> 95%``) on the fly, and
+upserts into SQLite in fixed-size batches.  Only one batch per target table
+is held in memory, so peak memory does not grow with the workbook.
+
+Usage (from project root):
+    python python/src/ingest_sqr.py data/excel/202425-hs-sqr-results.xlsx
+    python python/src/ingest_sqr.py data/excel/Relational_Tables.xlsx --db sql/CID_database_clean.db
+"""
+
+import argparse
+import re
+import sqlite3
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+# --- 1. CONFIGURATION ---
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DB_PATH = PROJECT_ROOT / 'sql' / 'CID_database_clean.db'
+SCHEMA_PATH = PROJECT_ROOT / 'sql' / 'data_processing.sql'
+BATCH_SIZE = 500
+
+# values the DOE uses in place of a number
+SUPPRESSION_MARKERS = {'', 'N/A', 'NA', 'N<5', 'N<15', '-', '.', 's'}
+
+# columns stored as TEXT; everything else is cleaned to a number
+TEXT_COLUMNS = {
+    'DBN', 'Subgroup', 'school_name', 'instruction_performance_rating',
+    'borough', 'geometry',
+}
+
+# star-schema subgroup -> header labels used for it across workbooks
+SUBGROUPS = {
+    'Asian': ['Asian'],
+    'Black': ['Black'],
+    'Hispanic': ['Hispanic or Latinx', 'Hispanic'],
+    'White': ['White'],
+}
+SUBGROUP_ALIASES = {label: sg for sg, labels in SUBGROUPS.items() for label in labels}
+
+BOROUGH_CODES = {
+    'M': 'Manhattan', 'X': 'Bronx', 'K': 'Brooklyn',
+    'Q': 'Queens', 'R': 'Staten Island',
+}
+
+# --- 2. SHEET → TABLE MAPPINGS ---
+# Each spec maps one sheet onto one table.  ``columns`` maps a header to a
+# column (or ``(column, scale)``); ``subgroup_columns`` holds ``{sg}``
+# header templates that are unpivoted into one row per subgroup.
+_ENV_SUMMARY = {
+    'School Name': 'school_name',
+    'Enrollment': 'enrollment',
+    'Instruction and Performance - Rating': 'instruction_performance_rating',
+    'Teaching Environment - School Percent Positive': 'teaching_environment_pct_positive',
+    'Family Involvement - School Percent Positive': 'family_involvement_pct_positive',
+    'Advising and Planning - School Percent Positive': 'advising_planning_pct_positive',
+    'Economic Need Index': 'economic_need_index',
+    'Percent in Temp Housing': 'percent_temp_housing',
+    'Percent HRA Eligible': 'percent_hra_eligible',
+}
+
+_ENV_OUTCOMES = {
+    'Metric Value - 4-Year College and Career Readiness - All Students': 'metric_value_4yr_ccr_all_students',
+    'N count - 4-Year Graduation Rate - All Students': 'n_count_4yr_graduation_rate_all_students',
+    'Metric Value - 4-Year Graduation Rate - All Students': 'metric_value_4yr_graduation_rate_all_students',
+    'N count - 4-Year High School Persistence Rate': 'n_count_4yr_hs_persistence',
+    'Metric Value - 4-Year High School Persistence Rate': 'metric_value_4yr_hs_persistence',
+    'N count - Postsecondary Enrollment Rate - 6 Months': 'n_count_postsecondary_enrollment_6_months',
+    'Metric Value - Postsecondary Enrollment Rate - 6 Months': 'metric_value_postsecondary_enrollment_6_months',
+}
+
+_FACT_SUBGROUP = {
+    'N Count - 4-Year College and Career Readiness - {sg}': 'n_count_ccr',
+    'Metric Value - 4-Year College and Career Readiness - {sg}': ('ccr_rate', 0.01),
+    'N Count - 4-Year Graduation Rate - {sg}': 'n_count_graduation_rate',
+    'Metric Value - 4-Year Graduation Rate - {sg}': 'graduation_rate',
+    'N Count - 4-Year High School Persistence Rate - {sg}': 'n_count_hs_persistence_rate',
+    'Metric Value - 4-Year High School Persistence Rate - {sg}': 'hs_persistence_rate',
+    'N Count - Percentage of Students with >90% Attendance - {sg}': 'n_count_90pct_attendance',
+    'Metric Value - Percentage of Students with >90% Attendance - {sg}': 'attendance_90pct_rate',
+    'N Count - Postsecondary Enrollment Rate - 6 Months - {sg}': 'n_count_enrollment',
+    'Metric Value - Postsecondary Enrollment Rate - 6 Months - {sg}': 'enrollment_rate',
+}
+
+SHEET_SPECS = {
+    # 202425-hs-sqr-results.xlsx
+    'Summary': [
+        dict(table='dim_environment', key=['DBN'], columns=_ENV_SUMMARY),
+        dict(table='dim_location', key=['DBN'],
+             columns={'School Name': 'school_name'}, from_dbn=True),
+        dict(table='dim_demographic', key=['DBN', 'Subgroup'],
+             subgroup_columns={'Student Percent - {sg}': 'student_percent'}),
+    ],
+    'Instruction and Performance': [
+        dict(table='dim_environment', key=['DBN'], columns=_ENV_OUTCOMES),
+    ],
+    'Additional Info': [
+        dict(table='dim_environment', key=['DBN'],
+             columns={'Metric Value - Average Student Attendance': 'avg_student_attendance'}),
+        dict(table='fact_school_outcomes', key=['DBN', 'Subgroup'],
+             subgroup_columns=_FACT_SUBGROUP),
+    ],
+    # Relational_Tables.xlsx
+    'environment_table': [
+        dict(table='dim_environment', key=['DBN'], columns={
+            **_ENV_SUMMARY, **_ENV_OUTCOMES,
+            'Average Student Attendance': 'avg_student_attendance',
+        }),
+    ],
+    'location_table': [
+        dict(table='dim_location', key=['DBN'], columns={
+            'School Name': 'school_name',
+            'borough': 'borough',
+            'district': 'district',
+            'school_indentifier': 'school_identifier',
+            'Latitude': 'latitude',
+            'Longitude': 'longitude',
+            'geometry': 'geometry',
+        }),
+    ],
+    'demographic_table_reshaped': [
+        dict(table='dim_demographic', key=['DBN', 'Subgroup'], columns={
+            'Subgroup': 'Subgroup',
+            'Nearby_Student_Percent': 'nearby_student_percent',
+            'Percentage_of_Students_Enrolled_in_Advanced_Courses': 'pct_students_advanced_courses',
+            'Student_Percent': 'student_percent',
+            'Teacher_Percent': 'teacher_percent',
+        }),
+    ],
+    'fact_table_reshaped': [
+        dict(table='fact_school_outcomes', key=['DBN', 'Subgroup'], columns={
+            'Subgroup': 'Subgroup',
+            '4Year_College_and_Career_Readiness_N_count': 'n_count_ccr',
+            '4Year_College_and_Career_Readiness_Metric_Value': ('ccr_rate', 0.01),
+            '4Year_Graduation_Rate_N_count': 'n_count_graduation_rate',
+            '4Year_Graduation_Rate_Metric_Value': 'graduation_rate',
+            '4Year_High_School_Persistence_Rate_N_count': 'n_count_hs_persistence_rate',
+            '4Year_High_School_Persistence_Rate_Metric_Value': 'hs_persistence_rate',
+            'Percentage_of_Students_with_gt90pct_Attendance_N_count': 'n_count_90pct_attendance',
+            'Percentage_of_Students_with_gt90pct_Attendance_Metric_Value': 'attendance_90pct_rate',
+            'Postsecondary_Enrollment_Rate__6_Months_N_count': 'n_count_enrollment',
+            'Postsecondary_Enrollment_Rate__6_Months_Metric_Value': 'enrollment_rate',
+        }),
+    ],
+}
+
+
+# --- 3. CELL CLEANING ---
+def _norm_header(h):
+    return re.sub(r'\s+', ' ', str(h)).strip().casefold() if h is not None else ''
+
+
+def clean_value(value, column, scale=None):
+    """Turn a raw cell into a value SQLite can store for *column*.
+
+    Suppression markers become NULL; ``'79%'`` becomes ``0.79``; text
+    columns are stripped but otherwise left alone.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if column in TEXT_COLUMNS:
+            if column == 'Subgroup':
+                return SUBGROUP_ALIASES.get(value, value)
+            return value or None
+        if value in SUPPRESSION_MARKERS or value.startswith(('N<', '<', '>')):
+            return None
+        try:
+            value = float(value[:-1]) / 100 if value.endswith('%') else float(value)
+        except ValueError:
+            return None
+    elif column in TEXT_COLUMNS:
+        return str(value)
+    if scale is not None:
+        value = value * scale
+    return value
+
+
+# --- 4. HEADER RESOLUTION ---
+def _find_header(rows, max_scan=20):
+    """Advance *rows* to the header line (the first row with a ``DBN``
+    cell) and return ``{normalized header: column index}``."""
+    for _, row in zip(range(max_scan), rows):
+        norm = [_norm_header(v) for v in row]
+        if 'dbn' in norm:
+            return {h: i for i, h in enumerate(norm) if h}
+    raise ValueError('no header row with a DBN column found')
+
+
+def _compile_spec(spec, header, table_cols):
+    """Resolve a spec's headers to column indices for this sheet.
+
+    Returns ``(target_columns, dbn_index, extractors)`` where each
+    extractor is a list of ``(cell_index, column, scale)`` producing one
+    output row (one extractor per subgroup for unpivoted specs), or None
+    if nothing in the spec matches the sheet or table.
+    """
+    def resolve(mapping, fmt=None):
+        out = []
+        for hdr, target in mapping.items():
+            col, scale = target if isinstance(target, tuple) else (target, None)
+            if col not in table_cols:
+                continue
+            labels = [hdr] if fmt is None else [hdr.format(sg=lbl) for lbl in fmt]
+            for label in labels:
+                idx = header.get(_norm_header(label))
+                if idx is not None:
+                    out.append((idx, col, scale))
+                    break
+        return out
+
+    dbn_idx = header['dbn']
+    if 'subgroup_columns' in spec:
+        extractors = {}
+        for sg, labels in SUBGROUPS.items():
+            cells = resolve(spec['subgroup_columns'], labels)
+            if cells:
+                extractors[sg] = cells
+        if not extractors:
+            return None
+        targets = ['DBN', 'Subgroup'] + sorted(
+            {c for cells in extractors.values() for _, c, _ in cells}
+        )
+        return targets, dbn_idx, extractors
+
+    cells = resolve(spec['columns'])
+    if spec.get('from_dbn'):
+        cells = [c for c in cells if c[1] not in ('borough', 'district', 'school_identifier')]
+    if not cells and not spec.get('from_dbn'):
+        return None
+    targets = ['DBN'] + [c for _, c, _ in cells]
+    if spec.get('from_dbn'):
+        targets += [c for c in ('borough', 'district', 'school_identifier') if c in table_cols]
+    return targets, dbn_idx, {None: cells}
+
+
+def _dbn_location(dbn, targets):
+    """Borough / district / school number encoded in a DBN (e.g. 01M292)."""
+    m = re.match(r'^(\d{2})([MXKQR])(\d+)$', dbn)
+    if not m:
+        return {}
+    derived = dict(
+        district=int(m.group(1)),
+        borough=BOROUGH_CODES[m.group(2)],
+        school_identifier=int(m.group(3)),
+    )
+    return {k: v for k, v in derived.items() if k in targets}
+
+
+# --- 5. BATCHED UPSERT ---
+def _upsert_sql(table, targets, key):
+    cols = ', '.join(f'"{c}"' for c in targets)
+    marks = ', '.join('?' for _ in targets)
+    updates = ', '.join(f'"{c}" = excluded."{c}"' for c in targets if c not in key)
+    conflict = ', '.join(f'"{c}"' for c in key)
+    action = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+    return f'INSERT INTO {table} ({cols}) VALUES ({marks}) ON CONFLICT ({conflict}) {action}'
+
+
+def _table_columns(conn, table):
+    return {r[1] for r in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def ensure_schema(conn, schema_path=SCHEMA_PATH):
+    """Create any star-schema tables that are missing, using the CREATE
+    TABLE statements from ``sql/data_processing.sql``."""
+    sql = re.sub(r'--[^\n]*', '', Path(schema_path).read_text())
+    for stmt in sql.split(';'):
+        stmt = stmt.strip()
+        if stmt.upper().startswith('CREATE TABLE'):
+            conn.execute(re.sub(r'^CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', stmt, flags=re.I))
+
+
+def ingest_sheet(conn, ws, specs, batch_size=BATCH_SIZE):
+    """Stream one worksheet into its target tables; return rows written
+    per table.  Raises ``ValueError`` when a target table is missing or
+    none of a spec's headers map onto its columns, rather than writing
+    nothing."""
+    rows = ws.iter_rows(values_only=True)
+    header = _find_header(rows)
+
+    plans = []
+    for spec in specs:
+        table_cols = _table_columns(conn, spec['table'])
+        if not table_cols:
+            raise ValueError(f"sheet {ws.title!r}: table {spec['table']} does not exist "
+                             f"(run with --create-schema)")
+        compiled = _compile_spec(spec, header, table_cols)
+        if compiled is None:
+            raise ValueError(f"sheet {ws.title!r}: no header maps onto a column of "
+                             f"{spec['table']} (check sql/data_processing.sql)")
+        targets, dbn_idx, extractors = compiled
+        sql = _upsert_sql(spec['table'], targets, spec['key'])
+        plans.append(dict(spec=spec, targets=targets, dbn_idx=dbn_idx,
+                          extractors=extractors, sql=sql, batch=[], written=0))
+
+    def flush(plan):
+        if plan['batch']:
+            conn.executemany(plan['sql'], plan['batch'])
+            plan['written'] += len(plan['batch'])
+            plan['batch'].clear()
+
+    for row in rows:
+        dbn = clean_value(row[header['dbn']], 'DBN') if header['dbn'] < len(row) else None
+        if not dbn:
+            continue
+        for plan in plans:
+            for sg, cells in plan['extractors'].items():
+                rec = {'DBN': dbn}
+                if sg is not None:
+                    rec['Subgroup'] = sg
+                for idx, col, scale in cells:
+                    rec[col] = clean_value(row[idx] if idx < len(row) else None, col, scale)
+                if plan['spec'].get('from_dbn'):
+                    rec.update(_dbn_location(dbn, plan['targets']))
+                if 'Subgroup' in plan['targets'] and not rec.get('Subgroup'):
+                    continue
+                plan['batch'].append(tuple(rec.get(c) for c in plan['targets']))
+            if len(plan['batch']) >= batch_size:
+                flush(plan)
+
+    counts = {}
+    for plan in plans:
+        flush(plan)
+        table = plan['spec']['table']
+        counts[table] = counts.get(table, 0) + plan['written']
+    return counts
+
+
+def ingest_workbook(xlsx_path, db_path=DB_PATH, batch_size=BATCH_SIZE, create_schema=False):
+    """Stream every recognised sheet of *xlsx_path* into *db_path*; return
+    the row count of each table written to (a row upserted by several
+    sheets counts once)."""
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    conn = sqlite3.connect(str(db_path))
+    totals = {}
+    try:
+        with conn:
+            if create_schema:
+                ensure_schema(conn)
+            for name in wb.sheetnames:
+                specs = SHEET_SPECS.get(name)
+                if not specs:
+                    continue
+                counts = ingest_sheet(conn, wb[name], specs, batch_size)
+                print(f"  {name}: " + ', '.join(f'{t}={n}' for t, n in counts.items()))
+                totals.update(dict.fromkeys(counts))
+
+            # derived measure, same definition as the notebook ETL
+            if _table_columns(conn, 'fact_school_outcomes') >= {'readiness_gap', 'ccr_rate', 'graduation_rate'}:
+                conn.execute(
+                    'UPDATE fact_school_outcomes '
+                    'SET readiness_gap = graduation_rate - ccr_rate '
+                    'WHERE graduation_rate IS NOT NULL AND ccr_rate IS NOT NULL'
+                )
+            for t in totals:
+                totals[t] = conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+    finally:
+        conn.close()
+        wb.close()
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('workbooks', nargs='+', type=Path)
+    parser.add_argument('--db', type=Path, default=DB_PATH)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--create-schema', action='store_true',
+                        help='create missing star-schema tables first')
+    args = parser.parse_args()
+
+    for path in args.workbooks:
+        print(f"Ingesting {path} → {args.db}")
+        totals = ingest_workbook(path, args.db, args.batch_size, args.create_schema)
+        print('Done, rows per table: ' + ', '.join(f'{t}={n}' for t, n in totals.items()))
@@ -24,7 +24,17 @@ CREATE TABLE dim_environment (
     ),
     avg_student_attendance REAL CHECK (
         avg_student_attendance BETWEEN 0 AND 100
-    )
+    ),
+    n_count_postsecondary_enrollment_6_months INTEGER,
+    readiness_gap_hs REAL,
+    metric_value_4yr_ccr_all_students REAL CHECK (
+        metric_value_4yr_ccr_all_students BETWEEN 0 AND 100
+    ),
+    n_count_4yr_graduation_rate_all_students INTEGER,
+    metric_value_4yr_graduation_rate_all_students REAL,
+    metric_value_4yr_hs_persistence REAL,
+    n_count_4yr_hs_persistence INTEGER,
+    metric_value_postsecondary_enrollment_6_months REAL
 );
 
 -- Populating dim environment